@@ -0,0 +1,57 @@
+from logging.config import fileConfig
+
+from alembic import context
+
+from app.database import Base, DATABASE_URL, engine
+import app.models.user  # noqa: F401  Register the models on Base.metadata
+from app.models.types import BinaryUUID
+
+config = context.config
+
+# Interpret the config file for Python logging, unless run from a script
+# that has set up its own (seed_db.py)
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+
+def compare_type(context, inspected_column, metadata_column, inspected_type, metadata_type):
+    # SQLite has no BINARY type and reflects BINARY(16) columns as NUMERIC(16)
+    if isinstance(metadata_type, BinaryUUID) and context.dialect.name == "sqlite":
+        return False
+    return None
+
+
+def run_migrations_offline() -> None:
+    """Emit the migration SQL without connecting to the database"""
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    """Run migrations against the application's database engine"""
+    with engine.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            compare_type=compare_type,
+            # SQLite needs batch mode to alter existing tables
+            render_as_batch=connection.dialect.name == "sqlite",
+        )
+
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,78 @@
+"""Baseline schema as created by Base.metadata.create_all
+
+Databases created before migrations existed already have these tables;
+mark them with `alembic stamp 0001` and upgrade from there.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-16 09:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", sa.String(36), primary_key=True),
+        sa.Column("name", sa.String(100), nullable=False),
+        sa.Column("username", sa.String(50), nullable=False),
+        sa.Column("email", sa.String(100), nullable=False),
+        sa.Column("password_hash", sa.String(255), nullable=False),
+        sa.Column(
+            "role",
+            sa.Enum("EMPLOYEE", "SPECIALIST", "MANAGER", "DEPUTY_MD", "MD", "ADMIN", name="userrole"),
+            nullable=False,
+        ),
+        sa.Column("is_active", sa.Boolean(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    op.create_table(
+        "purchase_orders",
+        sa.Column("id", sa.String(36), primary_key=True),
+        sa.Column("item_name", sa.String(100), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column("cost", sa.Float(precision=10), nullable=False),
+        sa.Column("description", sa.Text()),
+        sa.Column("vendor_name", sa.String(100), nullable=False),
+        sa.Column("requested_by", sa.String(36), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column(
+            "status",
+            sa.Enum("PENDING", "APPROVED", "DENIED", "AWAITING_MD", "AWAITING_DEPUTY_MD", name="purchaseorderstatus"),
+            nullable=False,
+        ),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_purchase_orders_id", "purchase_orders", ["id"])
+
+    op.create_table(
+        "approvals",
+        sa.Column("id", sa.String(36), primary_key=True),
+        sa.Column("purchase_order_id", sa.String(36), sa.ForeignKey("purchase_orders.id"), nullable=False),
+        sa.Column("approved_by", sa.String(36), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("role", sa.String(50), nullable=False),
+        sa.Column("status", sa.Enum("APPROVED", "DENIED", name="approvalstatus"), nullable=False),
+        sa.Column("comments", sa.Text()),
+        sa.Column("approved_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_approvals_id", "approvals", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_table("approvals")
+    op.drop_table("purchase_orders")
+    op.drop_table("users")
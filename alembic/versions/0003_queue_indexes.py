@@ -0,0 +1,45 @@
+"""Composite indexes for the per-role queue and approval-history queries
+
+  employee      requested_by = ?               ORDER BY created_at, id
+  specialist    status = 'PENDING'             ORDER BY created_at, id
+  deputy MD     status = 'AWAITING_DEPUTY_MD' AND cost <= 1000
+  MD            all orders, keyset-paginated   ORDER BY created_at, id
+  approvals     purchase_order_id = ?          ORDER BY approved_at
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-16 09:20:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_purchase_orders_requested_by_created_at", "purchase_orders", ["requested_by", "created_at", "id"]
+    )
+    op.create_index(
+        "ix_purchase_orders_status_created_at", "purchase_orders", ["status", "created_at", "id"]
+    )
+    op.create_index("ix_purchase_orders_status_cost", "purchase_orders", ["status", "cost"])
+    op.create_index("ix_purchase_orders_created_at", "purchase_orders", ["created_at", "id"])
+    op.create_index(
+        "ix_approvals_purchase_order_id_approved_at", "approvals", ["purchase_order_id", "approved_at"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_approvals_purchase_order_id_approved_at", table_name="approvals")
+    op.drop_index("ix_purchase_orders_created_at", table_name="purchase_orders")
+    op.drop_index("ix_purchase_orders_status_cost", table_name="purchase_orders")
+    op.drop_index("ix_purchase_orders_status_created_at", table_name="purchase_orders")
+    op.drop_index("ix_purchase_orders_requested_by_created_at", table_name="purchase_orders")
@@ -0,0 +1,180 @@
+"""Store UUID primary and foreign keys as BINARY(16)
+
+Every table is rebuilt: a copy with BINARY(16) key columns is created, the
+rows are copied across with their ids converted, the old table is dropped
+and the copy renamed into place. Existing ids keep their value, so URLs and
+tokens held by clients stay valid; new rows get time-ordered v7 ids from
+the application. The redundant secondary indexes on the primary keys
+(ix_users_id, ix_purchase_orders_id, ix_approvals_id) are not recreated.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-16 09:30:00
+
+"""
+from typing import Sequence, Union
+import uuid
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Rows per batch when ids are converted in Python
+COPY_BATCH_SIZE = 5000
+
+# Tables in foreign-key order, with the columns holding UUIDs
+UUID_COLUMNS = {
+    "users": ["id"],
+    "purchase_orders": ["id", "requested_by"],
+    "approvals": ["id", "purchase_order_id", "approved_by"],
+    "refresh_tokens": ["id", "family_id", "user_id"],
+}
+
+INDEXES = [
+    ("ix_users_username", "users", ["username"], True),
+    ("ix_users_email", "users", ["email"], True),
+    ("ix_purchase_orders_requested_by_created_at", "purchase_orders", ["requested_by", "created_at", "id"], False),
+    ("ix_purchase_orders_status_created_at", "purchase_orders", ["status", "created_at", "id"], False),
+    ("ix_purchase_orders_status_cost", "purchase_orders", ["status", "cost"], False),
+    ("ix_purchase_orders_created_at", "purchase_orders", ["created_at", "id"], False),
+    ("ix_approvals_purchase_order_id_approved_at", "approvals", ["purchase_order_id", "approved_at"], False),
+    ("ix_refresh_tokens_token_hash", "refresh_tokens", ["token_hash"], True),
+    ("ix_refresh_tokens_family_id", "refresh_tokens", ["family_id"], False),
+]
+
+# Only created on downgrade, where the pre-0004 layout had them
+PRIMARY_KEY_INDEXES = [
+    ("ix_users_id", "users", ["id"], False),
+    ("ix_purchase_orders_id", "purchase_orders", ["id"], False),
+    ("ix_approvals_id", "approvals", ["id"], False),
+]
+
+
+def _tables(id_type, suffix: str):
+    """Table definitions with key columns of id_type, named <table><suffix>"""
+    metadata = sa.MetaData()
+    users = sa.Table(
+        f"users{suffix}", metadata,
+        sa.Column("id", id_type, primary_key=True),
+        sa.Column("name", sa.String(100), nullable=False),
+        sa.Column("username", sa.String(50), nullable=False),
+        sa.Column("email", sa.String(100), nullable=False),
+        sa.Column("password_hash", sa.String(255), nullable=False),
+        sa.Column(
+            "role",
+            sa.Enum("EMPLOYEE", "SPECIALIST", "MANAGER", "DEPUTY_MD", "MD", "ADMIN", name="userrole"),
+            nullable=False,
+        ),
+        sa.Column("is_active", sa.Boolean(), nullable=False),
+        sa.Column("token_version", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    purchase_orders = sa.Table(
+        f"purchase_orders{suffix}", metadata,
+        sa.Column("id", id_type, primary_key=True),
+        sa.Column("item_name", sa.String(100), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column("cost", sa.Float(precision=10), nullable=False),
+        sa.Column("description", sa.Text()),
+        sa.Column("vendor_name", sa.String(100), nullable=False),
+        sa.Column("requested_by", id_type, sa.ForeignKey(users.c.id), nullable=False),
+        sa.Column(
+            "status",
+            sa.Enum("PENDING", "APPROVED", "DENIED", "AWAITING_MD", "AWAITING_DEPUTY_MD", name="purchaseorderstatus"),
+            nullable=False,
+        ),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    approvals = sa.Table(
+        f"approvals{suffix}", metadata,
+        sa.Column("id", id_type, primary_key=True),
+        sa.Column("purchase_order_id", id_type, sa.ForeignKey(purchase_orders.c.id), nullable=False),
+        sa.Column("approved_by", id_type, sa.ForeignKey(users.c.id), nullable=False),
+        sa.Column("role", sa.String(50), nullable=False),
+        sa.Column("status", sa.Enum("APPROVED", "DENIED", name="approvalstatus"), nullable=False),
+        sa.Column("comments", sa.Text()),
+        sa.Column("approved_at", sa.DateTime(), nullable=False),
+    )
+    refresh_tokens = sa.Table(
+        f"refresh_tokens{suffix}", metadata,
+        sa.Column("id", id_type, primary_key=True),
+        sa.Column("token_hash", sa.String(64), nullable=False),
+        sa.Column("family_id", id_type, nullable=False),
+        sa.Column("user_id", id_type, sa.ForeignKey(users.c.id), nullable=False),
+        sa.Column("token_version", sa.Integer(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.Column("revoked_at", sa.DateTime()),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    return metadata, [users, purchase_orders, approvals, refresh_tokens]
+
+
+def _to_binary(value):
+    return None if value is None else uuid.UUID(value).bytes
+
+
+def _to_string(value):
+    return None if value is None else str(uuid.UUID(bytes=bytes(value)))
+
+
+def _mysql_to_binary(column: str) -> str:
+    return f"UNHEX(REPLACE({column}, '-', ''))"
+
+
+def _mysql_to_string(column: str) -> str:
+    hex_value = f"LOWER(HEX({column}))"
+    return (
+        f"CONCAT_WS('-', SUBSTR({hex_value}, 1, 8), SUBSTR({hex_value}, 9, 4), "
+        f"SUBSTR({hex_value}, 13, 4), SUBSTR({hex_value}, 17, 4), SUBSTR({hex_value}, 21))"
+    )
+
+
+def _copy(bind, source: sa.Table, target: sa.Table, uuid_columns: list, convert, mysql_convert):
+    columns = [column.name for column in target.columns]
+    if bind.dialect.name == "mysql":
+        # Convert server-side; nothing crosses the network for big tables
+        expressions = [mysql_convert(name) if name in uuid_columns else name for name in columns]
+        bind.execute(sa.text(
+            f"INSERT INTO {target.name} ({', '.join(columns)}) "
+            f"SELECT {', '.join(expressions)} FROM {source.name}"
+        ))
+        return
+    result = bind.execute(sa.select(*[source.c[name] for name in columns]))
+    while True:
+        rows = result.fetchmany(COPY_BATCH_SIZE)
+        if not rows:
+            break
+        bind.execute(target.insert(), [
+            {name: convert(value) if name in uuid_columns else value for name, value in zip(columns, row)}
+            for row in rows
+        ])
+
+
+def _rebuild(from_type, to_type, convert, mysql_convert, indexes):
+    bind = op.get_bind()
+    _, sources = _tables(from_type, "")
+    metadata, tables = _tables(to_type, "_new")
+    metadata.create_all(bind)
+    for source, table in zip(sources, tables):
+        _copy(bind, source, table, UUID_COLUMNS[source.name], convert, mysql_convert)
+    # Drop children before parents, then move the copies into place
+    for table in reversed(tables):
+        op.drop_table(table.name[:-len("_new")])
+    for table in tables:
+        op.rename_table(table.name, table.name[:-len("_new")])
+    for name, table, columns, unique in indexes:
+        op.create_index(name, table, columns, unique=unique)
+
+
+def upgrade() -> None:
+    _rebuild(sa.String(36), sa.BINARY(16), _to_binary, _mysql_to_binary, INDEXES)
+
+
+def downgrade() -> None:
+    _rebuild(sa.BINARY(16), sa.String(36), _to_string, _mysql_to_string, INDEXES + PRIMARY_KEY_INDEXES)
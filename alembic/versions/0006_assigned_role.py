@@ -0,0 +1,55 @@
+"""Add purchase_orders.assigned_role, the reviewer inbox column
+
+  specialist    assigned_role = 'SPECIALIST'   ORDER BY created_at, id
+  deputy MD     assigned_role = 'DEPUTY_MD'    ORDER BY created_at, id
+
+Existing orders are assigned from their status, which is how the cost
+threshold already routed them. The (status, cost) index served only the
+deputy MD queue and is dropped.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-16 10:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+USER_ROLE = sa.Enum("EMPLOYEE", "SPECIALIST", "MANAGER", "DEPUTY_MD", "MD", "ADMIN", name="userrole")
+
+# Inbox of every unfinished status at the time of this migration
+ASSIGNMENTS = {
+    "PENDING": "SPECIALIST",
+    "AWAITING_DEPUTY_MD": "DEPUTY_MD",
+    "AWAITING_MD": "MD",
+}
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("purchase_orders") as batch_op:
+        batch_op.add_column(sa.Column("assigned_role", USER_ROLE, nullable=True))
+    for status, role in ASSIGNMENTS.items():
+        op.execute(
+            sa.text("UPDATE purchase_orders SET assigned_role = :role WHERE status = :status")
+            .bindparams(role=role, status=status)
+        )
+    op.create_index(
+        "ix_purchase_orders_assigned_role_created_at", "purchase_orders", ["assigned_role", "created_at", "id"]
+    )
+    op.drop_index("ix_purchase_orders_status_cost", table_name="purchase_orders")
+
+
+def downgrade() -> None:
+    op.create_index("ix_purchase_orders_status_cost", "purchase_orders", ["status", "cost"])
+    op.drop_index("ix_purchase_orders_assigned_role_created_at", table_name="purchase_orders")
+    with op.batch_alter_table("purchase_orders") as batch_op:
+        batch_op.drop_column("assigned_role")
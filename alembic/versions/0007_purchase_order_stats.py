@@ -0,0 +1,53 @@
+"""Add the purchase_order_stats rollup table
+
+The table is filled from the existing orders; `python rebuild_stats.py`
+recomputes and checks it later.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-16 11:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "purchase_order_stats",
+        sa.Column(
+            "status",
+            sa.Enum("PENDING", "APPROVED", "DENIED", "AWAITING_MD", "AWAITING_DEPUTY_MD", name="purchaseorderstatus"),
+            primary_key=True,
+        ),
+        sa.Column("assigned_role", sa.String(20), primary_key=True),
+        sa.Column("vendor_name", sa.String(100), primary_key=True),
+        sa.Column("month", sa.String(7), primary_key=True),
+        sa.Column("order_count", sa.Integer(), nullable=False),
+        sa.Column("total_cost", sa.Float(), nullable=False),
+    )
+    if op.get_bind().dialect.name == "sqlite":
+        month = "strftime('%Y-%m', created_at)"
+    else:
+        month = "DATE_FORMAT(created_at, '%Y-%m')"
+    # assigned_role holds UserRole names, whose lower case is the value
+    role = "COALESCE(LOWER(assigned_role), '')"
+    op.execute(
+        "INSERT INTO purchase_order_stats "
+        "(status, assigned_role, vendor_name, month, order_count, total_cost) "
+        f"SELECT status, {role}, vendor_name, {month}, COUNT(*), SUM(cost) FROM purchase_orders "
+        f"GROUP BY status, {role}, vendor_name, {month}"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("purchase_order_stats")
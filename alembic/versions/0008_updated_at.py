@@ -0,0 +1,47 @@
+"""Add purchase_orders.updated_at and the queue ETag indexes
+
+Each queue's ETag is its row count and MAX(updated_at), read from one of
+these indexes without touching the table:
+
+  employee      requested_by = ?
+  specialist,   assigned_role = ?
+  deputy MD
+  MD            all orders
+
+Existing orders get updated_at = created_at.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-16 11:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("purchase_orders") as batch_op:
+        batch_op.add_column(sa.Column("updated_at", sa.DateTime(), nullable=True))
+    op.execute("UPDATE purchase_orders SET updated_at = created_at")
+    with op.batch_alter_table("purchase_orders") as batch_op:
+        batch_op.alter_column("updated_at", existing_type=sa.DateTime(), nullable=False)
+    op.create_index("ix_purchase_orders_requested_by_updated_at", "purchase_orders", ["requested_by", "updated_at"])
+    op.create_index("ix_purchase_orders_assigned_role_updated_at", "purchase_orders", ["assigned_role", "updated_at"])
+    op.create_index("ix_purchase_orders_updated_at", "purchase_orders", ["updated_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_purchase_orders_updated_at", table_name="purchase_orders")
+    op.drop_index("ix_purchase_orders_assigned_role_updated_at", table_name="purchase_orders")
+    op.drop_index("ix_purchase_orders_requested_by_updated_at", table_name="purchase_orders")
+    with op.batch_alter_table("purchase_orders") as batch_op:
+        batch_op.drop_column("updated_at")
@@ -0,0 +1,54 @@
+"""Add the purchase_order_changes log behind GET /purchase-orders/changes
+
+The log starts empty: clients take their first cursor from the endpoint
+and fetch the full list once. One index per role's feed, as for the queues:
+
+  employee      requested_by = ?
+  specialist,   assigned_role = ? OR previous_assigned_role = ?
+  deputy MD
+  MD            all changes (primary key)
+
+plus changed_at for prune_changes.py.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-16 12:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0009"
+down_revision: Union[str, None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+USER_ROLE = sa.Enum("EMPLOYEE", "SPECIALIST", "MANAGER", "DEPUTY_MD", "MD", "ADMIN", name="userrole")
+
+
+def upgrade() -> None:
+    op.create_table(
+        "purchase_order_changes",
+        sa.Column("id", sa.BigInteger().with_variant(sa.Integer(), "sqlite"), primary_key=True, autoincrement=True),
+        sa.Column("purchase_order_id", sa.BINARY(16), nullable=False),
+        sa.Column("approval_id", sa.BINARY(16), nullable=True),
+        sa.Column("requested_by", sa.BINARY(16), nullable=False),
+        sa.Column("assigned_role", USER_ROLE, nullable=True),
+        sa.Column("previous_assigned_role", USER_ROLE, nullable=True),
+        sa.Column("changed_at", sa.DateTime(), nullable=False),
+        sqlite_autoincrement=True,
+    )
+    op.create_index("ix_purchase_order_changes_requested_by_id", "purchase_order_changes", ["requested_by", "id"])
+    op.create_index("ix_purchase_order_changes_assigned_role_id", "purchase_order_changes", ["assigned_role", "id"])
+    op.create_index(
+        "ix_purchase_order_changes_previous_assigned_role_id", "purchase_order_changes", ["previous_assigned_role", "id"]
+    )
+    op.create_index("ix_purchase_order_changes_changed_at", "purchase_order_changes", ["changed_at"])
+
+
+def downgrade() -> None:
+    op.drop_table("purchase_order_changes")
@@ -0,0 +1,43 @@
+"""Keep purchase_orders.created_at and updated_at to the microsecond on MySQL
+
+MySQL's DATETIME keeps whole seconds. A queue's ETag is its row count and
+MAX(updated_at), so two transitions in the same second that left the count
+unchanged left the ETag unchanged too. created_at came back from a create
+with microseconds that a later read or list cursor no longer had. SQLite
+already stores microseconds and is left alone.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-17 10:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+from sqlalchemy.dialects import mysql
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0010"
+down_revision: Union[str, None] = "0009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = ["created_at", "updated_at"]
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "mysql":
+        return
+    for column in COLUMNS:
+        op.alter_column("purchase_orders", column, type_=mysql.DATETIME(fsp=6),
+                        existing_type=sa.DateTime(), existing_nullable=False)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "mysql":
+        return
+    for column in COLUMNS:
+        op.alter_column("purchase_orders", column, type_=sa.DateTime(),
+                        existing_type=mysql.DATETIME(fsp=6), existing_nullable=False)
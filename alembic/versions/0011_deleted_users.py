@@ -0,0 +1,31 @@
+"""Add deleted_users, which revokes a deleted user's tokens on every worker
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-17 10:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0011"
+down_revision: Union[str, None] = "0010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "deleted_users",
+        sa.Column("user_id", sa.BINARY(16), primary_key=True),
+        sa.Column("deleted_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_deleted_users_deleted_at", "deleted_users", ["deleted_at"])
+
+
+def downgrade() -> None:
+    op.drop_table("deleted_users")
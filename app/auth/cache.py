@@ -0,0 +1,158 @@
+from collections import OrderedDict
+from dotenv import load_dotenv
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+# User cache configuration; a TTL of 0 disables caching
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "1024"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+# "local://" for the in-process stand-in, "redis://host:port/db" across workers
+USER_CACHE_INVALIDATION_URL = os.getenv("USER_CACHE_INVALIDATION_URL")
+USER_CACHE_CHANNEL = "user-cache-invalidate"
+
+
+class CachedUser:
+    """The identity fields of a User that authorization checks read"""
+    __slots__ = ("id", "role", "is_active", "token_version")
+
+    def __init__(self, id: str, role, is_active: bool, token_version: int = 0):
+        self.id = id
+        self.role = role
+        self.is_active = is_active
+        self.token_version = token_version
+
+
+class UserCache:
+    """Bounded TTL + LRU cache of CachedUser entries keyed by user id"""
+
+    def __init__(self, maxsize: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL, channel=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.channel = channel
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        if channel is not None:
+            channel.subscribe(self.discard)
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and self.ttl > 0
+
+    def get(self, user_id: str):
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            user, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[user_id]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return user
+
+    def put(self, user: CachedUser):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[user.id] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, user_id: str):
+        """Drop a user from this worker's cache only"""
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def invalidate(self, user_id: str):
+        """Drop a user from this cache and tell the other workers to do the same"""
+        self.discard(user_id)
+        if self.channel is not None:
+            self.channel.publish(user_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._entries)
+        lookups = self.hits + self.misses
+        return {
+            "size": size,
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+class LocalInvalidationChannel:
+    """In-process stand-in for a pub/sub broker: every subscriber sees every publish"""
+
+    def __init__(self):
+        self.subscribers = []
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    def publish(self, key: str):
+        for callback in self.subscribers:
+            callback(key)
+
+
+class RedisInvalidationChannel:
+    """Redis pub/sub channel so every worker drops an invalidated cache key"""
+
+    def __init__(self, url: str, channel: str = USER_CACHE_CHANNEL):
+        import redis  # Optional dependency, only needed for cross-worker invalidation
+
+        self.client = redis.Redis.from_url(url)
+        self.channel = channel
+
+    def subscribe(self, callback):
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{self.channel: lambda message: callback(message["data"].decode())})
+        pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+    def publish(self, key: str):
+        self.client.publish(self.channel, key)
+
+
+def create_invalidation_channel(url, channel: str = USER_CACHE_CHANNEL):
+    """Build the invalidation channel named by an invalidation URL such as USER_CACHE_INVALIDATION_URL"""
+    if not url:
+        return None
+    if url.startswith("local://"):
+        return LocalInvalidationChannel()
+    if url.startswith(("redis://", "rediss://")):
+        return RedisInvalidationChannel(url, channel)
+    raise ValueError(f"Unsupported invalidation URL: {url}")
+
+
+user_cache = UserCache(channel=create_invalidation_channel(USER_CACHE_INVALIDATION_URL))
+logger.info(f"User cache: size={USER_CACHE_SIZE}, ttl={USER_CACHE_TTL}s")
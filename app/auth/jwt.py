@@ -3,9 +3,13 @@ from typing import Optional
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
-from app.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import AsyncSessionLocal, get_db
+from app.auth.cache import CachedUser, user_cache
+from app.auth.revocation import token_revocations
+from app.auth.passwords import check_password
+from app.metrics import timed
 from app.models.user import User, UserRole
 from app.schemas.user import TokenData
 import os
@@ -35,42 +39,45 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
-
-# Password hashing
-# Update the password hashing configuration
-pwd_context = CryptContext(
-    schemes=["bcrypt"],
-    deprecated="auto",
-    bcrypt__rounds=12,  # Add explicit rounds
-    bcrypt__ident="2b"  # Specify bcrypt version
-)
+# Trust the role/active/version claims instead of looking the user up
+JWT_STATELESS = os.getenv("JWT_STATELESS", "false").lower() == "true"
 
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-# Verify password
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-# Hash password
-def get_password_hash(password):
-    return pwd_context.hash(password)
-
 # Get user by username
-def get_user_by_username(db: Session, username: str):
-    return db.query(User).filter(User.username == username).first()
+async def get_user_by_username(db: AsyncSession, username: str):
+    result = await db.execute(select(User).where(User.username == username))
+    return result.scalars().first()
 
 # Get user by email
-def get_user_by_email(db: Session, email: str):
-    return db.query(User).filter(User.email == email).first()
+async def get_user_by_email(db: AsyncSession, email: str):
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
 
 # Authenticate user
-def authenticate_user(db: Session, email: str, password: str):
-    user = get_user_by_email(db, email)
-    if not user or not verify_password(password, user.password_hash):
+async def authenticate_user(db: AsyncSession, email: str, password: str):
+    user = await get_user_by_email(db, email)
+    if not user:
         return False
+    valid, new_hash = await check_password(password, user.password_hash)
+    if not valid:
+        return False
+    # Upgrade hashes made with a different bcrypt cost factor
+    if new_hash:
+        user.password_hash = new_hash
+        await db.commit()
     return user
 
+# Claims identifying a user in an access token
+def user_token_claims(user: User) -> dict:
+    return {
+        "sub": user.id,
+        "role": user.role.value,
+        "active": user.is_active,
+        "ver": user.token_version
+    }
+
 # Create access token
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -83,7 +90,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 # Get current user
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
     # logger.info(f"Received token: {token[:10]}...")  # Log first 10 chars of token for security
     
     # print(f"Received token: {token[:10]}...")  # Log first 10 chars of token for security
@@ -94,8 +101,9 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        logger.info("Attempting to decode token...")
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        logger.debug("Attempting to decode token...")
+        with timed("jwt_decode"):
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         # logger.info(f"Token payload: {payload}")
         
         user_id: str = payload.get("sub")
@@ -107,27 +115,66 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
             # raise credentials_exception
             
         token_data = TokenData(user_id=user_id, role=role)
-        logger.info(f"Looking up user with ID: {user_id}")
+        token_version = payload.get("ver", 0)
         
-        user = db.query(User).filter(User.id == token_data.user_id).first()
-        if user is None:
-            logger.error(f"No user found with ID: {user_id}")
-            raise credentials_exception
+        # Stateless mode: the claims are trusted for the token lifetime and
+        # revocation is checked against the in-memory version set
+        if JWT_STATELESS and user_id is not None and role is not None:
+            with timed("user_lookup"):
+                await token_revocations.ensure_fresh()
+                revoked = token_revocations.is_revoked(user_id, token_version)
+            if revoked:
+                logger.error(f"Revoked token for user ID: {user_id}")
+                raise credentials_exception
+            return CachedUser(user_id, UserRole(role), payload.get("active", True), token_version)
+        
+        with timed("user_lookup"):
+            user = user_cache.get(token_data.user_id)
+            if user is None:
+                logger.debug(f"Looking up user with ID: {user_id}")
+                result = await db.execute(
+                    select(User.id, User.role, User.is_active, User.token_version)
+                    .where(User.id == token_data.user_id)
+                )
+                row = result.first()
+                if row is None:
+                    logger.error(f"No user found with ID: {user_id}")
+                    raise credentials_exception
             
+                user = CachedUser(row.id, row.role, row.is_active, row.token_version)
+                user_cache.put(user)
+        
+        if token_version < user.token_version:
+            logger.error(f"Revoked token for user ID: {user_id}")
+            raise credentials_exception
+        
         return user
     except JWTError as e:
         logger.error(f"JWT decode error: {str(e)}")
         raise credentials_exception
 
+# Get current user for a streaming response. FastAPI keeps a request's
+# dependencies open until the response has been sent, so the session from
+# get_db would hold a pooled connection for the whole stream; this one is
+# closed before the stream starts
+async def get_streaming_user(token: str = Depends(oauth2_scheme)):
+    async with AsyncSessionLocal() as db:
+        return await get_current_user(token, db)
+
 # Get current active user
-async def get_current_active_user(current_user: User = Depends(get_current_user)):
+async def get_current_active_user(current_user: CachedUser = Depends(get_current_user)):
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
+# Get current active user for a streaming response
+async def get_current_active_streaming_user(current_user: CachedUser = Depends(get_streaming_user)):
+    return await get_current_active_user(current_user)
+
 # Check if user has required role
-def has_role(required_role: UserRole):
-    async def role_checker(current_user: User = Depends(get_current_active_user)):
+def has_role(required_role: UserRole, streaming: bool = False):
+    user_dependency = get_current_active_streaming_user if streaming else get_current_active_user
+    async def role_checker(current_user: CachedUser = Depends(user_dependency)):
         if current_user.role != required_role and current_user.role != UserRole.ADMIN:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
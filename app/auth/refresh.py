@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+from fastapi import HTTPException, status
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from dotenv import load_dotenv
+from app.models.user import RefreshToken, User
+from app.models.types import new_id
+import hashlib
+import logging
+import os
+import secrets
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "14"))
+
+
+def hash_refresh_token(token: str) -> str:
+    # Refresh tokens are 256 random bits, so a plain SHA-256 is enough to
+    # keep stored values useless to a reader of the table
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def issue_refresh_token(db: AsyncSession, user: User, family_id: str = None) -> str:
+    """Add a new refresh token for the user to the session and return its value"""
+    token = secrets.token_urlsafe(32)
+    db.add(RefreshToken(
+        token_hash=hash_refresh_token(token),
+        family_id=family_id or new_id(),
+        user_id=user.id,
+        token_version=user.token_version,
+        expires_at=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    ))
+    return token
+
+
+async def rotate_refresh_token(db: AsyncSession, token: str):
+    """Spend a refresh token and return (user, replacement token)
+
+    A token can be spent once. Presenting an already spent token means it
+    leaked, so the whole family descended from that login is revoked.
+    """
+    invalid_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    result = await db.execute(
+        select(RefreshToken).where(RefreshToken.token_hash == hash_refresh_token(token))
+    )
+    refresh_token = result.scalars().first()
+    if refresh_token is None:
+        raise invalid_exception
+
+    now = datetime.utcnow()
+    # Conditional update so two concurrent refreshes cannot both spend it
+    spent = await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.id == refresh_token.id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=now)
+    )
+    if spent.rowcount == 0:
+        logger.error(f"Refresh token reuse detected for user ID: {refresh_token.user_id}")
+        await db.execute(
+            update(RefreshToken)
+            .where(RefreshToken.family_id == refresh_token.family_id, RefreshToken.revoked_at.is_(None))
+            .values(revoked_at=now)
+        )
+        await db.commit()
+        raise invalid_exception
+
+    if refresh_token.expires_at <= now:
+        await db.commit()
+        raise invalid_exception
+
+    result = await db.execute(select(User).where(User.id == refresh_token.user_id))
+    user = result.scalars().first()
+    # Password, role or status changes bump token_version and end the family
+    if user is None or not user.is_active or user.token_version != refresh_token.token_version:
+        await db.commit()
+        raise invalid_exception
+
+    new_token = issue_refresh_token(db, user, refresh_token.family_id)
+    await db.commit()
+    return user, new_token
@@ -0,0 +1,82 @@
+from sqlalchemy import select
+from dotenv import load_dotenv
+from app.database import AsyncSessionLocal
+from app.models.user import DeletedUser, User
+import asyncio
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+# How often stateless workers re-read token versions from the database
+TOKEN_REVOCATION_REFRESH_SECONDS = float(os.getenv("TOKEN_REVOCATION_REFRESH_SECONDS", "30"))
+
+
+class TokenRevocations:
+    """Per-user minimum token_version, for checking tokens without a user lookup
+
+    Only users whose token_version has ever been bumped, and recently
+    deleted users, are tracked, so the set stays small. It is reloaded in
+    the background every refresh_interval seconds; a token whose "ver"
+    claim is below the tracked version is revoked.
+    """
+
+    def __init__(self, refresh_interval: float = TOKEN_REVOCATION_REFRESH_SECONDS):
+        self.refresh_interval = refresh_interval
+        self.versions = {}
+        self.refreshed_at = None
+        self._refresh_task = None
+
+    def is_revoked(self, user_id: str, token_version: int) -> bool:
+        return token_version < self.versions.get(user_id, 0)
+
+    def revoke(self, user_id: str, token_version: float):
+        """Record a new minimum version on this worker ahead of the next refresh"""
+        if token_version > self.versions.get(user_id, 0):
+            self.versions[user_id] = token_version
+
+    async def refresh(self):
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(User.id, User.token_version).where(User.token_version > 0)
+            )
+            versions = {row.id: row.token_version for row in result}
+            # A deleted user has no row to carry a version; revoke every token
+            result = await db.execute(select(DeletedUser.user_id))
+            versions.update((user_id, float("inf")) for user_id in result.scalars())
+        # Keep local revocations the database does not show yet
+        for user_id, token_version in self.versions.items():
+            if token_version > versions.get(user_id, 0):
+                versions[user_id] = token_version
+        self.versions = versions
+        self.refreshed_at = time.monotonic()
+
+    async def _refresh_in_background(self):
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.error(f"Token revocation refresh failed: {str(e)}")
+        finally:
+            self._refresh_task = None
+
+    async def ensure_fresh(self):
+        """Load the set on first use, then refresh it in the background when stale"""
+        if self.refreshed_at is None:
+            await self.refresh()
+        else:
+            self.maybe_refresh()
+
+    def maybe_refresh(self):
+        """Start a background refresh if the set is stale; never waits for it"""
+        if self._refresh_task is not None:
+            return
+        if self.refreshed_at is not None and time.monotonic() - self.refreshed_at < self.refresh_interval:
+            return
+        self._refresh_task = asyncio.get_running_loop().create_task(self._refresh_in_background())
+
+
+token_revocations = TokenRevocations()
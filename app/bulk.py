@@ -0,0 +1,36 @@
+from fastapi import HTTPException, status
+from pydantic import BaseModel, ValidationError
+from dotenv import load_dotenv
+from typing import Any, List, Type
+import os
+
+# Load environment variables
+load_dotenv()
+
+# Largest number of items a single bulk request may carry
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "500"))
+
+
+def check_batch_size(count: int):
+    """Reject bulk requests larger than BULK_MAX_ITEMS"""
+    if count > BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {BULK_MAX_ITEMS} items can be sent in one request, got {count}"
+        )
+
+
+def validate_items(items: List[Any], schema: Type[BaseModel]):
+    """Validate each item on its own and return (valid, errors)
+
+    valid is a list of (index, model) pairs and errors a list of
+    {"index": ..., "errors": [...]} entries, so a bad item can be reported
+    against its position without failing the whole request.
+    """
+    valid, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, schema.model_validate(item)))
+        except ValidationError as exc:
+            errors.append({"index": index, "errors": exc.errors(include_url=False, include_context=False)})
+    return valid, errors
@@ -0,0 +1,138 @@
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+from sqlalchemy import func, insert, or_, select
+from typing import Optional
+from app.models.user import PurchaseOrderChange, UserRole
+from app.workflow import stage_for_reviewer
+import os
+
+# Load environment variables
+load_dotenv()
+
+# Days of change log kept by prune_changes.py; clients that have not synced
+# for longer must fetch their full list again
+CHANGE_RETENTION_DAYS = int(os.getenv("CHANGE_RETENTION_DAYS", "30"))
+# Changes newer than this are not served yet. Ids are taken at insert time
+# but become visible at commit, so an id can appear after a higher one; the
+# feed stops short of the recent ones so a reader never moves its cursor past
+# an id still to commit. Must exceed the longest gap between a change row's
+# insert and its commit, plus the clock skew between workers
+CHANGE_FEED_LAG_SECONDS = float(os.getenv("CHANGE_FEED_LAG_SECONDS", "2"))
+
+
+def change_row(purchase_order_id, requested_by, assigned_role, previous_assigned_role=None,
+               approval_id=None, changed_at: Optional[datetime] = None) -> dict:
+    """Change log row for an order that was created, or moved to assigned_role
+
+    Leave changed_at out outside of seeding: the column default stamps the
+    insert time, which CHANGE_FEED_LAG_SECONDS is measured against.
+    """
+    row = {
+        "purchase_order_id": purchase_order_id,
+        "approval_id": approval_id,
+        "requested_by": requested_by,
+        "assigned_role": assigned_role,
+        "previous_assigned_role": previous_assigned_role,
+    }
+    if changed_at is not None:
+        row["changed_at"] = changed_at
+    return row
+
+
+async def record_changes(db, rows: list):
+    """Append rows to the change log; the caller commits
+
+    Call it last before the commit: the feed only holds back changes for
+    CHANGE_FEED_LAG_SECONDS after their insert, so a transaction that
+    commits later than that can have its change skipped by a reader.
+    """
+    if rows:
+        await db.execute(insert(PurchaseOrderChange), rows)
+
+
+def change_criteria(current_user):
+    """WHERE criteria for the changes the caller may see, or None if the role has no queue
+
+    Mirrors the caller's list: their own orders for employees, everything
+    for the MD, and orders entering or leaving the inbox for other reviewers.
+    """
+    if current_user.role == UserRole.EMPLOYEE:
+        return [PurchaseOrderChange.requested_by == current_user.id]
+    if current_user.role == UserRole.MD:
+        return []
+    if stage_for_reviewer(current_user.role) is not None:
+        return [or_(
+            PurchaseOrderChange.assigned_role == current_user.role,
+            PurchaseOrderChange.previous_assigned_role == current_user.role
+        )]
+    return None
+
+
+def build_changes_query(criteria: list, after: int, limit: int, horizon: Optional[int] = None):
+    """Select (id, purchase_order_id, approval_id) of the next changes after a cursor, below horizon"""
+    query = select(
+        PurchaseOrderChange.id, PurchaseOrderChange.purchase_order_id, PurchaseOrderChange.approval_id
+    ).where(PurchaseOrderChange.id > after, *criteria)
+    if horizon is not None:
+        query = query.where(PurchaseOrderChange.id < horizon)
+    return query.order_by(PurchaseOrderChange.id).limit(limit)
+
+
+def horizon_query():
+    """Select (lowest id, count) of the changes made within CHANGE_FEED_LAG_SECONDS
+
+    The count is there for the plan: alone, SQLite answers min(id) by
+    walking the primary key from the oldest change. With it, both come
+    from the recent end of the changed_at index.
+    """
+    recent = datetime.utcnow() - timedelta(seconds=CHANGE_FEED_LAG_SECONDS)
+    return select(func.min(PurchaseOrderChange.id), func.count()).where(PurchaseOrderChange.changed_at > recent)
+
+
+async def feed_horizon(db) -> Optional[int]:
+    """The id the feed must stay below, or None if nothing changed within the lag"""
+    return (await db.execute(horizon_query())).first()[0]
+
+
+def parse_since(since: str) -> int:
+    """Decode the since= cursor of /purchase-orders/changes"""
+    if not since.isdigit():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid changes cursor"
+        )
+    return int(since)
+
+
+def head_cursor_query():
+    return select(func.coalesce(func.max(PurchaseOrderChange.id), 0))
+
+
+async def head_cursor(db) -> int:
+    """The cursor a new client starts from: the newest change below the horizon"""
+    horizon = await feed_horizon(db)
+    if horizon is not None:
+        return horizon - 1
+    return (await db.execute(head_cursor_query())).scalar_one()
+
+
+async def check_retained(db, since: int):
+    """Raise 410 if changes after since may already have been pruned
+
+    prune_changes.py always keeps the newest row, so a cursor past the
+    newest id, or any cursor once the log is empty, comes from a log that
+    was emptied or recreated since it was issued.
+    """
+    oldest, newest = (await db.execute(
+        select(func.min(PurchaseOrderChange.id), func.max(PurchaseOrderChange.id))
+    )).one()
+    if newest is None:
+        gone = since > 0
+    else:
+        gone = since < oldest - 1 or since > newest
+    if gone:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="This cursor is older than the change log; fetch the full list and sync from a new cursor"
+        )
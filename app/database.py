@@ -1,9 +1,14 @@
-from sqlalchemy import create_engine, text  # Add text import
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.engine import URL, make_url
+import asyncio
 import os
+import threading
 from dotenv import load_dotenv
+from app.metrics import METRICS_ENABLED, TimedAsyncQueuePool, TimedQueuePool, instrument_engine
+from app import profiling
 import logging
 
 # Configure logging
@@ -17,11 +22,41 @@ load_dotenv()
 DB_USER = os.getenv("DB_USER")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
 DB_HOST = os.getenv("DB_HOST")
+DB_PORT = os.getenv("DB_PORT")
 DB_NAME = os.getenv("DB_NAME")
 
-# Add debug logging for environment variables
-logger.info("Checking environment variables...")
-if not all([DB_USER, DB_PASSWORD, DB_HOST, DB_NAME]):
+# Connection pool of each MySQL engine; SQLite does not use a sized pool
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() == "true"
+# Connections the API opens at startup so the first requests skip the
+# handshake; 0 leaves the pool to fill on demand
+DB_POOL_PREWARM = int(os.getenv("DB_POOL_PREWARM", "0"))
+
+# Sync drivers used by scripts (seed_db.py, alembic) mapped to the
+# asyncio driver the application itself runs on
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def get_async_url(url: str) -> str:
+    """Return the asyncio-driver equivalent of a sync database URL"""
+    parsed = make_url(url)
+    drivername = ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername)
+    return parsed.set(drivername=drivername).render_as_string(hide_password=False)
+
+
+# An explicit DATABASE_URL (e.g. the SQLite fallback exported by
+# setup_and_run.sh) takes precedence over the MySQL settings
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+if not DATABASE_URL and not all([DB_USER, DB_PASSWORD, DB_HOST, DB_NAME]):
     missing = [
         var for var, val in {
             "DB_USER": DB_USER,
@@ -34,41 +69,120 @@ if not all([DB_USER, DB_PASSWORD, DB_HOST, DB_NAME]):
     raise ValueError("Missing required environment variables")
 
 # Construct Database URL
-DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
-logger.info(f"Attempting to connect with user '{DB_USER}' to host '{DB_HOST}'")
-
-# After constructing DATABASE_URL, add:
-logger.info(f"Attempting to connect to MySQL at: {DB_HOST}")
-
-try:
-    # Create SQLAlchemy engine with connection pool settings
-    engine = create_engine(
-        DATABASE_URL,
-        pool_size=5,
-        max_overflow=10,
-        pool_timeout=30,
-        pool_recycle=1800
-    )
-    
-    # Test the connection using text()
-    with engine.connect() as conn:
-        conn.execute(text("SELECT 1"))
-        logger.info("Successfully connected to MySQL database")
-        
-except SQLAlchemyError as e:
-    logger.error(f"Database connection error: {str(e)}")
-    raise
-
-# Create SessionLocal class
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+if not DATABASE_URL:
+    DATABASE_URL = URL.create(
+        "mysql+pymysql", username=DB_USER, password=DB_PASSWORD, host=DB_HOST,
+        port=int(DB_PORT) if DB_PORT else None, database=DB_NAME
+    ).render_as_string(hide_password=False)
+
+ASYNC_DATABASE_URL = get_async_url(DATABASE_URL)
+IS_SQLITE = make_url(DATABASE_URL).get_backend_name() == "sqlite"
+
+if IS_SQLITE:
+    engine_options = {"connect_args": {"check_same_thread": False}}
+else:
+    engine_options = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING
+    }
+
+# Sessions are bound once the engines exist; see init_engines()
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+
+# Objects stay loaded after commit so handlers can return them without a
+# lazy load outside the event loop.
+AsyncSessionLocal = async_sessionmaker(
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
 
 # Create Base class
 Base = declarative_base()
 
+_engines_lock = threading.Lock()
+
+
+def init_engines():
+    """Create the engines and bind the session factories, once
+
+    Neither engine connects here: connections are made on first use, so
+    importing the application does not need the database to be up.
+    """
+    global engine, async_engine
+    with _engines_lock:
+        if "async_engine" in globals():
+            return
+        logger.info(f"Using database at: {make_url(DATABASE_URL).render_as_string()}")
+        # Scripts and migrations use the sync engine, the API the async one;
+        # each has its own pool
+        sync_options, async_options = dict(engine_options), dict(engine_options)
+        if METRICS_ENABLED and not IS_SQLITE:
+            # Pools that also time how long each checkout waits
+            sync_options["poolclass"] = TimedQueuePool
+            async_options["poolclass"] = TimedAsyncQueuePool
+        engine = create_engine(DATABASE_URL, **sync_options)
+        async_engine = create_async_engine(ASYNC_DATABASE_URL, **async_options)
+        if METRICS_ENABLED:
+            instrument_engine(engine, "sync")
+            instrument_engine(async_engine.sync_engine, "async")
+        profiling.instrument_engine(engine)
+        profiling.instrument_engine(async_engine.sync_engine)
+        SessionLocal.configure(bind=engine)
+        AsyncSessionLocal.configure(bind=async_engine)
+
+
+def __getattr__(name):
+    # `from app.database import engine` creates the engines on first use,
+    # for the scripts and benchmarks that run without the app's lifespan
+    if name in ("engine", "async_engine"):
+        init_engines()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+async def prewarm_pool(connections: int = DB_POOL_PREWARM):
+    """Open up to `connections` pooled connections and return them to the pool idle"""
+    init_engines()
+    if IS_SQLITE:
+        connections = min(connections, 1)  # Not pooled; this only checks the file opens
+    else:
+        connections = min(connections, DB_POOL_SIZE)
+    if connections <= 0:
+        return
+    # The first connection initialises the dialect; SQLAlchemy's first-connect
+    # hook can deadlock when several tasks race to make it. All are held
+    # until the last opens, so each is a separate connection
+    first = await async_engine.connect()
+    holding = [first]
+    try:
+        await first.execute(text("SELECT 1"))
+        holding += await asyncio.gather(*[async_engine.connect().start() for _ in range(connections - 1)])
+    finally:
+        await asyncio.gather(*[conn.close() for conn in holding])
+    logger.info(f"Opened {connections} database connection(s) at startup")
+
+
+async def dispose_engines():
+    """Close pooled connections on shutdown"""
+    if "async_engine" in globals():
+        await async_engine.dispose()
+        engine.dispose()
+
+
 # Dependency to get DB session
-def get_db():
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# Sync session for scripts and benchmarks that run outside the event loop
+def get_sync_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
@@ -0,0 +1,56 @@
+from datetime import datetime
+from typing import Optional
+from fastapi import HTTPException, Response, status
+
+
+def version_etag(version: int) -> str:
+    """Strong ETag for a row at the given version"""
+    return f'"{version}"'
+
+
+def if_match_version(if_match: Optional[str]) -> Optional[int]:
+    """Version a client's If-Match header asks for, or None if it names none
+
+    Only single ETags as issued by version_etag are understood; anything
+    else (weak or unknown tags) cannot match the current row and fails
+    the precondition.
+    """
+    if if_match is None or if_match.strip() == "*":
+        return None
+    try:
+        return int(if_match.strip().strip('"'))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="If-Match does not match the current version"
+        )
+
+
+def queue_etag(count: int, high_water: Optional[datetime]) -> str:
+    """Weak ETag for a queue listing from its row count and latest change
+
+    Any order entering, leaving or changing within the queue moves one of
+    the two, so neither the rows nor the response body are needed.
+    """
+    stamp = high_water.isoformat() if high_water else "-"
+    return f'W/"{count}-{stamp}"'
+
+
+def if_none_match_hit(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether If-None-Match names the current ETag (weak comparison)"""
+    if if_none_match is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    current = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == current:
+            return True
+    return False
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
@@ -0,0 +1,274 @@
+from collections import deque
+from dotenv import load_dotenv
+from typing import Optional
+from app.models.user import UserRole
+import asyncio
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+# "local://" for the in-process stand-in, "redis://host:port/db" across workers
+PURCHASE_ORDER_EVENTS_URL = os.getenv("PURCHASE_ORDER_EVENTS_URL", "local://")
+PURCHASE_ORDER_EVENTS_STREAM = "purchase-order-events"
+# Events kept for Last-Event-ID resume
+EVENT_HISTORY_SIZE = int(os.getenv("EVENT_HISTORY_SIZE", "1000"))
+# Events a slow subscriber may fall behind by before its stream is closed;
+# it resumes from Last-Event-ID when the client reconnects
+EVENT_SUBSCRIBER_BACKLOG = int(os.getenv("EVENT_SUBSCRIBER_BACKLOG", "1000"))
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+
+
+def event_order(event_id: str) -> tuple:
+    """Sort key for ids from either backend, both <milliseconds>-<sequence> (1700000000000-0)"""
+    return tuple(int(part) for part in event_id.split("-"))
+
+
+def purchase_order_event(event_type: str, purchase_order, previous_assigned_role=None) -> dict:
+    """Event body for a purchase order that was created or changed status
+
+    purchase_order is the order after the change: a PurchaseOrder, or a
+    dict of its columns such as a bulk insert row.
+    """
+    if isinstance(purchase_order, dict):
+        values = purchase_order
+    else:
+        values = {name: getattr(purchase_order, name) for name in (
+            "id", "status", "assigned_role", "requested_by", "cost", "vendor_name", "version"
+        )}
+    assigned_role = values.get("assigned_role")
+    return {
+        "type": event_type,
+        "id": str(values["id"]),
+        "status": values["status"].value,
+        "assigned_role": assigned_role.value if assigned_role else None,
+        "previous_assigned_role": previous_assigned_role.value if previous_assigned_role else None,
+        "requested_by": str(values["requested_by"]),
+        "cost": values["cost"],
+        "vendor_name": values["vendor_name"],
+        "version": values.get("version") or 0,
+    }
+
+
+def event_in_queue(event: dict, user) -> bool:
+    """Whether an event concerns an order in (or just leaving) the user's queue"""
+    if user.role == UserRole.EMPLOYEE:
+        return event["requested_by"] == str(user.id)
+    if user.role == UserRole.MD:
+        return True
+    return user.role.value in (event["assigned_role"], event["previous_assigned_role"])
+
+
+class LocalEventBackend:
+    """In-process stand-in for a shared event log: one worker sees its own events"""
+
+    def __init__(self, history_size: int = EVENT_HISTORY_SIZE):
+        self.history = deque(maxlen=history_size)
+        self.subscribers = []
+        # Ids start again at 1 in a new process, so they carry its start
+        # time; an id from before a restart is never mistaken for a new one
+        self._epoch = int(time.time() * 1000)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    def publish(self, event: dict):
+        with self._lock:
+            event_id = f"{self._epoch}-{next(self._ids)}"
+            self.history.append((event_id, event))
+        for callback in self.subscribers:
+            callback(event_id, event)
+
+    def replay(self, after_id: str) -> Optional[list]:
+        """Events after after_id, or None if it is not within the kept history
+
+        An id older than the history may have missed events that were
+        dropped; one newer than the history, or from another process, was
+        issued before a restart, and whatever followed it is unknown.
+        """
+        with self._lock:
+            history = list(self.history)
+        if not history:
+            return None
+        after = event_order(after_id)
+        oldest = event_order(history[0][0])
+        newest = event_order(history[-1][0])
+        if len(after) != 2 or after[0] != self._epoch or not oldest[1] - 1 <= after[1] <= newest[1]:
+            return None
+        return [(event_id, event) for event_id, event in history if event_order(event_id) > after]
+
+
+class RedisEventBackend:
+    """Redis stream shared by every worker; the stream doubles as resume history"""
+
+    def __init__(self, url: str, stream: str = PURCHASE_ORDER_EVENTS_STREAM,
+                 history_size: int = EVENT_HISTORY_SIZE):
+        import redis  # Optional dependency, only needed for cross-worker events
+
+        self.client = redis.Redis.from_url(url)
+        self.stream = stream
+        self.history_size = history_size
+
+    def subscribe(self, callback):
+        def listen():
+            last_id = "$"
+            while True:
+                try:
+                    for _, entries in self.client.xread({self.stream: last_id}, block=5000) or []:
+                        for event_id, fields in entries:
+                            last_id = event_id
+                            callback(event_id.decode(), json.loads(fields[b"data"]))
+                except Exception as e:
+                    logger.error(f"Event stream read failed: {str(e)}")
+                    threading.Event().wait(1)
+
+        threading.Thread(target=listen, daemon=True).start()
+
+    def publish(self, event: dict):
+        self.client.xadd(
+            self.stream, {"data": json.dumps(event)}, maxlen=self.history_size, approximate=True
+        )
+
+    def replay(self, after_id: str) -> Optional[list]:
+        """Events after after_id, or None if it is not within the kept stream"""
+        first = self.client.xrange(self.stream, count=1)
+        last = self.client.xrevrange(self.stream, count=1)
+        after = event_order(after_id)
+        # Older than the stream: some events may have been trimmed. Newer:
+        # the stream was deleted or replaced since the id was issued
+        if not first or event_order(first[0][0].decode()) > after or event_order(last[0][0].decode()) < after:
+            return None
+        entries = self.client.xrange(self.stream, min=f"({after_id}")
+        return [(event_id.decode(), json.loads(fields[b"data"])) for event_id, fields in entries]
+
+
+def create_event_backend(url):
+    """Build the event backend named by PURCHASE_ORDER_EVENTS_URL"""
+    if url.startswith("local://"):
+        return LocalEventBackend()
+    if url.startswith(("redis://", "rediss://")):
+        return RedisEventBackend(url)
+    raise ValueError(f"Unsupported PURCHASE_ORDER_EVENTS_URL: {url}")
+
+
+class Subscription:
+    """Live events for one SSE connection, already filtered to the user's queue"""
+
+    def __init__(self, broker, user):
+        self.broker = broker
+        self.user = user
+        self.queue = asyncio.Queue(maxsize=EVENT_SUBSCRIBER_BACKLOG)
+        self.overflowed = False
+
+    def offer(self, event_id: str, event: dict):
+        if self.overflowed or not event_in_queue(event, self.user):
+            return
+        try:
+            self.queue.put_nowait((event_id, event))
+        except asyncio.QueueFull:
+            # Drop what the reader has not taken and tell it to close the
+            # stream; the client resumes from the last event it did receive
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+    def close(self):
+        self.broker.subscriptions.discard(self)
+
+
+class EventBroker:
+    """Fans purchase-order events out to the SSE connections of this worker"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.subscriptions = set()
+        self._loop = None
+        backend.subscribe(self._dispatch)
+
+    def publish(self, event: dict):
+        try:
+            self.backend.publish(event)
+        except Exception as e:
+            # Events are a notification channel; the write they describe
+            # has already committed and must not fail because of them
+            logger.error(f"Failed to publish purchase order event: {str(e)}")
+
+    def _dispatch(self, event_id: str, event: dict):
+        # Backends may deliver from their own thread
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._fan_out, event_id, event)
+
+    def _fan_out(self, event_id: str, event: dict):
+        for subscription in list(self.subscriptions):
+            subscription.offer(event_id, event)
+
+    def subscribe(self, user) -> Subscription:
+        self._loop = asyncio.get_running_loop()
+        subscription = Subscription(self, user)
+        self.subscriptions.add(subscription)
+        return subscription
+
+    def replay(self, after_id: str, user) -> Optional[list]:
+        """Missed events in the user's queue after after_id, or None if they are gone"""
+        try:
+            events = self.backend.replay(after_id)
+        except ValueError:
+            # Not an id this broker issued
+            return None
+        if events is None:
+            return None
+        return [(event_id, event) for event_id, event in events if event_in_queue(event, user)]
+
+
+def format_sse(event_type: str, data: dict, event_id: Optional[str] = None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def sse_stream(broker: EventBroker, user, last_event_id: Optional[str]):
+    """Yield SSE messages: missed events first when resuming, then live ones"""
+    # Subscribe before replaying so nothing published in between is lost
+    subscription = broker.subscribe(user)
+    try:
+        last_sent = None
+        if last_event_id is not None:
+            missed = broker.replay(last_event_id, user)
+            if missed is None:
+                # Too far behind to replay; the client should refetch its list
+                yield format_sse("resync", {})
+            else:
+                for event_id, event in missed:
+                    yield format_sse(event["type"], event, event_id)
+                    last_sent = event_order(event_id)
+        while True:
+            try:
+                item = await asyncio.wait_for(subscription.queue.get(), SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if item is None:
+                return
+            event_id, event = item
+            # Live events that were also part of the replay
+            if last_sent is not None and event_order(event_id) <= last_sent:
+                continue
+            yield format_sse(event["type"], event, event_id)
+    finally:
+        subscription.close()
+
+
+event_broker = EventBroker(create_event_backend(PURCHASE_ORDER_EVENTS_URL))
@@ -0,0 +1,208 @@
+from datetime import date, datetime, time, timedelta
+from dotenv import load_dotenv
+from typing import Optional
+from fastapi import HTTPException, status
+from sqlalchemy import select
+from app.database import AsyncSessionLocal
+from app.models.user import Approval, PurchaseOrder
+import csv
+import enum
+import importlib.util
+import io
+import os
+
+# Load environment variables
+load_dotenv()
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "2000"))
+# Rows per Parquet row group; one group is held in memory while it is encoded
+PARQUET_ROW_GROUP_SIZE = int(os.getenv("PARQUET_ROW_GROUP_SIZE", "10000"))
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# One row per approval, or one row with empty approval columns for an
+# order that has none yet
+EXPORT_COLUMNS = [
+    ("purchase_order_id", PurchaseOrder.id),
+    ("item_name", PurchaseOrder.item_name),
+    ("quantity", PurchaseOrder.quantity),
+    ("cost", PurchaseOrder.cost),
+    ("description", PurchaseOrder.description),
+    ("vendor_name", PurchaseOrder.vendor_name),
+    ("requested_by", PurchaseOrder.requested_by),
+    ("status", PurchaseOrder.status),
+    ("assigned_role", PurchaseOrder.assigned_role),
+    ("created_at", PurchaseOrder.created_at),
+    ("updated_at", PurchaseOrder.updated_at),
+    ("version", PurchaseOrder.version),
+    ("approval_id", Approval.id),
+    ("approved_by", Approval.approved_by),
+    ("approval_role", Approval.role),
+    ("approval_status", Approval.status),
+    ("approval_comments", Approval.comments),
+    ("approved_at", Approval.approved_at),
+]
+EXPORT_COLUMN_NAMES = [name for name, _ in EXPORT_COLUMNS]
+
+
+def export_query(date_from: Optional[date], date_to: Optional[date]):
+    """Orders created between the two dates (both inclusive) joined with their approvals"""
+    query = (
+        select(*[column.label(name) for name, column in EXPORT_COLUMNS])
+        .select_from(PurchaseOrder)
+        .outerjoin(Approval, Approval.purchase_order_id == PurchaseOrder.id)
+        # Walks ix_purchase_orders_created_at, then each order's approvals
+        # through ix_approvals_purchase_order_id_approved_at, so the database
+        # never sorts the whole export
+        .order_by(PurchaseOrder.created_at, PurchaseOrder.id, Approval.approved_at)
+    )
+    if date_from is not None:
+        query = query.where(PurchaseOrder.created_at >= datetime.combine(date_from, time.min))
+    if date_to is not None:
+        query = query.where(PurchaseOrder.created_at < datetime.combine(date_to + timedelta(days=1), time.min))
+    return query
+
+
+def export_filename(export_format: str, date_from: Optional[date], date_to: Optional[date]) -> str:
+    span = "-".join(value.isoformat() for value in (date_from, date_to) if value is not None)
+    return f"purchase-orders{'-' + span if span else ''}.{export_format}"
+
+
+def check_export_format(export_format: str):
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown export format: {export_format}. Allowed: {', '.join(EXPORT_FORMATS)}"
+        )
+    if export_format == "parquet":
+        # Optional dependency, only needed for Parquet export
+        if importlib.util.find_spec("pyarrow") is None:
+            raise HTTPException(
+                status_code=status.HTTP_501_NOT_IMPLEMENTED,
+                detail="Parquet export needs the pyarrow package on the server"
+            )
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+async def _partitions(query):
+    # The export outlives the request-scoped session, so it opens its own
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for rows in result.partitions():
+            yield rows
+
+
+async def stream_csv(query):
+    """Yield the export as CSV, one chunk per batch of rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMN_NAMES)
+    async for rows in _partitions(query):
+        writer.writerows([_csv_value(value) for value in row] for row in rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+class _ChunkSink:
+    """Write-only file for ParquetWriter whose bytes are handed on as they arrive"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _parquet_schema(pa):
+    return pa.schema([
+        ("purchase_order_id", pa.string()),
+        ("item_name", pa.string()),
+        ("quantity", pa.int64()),
+        ("cost", pa.float64()),
+        ("description", pa.string()),
+        ("vendor_name", pa.string()),
+        ("requested_by", pa.string()),
+        ("status", pa.string()),
+        ("assigned_role", pa.string()),
+        ("created_at", pa.timestamp("us")),
+        ("updated_at", pa.timestamp("us")),
+        ("version", pa.int64()),
+        ("approval_id", pa.string()),
+        ("approved_by", pa.string()),
+        ("approval_role", pa.string()),
+        ("approval_status", pa.string()),
+        ("approval_comments", pa.string()),
+        ("approved_at", pa.timestamp("us")),
+    ])
+
+
+async def stream_parquet(query, row_group_size: int = PARQUET_ROW_GROUP_SIZE):
+    """Yield the export as Parquet, one chunk per row group and then the footer"""
+    import pyarrow as pa  # Optional dependency, only needed for Parquet export
+    import pyarrow.parquet as pq
+
+    schema = _parquet_schema(pa)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    # Each fetched batch is converted to Arrow straight away, which is far
+    # more compact than the rows; a row group is written once enough build up
+    batches = []
+    buffered = 0
+
+    def write_row_group():
+        writer.write_table(pa.Table.from_batches(batches, schema=schema), row_group_size=buffered)
+        batches.clear()
+        return sink.drain()
+
+    try:
+        async for rows in _partitions(query):
+            columns = [
+                [value.value if isinstance(value, enum.Enum) else value for value in values]
+                for values in zip(*rows)
+            ]
+            batches.append(pa.RecordBatch.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+            ))
+            buffered += len(rows)
+            if buffered >= row_group_size:
+                yield write_row_group()
+                buffered = 0
+        if buffered:
+            yield write_row_group()
+    finally:
+        writer.close()
+    yield sink.drain()
@@ -1,11 +1,28 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import users, auth, purchase_orders
+from app.routers import users, auth, purchase_orders, metrics
+from app.auth.passwords import password_hasher
+from app.database import dispose_engines, init_engines, prewarm_pool
+from app.metrics import METRICS_ENABLED, MetricsMiddleware
+from app.profiling import ProfilingMiddleware
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The schema is managed by Alembic (alembic upgrade head), not created here
+    init_engines()
+    await prewarm_pool()
+    yield
+    await dispose_engines()
+    password_hasher.shutdown()
+
 
 app = FastAPI(
     title="Purchase Order Management System",
     description="API for managing purchase orders and approvals",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -17,11 +34,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outside CORS, so preflight requests are measured too
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+# Outermost, so a profile covers everything else the request runs through
+app.add_middleware(ProfilingMiddleware)
+
 # Include routers
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 app.include_router(users.router, prefix="/users", tags=["Users"])
 app.include_router(purchase_orders.router, prefix="/purchase-orders", tags=["Purchase Orders"])
+if METRICS_ENABLED:
+    app.include_router(metrics.router)
 
 @app.get("/")
 async def root():
-    return {"message": "Welcome to Purchase Order Management System API"}
\ No newline at end of file
+    return {"message": "Welcome to Purchase Order Management System API"}
@@ -0,0 +1,379 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dotenv import load_dotenv
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from time import perf_counter
+import asyncio
+import functools
+import math
+import os
+import threading
+
+# Load environment variables
+load_dotenv()
+
+# Request, SQL and pool metrics served at GET /metrics in the Prometheus
+# text format. Each worker process keeps and reports its own numbers
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# JWT decode, user lookup and serialization take microseconds to milliseconds
+PHASE_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+# Route label of requests that matched no route, so unknown paths do not
+# each make a new series
+UNMATCHED_ROUTE = "unmatched"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """Monotonic total per label values"""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple = (), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Gauge:
+    """Current values, read from `collect` when scraped"""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple, collect):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.collect = collect
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        for labels, value in sorted(self.collect().items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    """Bucketed observations per label values
+
+    Each observation is one bisect and one increment under a lock; the
+    buckets are only made cumulative when scraped.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple, buckets: tuple):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # Label values -> per-bucket counts, the last one +Inf, then the sum
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, labels: tuple = ()):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            all_series = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in all_series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), series):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(series[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time from receiving a request to the end of its response body.",
+    ("method", "route", "status"), LATENCY_BUCKETS
+)
+REQUEST_STATEMENTS = Histogram(
+    "http_request_db_statements", "SQL statements executed per request.", ("route",), STATEMENT_BUCKETS
+)
+REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds", "Time per request spent executing SQL statements.", ("route",), LATENCY_BUCKETS
+)
+REQUEST_PHASE_SECONDS = Histogram(
+    "http_request_phase_seconds",
+    "Time per request spent in jwt_decode, user_lookup and serialization.",
+    ("route", "phase"), PHASE_BUCKETS
+)
+DB_STATEMENTS = Counter("db_statements_total", "SQL statements executed.", ("engine",))
+DB_SECONDS = Counter("db_statement_seconds_total", "Time spent executing SQL statements.", ("engine",))
+POOL_CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_seconds", "Time to get a pooled connection, waiting for one or opening it.",
+    ("engine",), PHASE_BUCKETS
+)
+POOL_TIMEOUTS = Counter(
+    "db_pool_checkout_timeouts_total", "Checkouts that gave up after the pool timeout.", ("engine",)
+)
+
+# (label, engine) of every instrumented engine, and their checked-out
+# connection counts, kept by the pool checkout and checkin events
+_engines = []
+_checked_out = {}
+
+
+def _pool_stats(read) -> dict:
+    stats = {}
+    for label, engine in _engines:
+        value = read(label, engine.pool)
+        if value is not None:
+            stats[(label,)] = value
+    return stats
+
+
+def _pool_size(label, pool):
+    return pool.size() if isinstance(pool, QueuePool) else None
+
+
+def _pool_overflow(label, pool):
+    # QueuePool counts overflow from -pool_size while the pool fills
+    return max(pool.overflow(), 0) if isinstance(pool, QueuePool) else None
+
+
+POOL_SIZE = Gauge("db_pool_size", "Connections each pool keeps open.", ("engine",),
+                  lambda: _pool_stats(_pool_size))
+POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Connections currently in use.", ("engine",),
+                         lambda: _pool_stats(lambda label, pool: _checked_out.get(label, 0)))
+POOL_OVERFLOW = Gauge("db_pool_overflow", "Connections open beyond the pool size.", ("engine",),
+                      lambda: _pool_stats(_pool_overflow))
+
+REGISTRY = [
+    REQUEST_DURATION, REQUEST_STATEMENTS, REQUEST_DB_SECONDS, REQUEST_PHASE_SECONDS,
+    DB_STATEMENTS, DB_SECONDS, POOL_SIZE, POOL_CHECKED_OUT, POOL_OVERFLOW, POOL_CHECKOUT_SECONDS,
+    POOL_TIMEOUTS,
+]
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class RequestMetrics:
+    """What one request has spent so far, filled in as it runs"""
+    __slots__ = ("statements", "db_seconds", "phases", "endpoint_returned")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.phases = {}
+        self.endpoint_returned = None
+
+    def add(self, phase: str, seconds: float):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+
+# Set by MetricsMiddleware for the duration of each HTTP request. Engine
+# events see it too, as SQLAlchemy runs them in the caller's context
+current_request = ContextVar("current_request_metrics", default=None)
+
+
+@contextmanager
+def timed(phase: str):
+    """Add the time spent in the block to the current request's `phase`"""
+    state = current_request.get()
+    if state is None:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        state.add(phase, perf_counter() - start)
+
+
+# Endpoint -> route path template, filled in from the app's routes
+_route_paths = {}
+
+
+def route_label(scope) -> str:
+    """Path template of the route that served a request, e.g. /purchase-orders/{id}"""
+    # The router leaves the matched endpoint in the scope
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return UNMATCHED_ROUTE
+    path = _route_paths.get(endpoint)
+    if path is None:
+        for route in scope["app"].routes:
+            if hasattr(route, "endpoint"):
+                _route_paths.setdefault(route.endpoint, route.path)
+        path = _route_paths.setdefault(endpoint, UNMATCHED_ROUTE)
+    return path
+
+
+class MetricsMiddleware:
+    """Records the latency, SQL statements and phases of every HTTP request
+
+    Plain ASGI rather than BaseHTTPMiddleware, which would add a task and
+    a body copy to every request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        state = RequestMetrics()
+        token = current_request.set(state)
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = perf_counter() - start
+            current_request.reset(token)
+            route = route_label(scope)
+            REQUEST_DURATION.observe(duration, (scope["method"], route, status_code))
+            REQUEST_STATEMENTS.observe(state.statements, (route,))
+            REQUEST_DB_SECONDS.observe(state.db_seconds, (route,))
+            for phase, seconds in state.phases.items():
+                REQUEST_PHASE_SECONDS.observe(seconds, (route, phase))
+
+def _endpoint_returned():
+    state = current_request.get()
+    if state is not None:
+        state.endpoint_returned = perf_counter()
+
+
+class TimedRoute(APIRoute):
+    """APIRoute that counts the time from the endpoint returning to the
+    response being built (response_model validation and JSON encoding)
+    as the request's serialization phase"""
+
+    def get_route_handler(self):
+        if not METRICS_ENABLED:
+            return super().get_route_handler()
+        endpoint = self.dependant.call
+        if asyncio.iscoroutinefunction(endpoint):
+            async def call(*args, **kwargs):
+                try:
+                    return await endpoint(*args, **kwargs)
+                finally:
+                    _endpoint_returned()
+        else:
+            def call(*args, **kwargs):
+                try:
+                    return endpoint(*args, **kwargs)
+                finally:
+                    _endpoint_returned()
+        self.dependant.call = functools.update_wrapper(call, endpoint)
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            response = await handler(request)
+            state = current_request.get()
+            if state is not None and state.endpoint_returned is not None:
+                state.add("serialization", perf_counter() - state.endpoint_returned)
+            return response
+        return timed_handler
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = perf_counter()
+
+
+def instrument_engine(engine, label: str):
+    """Count and time the statements of a sync engine (or an async engine's sync_engine)"""
+    _engines.append((label, engine))
+    _checked_out[label] = 0
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        seconds = perf_counter() - context._metrics_started
+        DB_STATEMENTS.inc((label,))
+        DB_SECONDS.inc((label,), seconds)
+        state = current_request.get()
+        if state is not None:
+            state.statements += 1
+            state.db_seconds += seconds
+
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        _checked_out[label] += 1
+
+    def checkin(dbapi_connection, connection_record):
+        _checked_out[label] -= 1
+
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "checkout", checkout)
+    event.listen(engine, "checkin", checkin)
+
+
+class _CheckoutTimer:
+    """Pool mixin observing how long each checkout takes"""
+    engine_label = None
+
+    def connect(self):
+        start = perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            POOL_TIMEOUTS.inc((self.engine_label,))
+            raise
+        finally:
+            POOL_CHECKOUT_SECONDS.observe(perf_counter() - start, (self.engine_label,))
+
+
+class TimedQueuePool(_CheckoutTimer, QueuePool):
+    engine_label = "sync"
+
+
+class TimedAsyncQueuePool(_CheckoutTimer, AsyncAdaptedQueuePool):
+    engine_label = "async"
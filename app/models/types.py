@@ -0,0 +1,69 @@
+from sqlalchemy.dialects import mysql
+from sqlalchemy.types import BINARY, DateTime, TypeDecorator
+import os
+import time
+import uuid
+
+
+# MySQL's plain DATETIME keeps whole seconds; SQLite already keeps microseconds
+Timestamp = DateTime().with_variant(mysql.DATETIME(fsp=6), "mysql")
+
+
+def uuid7_int(timestamp_ms: int, random_bits: int) -> int:
+    """The 128-bit value of a UUIDv7 for a millisecond timestamp and 80 random bits"""
+    value = (timestamp_ms & 0xFFFFFFFFFFFF) << 80
+    value |= random_bits & ((1 << 80) - 1)
+    # Version 7 in bits 48-51, RFC 4122 variant in bits 64-65
+    value = (value & ~(0xF << 76)) | (0x7 << 76)
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)
+    return value
+
+
+def uuid7() -> uuid.UUID:
+    """Time-ordered UUID: 48-bit Unix milliseconds followed by random bits (RFC 9562 v7)
+
+    Keys generated this way sort by creation time, so inserts land at the
+    right-hand edge of a clustered index instead of splitting random pages.
+    """
+    timestamp_ms = time.time_ns() // 1_000_000
+    return uuid.UUID(int=uuid7_int(timestamp_ms, int.from_bytes(os.urandom(10), "big")))
+
+
+def new_id() -> str:
+    """Default for primary key columns"""
+    return str(uuid7())
+
+
+class BinaryUUID(TypeDecorator):
+    """UUID stored as BINARY(16), exposed to Python as the canonical string
+
+    The application keeps passing ids around as "xxxxxxxx-xxxx-..." strings
+    (in JWT claims, URLs and pydantic schemas); only storage is compact.
+    """
+    impl = BINARY(16)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if not isinstance(value, uuid.UUID):
+            try:
+                value = uuid.UUID(str(value))
+            except ValueError:
+                # Not a UUID, so it cannot match any stored key; bind a value
+                # that will never match rather than failing the query
+                return b""
+        return value.bytes
+
+    def literal_processor(self, dialect):
+        # Hex blob literal, understood by both MySQL and SQLite; BINARY has
+        # no literal rendering of its own
+        def process(value):
+            value = self.process_bind_param(value, dialect)
+            return "NULL" if value is None else f"X'{value.hex()}'"
+        return process
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return str(uuid.UUID(bytes=bytes(value)))
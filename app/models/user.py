@@ -1,10 +1,10 @@
-from sqlalchemy import Column, String, Boolean, Enum, Float, Text, ForeignKey, Integer, DateTime
+from sqlalchemy import Column, String, Boolean, Enum, Float, Text, ForeignKey, Integer, BigInteger, DateTime, Index
 from sqlalchemy.sql.expression import text
 from sqlalchemy.orm import relationship
 from app.database import Base
+from app.models.types import BinaryUUID, Timestamp, new_id
 from datetime import datetime
 import enum
-import uuid
 
 class UserRole(str, enum.Enum):
     EMPLOYEE = "employee"
@@ -17,18 +17,21 @@ class UserRole(str, enum.Enum):
 class User(Base):
     __tablename__ = "users"
     
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()), index=True)
+    id = Column(BinaryUUID, primary_key=True, default=new_id)
     name = Column(String(100), nullable=False)
     username = Column(String(50), unique=True, index=True, nullable=False)
     email = Column(String(100), unique=True, index=True, nullable=False)
     password_hash = Column(String(255), nullable=False)
     role = Column(Enum(UserRole), default=UserRole.EMPLOYEE, nullable=False)
     is_active = Column(Boolean, default=True, nullable=False)
+    # Bumped to revoke every access token issued before the change
+    token_version = Column(Integer, default=0, server_default=text("0"), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     
     # Relationships
     purchase_orders = relationship("PurchaseOrder", back_populates="requester")
     approvals = relationship("Approval", back_populates="approver")
+    refresh_tokens = relationship("RefreshToken", back_populates="user", cascade="all, delete-orphan")
 
 
 class PurchaseOrderStatus(str, enum.Enum):
@@ -42,19 +45,41 @@ class PurchaseOrderStatus(str, enum.Enum):
 class PurchaseOrder(Base):
     __tablename__ = "purchase_orders"
     
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()), index=True)
+    id = Column(BinaryUUID, primary_key=True, default=new_id)
     item_name = Column(String(100), nullable=False)
     quantity = Column(Integer, nullable=False)
     cost = Column(Float(precision=10), nullable=False)  # Remove 'scale' parameter
     description = Column(Text)
     vendor_name = Column(String(100), nullable=False)
-    requested_by = Column(String(36), ForeignKey("users.id"), nullable=False)
+    requested_by = Column(BinaryUUID, ForeignKey("users.id"), nullable=False)
     status = Column(Enum(PurchaseOrderStatus), default=PurchaseOrderStatus.PENDING, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Reviewer inbox the order sits in, set with status on every transition;
+    # NULL once the order is finished. See app/workflow.py
+    assigned_role = Column(Enum(UserRole))
+    # To the microsecond, as returned on create and encoded in list cursors
+    created_at = Column(Timestamp, default=datetime.utcnow, nullable=False)
+    # Bumped by every state transition; transitions compare-and-set on it
+    version = Column(Integer, default=0, server_default=text("0"), nullable=False)
+    # Time of the last transition; with a row count it makes a queue's ETag.
+    # Kept to the microsecond so two transitions in one second still differ
+    updated_at = Column(Timestamp, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     
     # Relationships
     requester = relationship("User", back_populates="purchase_orders")
     approvals = relationship("Approval", back_populates="purchase_order")
+    
+    # One index per role queue query, and one per queue ETag query; see
+    # alembic/versions/0003_queue_indexes.py, 0006_assigned_role.py and
+    # 0008_updated_at.py
+    __table_args__ = (
+        Index("ix_purchase_orders_requested_by_created_at", "requested_by", "created_at", "id"),
+        Index("ix_purchase_orders_status_created_at", "status", "created_at", "id"),
+        Index("ix_purchase_orders_assigned_role_created_at", "assigned_role", "created_at", "id"),
+        Index("ix_purchase_orders_created_at", "created_at", "id"),
+        Index("ix_purchase_orders_requested_by_updated_at", "requested_by", "updated_at"),
+        Index("ix_purchase_orders_assigned_role_updated_at", "assigned_role", "updated_at"),
+        Index("ix_purchase_orders_updated_at", "updated_at"),
+    )
 
 
 class ApprovalStatus(str, enum.Enum):
@@ -65,9 +90,9 @@ class ApprovalStatus(str, enum.Enum):
 class Approval(Base):
     __tablename__ = "approvals"
     
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()), index=True)
-    purchase_order_id = Column(String(36), ForeignKey("purchase_orders.id"), nullable=False)
-    approved_by = Column(String(36), ForeignKey("users.id"), nullable=False)
+    id = Column(BinaryUUID, primary_key=True, default=new_id)
+    purchase_order_id = Column(BinaryUUID, ForeignKey("purchase_orders.id"), nullable=False)
+    approved_by = Column(BinaryUUID, ForeignKey("users.id"), nullable=False)
     role = Column(String(50), nullable=False)
     status = Column(Enum(ApprovalStatus), nullable=False)
     comments = Column(Text)
@@ -75,4 +100,90 @@ class Approval(Base):
     
     # Relationships
     purchase_order = relationship("PurchaseOrder", back_populates="approvals")
-    approver = relationship("User", back_populates="approvals")
\ No newline at end of file
+    approver = relationship("User", back_populates="approvals")
+    
+    __table_args__ = (
+        Index("ix_approvals_purchase_order_id_approved_at", "purchase_order_id", "approved_at"),
+    )
+
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+    
+    id = Column(BinaryUUID, primary_key=True, default=new_id)
+    # SHA-256 of the token; the token itself is only ever held by the client
+    token_hash = Column(String(64), unique=True, index=True, nullable=False)
+    # Every token rotated from the same login shares a family
+    family_id = Column(BinaryUUID, index=True, nullable=False)
+    user_id = Column(BinaryUUID, ForeignKey("users.id"), nullable=False)
+    token_version = Column(Integer, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    revoked_at = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    # Relationships
+    user = relationship("User", back_populates="refresh_tokens")
+
+
+class DeletedUser(Base):
+    """A deleted user whose access tokens may not have expired yet
+
+    The users row is gone, so there is no token_version left to bump;
+    app/auth/revocation.py revokes every token of the users listed here.
+    Rows older than the access token lifetime are pruned on the next delete.
+    """
+    __tablename__ = "deleted_users"
+
+    user_id = Column(BinaryUUID, primary_key=True)
+    deleted_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+class PurchaseOrderStat(Base):
+    """Running count and spend of purchase orders, one row per rollup key
+
+    Maintained in the same transaction as every create and transition; see
+    app/stats.py. Month is the order's creation month, so an order stays in
+    the same month as it moves through the workflow.
+    """
+    __tablename__ = "purchase_order_stats"
+    
+    status = Column(Enum(PurchaseOrderStatus), primary_key=True)
+    # UserRole value, or "" once the order is finished; part of the key, so
+    # it cannot be NULL
+    assigned_role = Column(String(20), primary_key=True)
+    vendor_name = Column(String(100), primary_key=True)
+    # "YYYY-MM"
+    month = Column(String(7), primary_key=True)
+    order_count = Column(Integer, nullable=False, default=0)
+    total_cost = Column(Float, nullable=False, default=0)
+
+
+
+class PurchaseOrderChange(Base):
+    """Append-only log of purchase order creations and transitions
+
+    Written in the same transaction as the change it records; see
+    app/changes.py. The id is the cursor of GET /purchase-orders/changes,
+    and prune_changes.py drops rows past the retention period.
+    """
+    __tablename__ = "purchase_order_changes"
+    
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    purchase_order_id = Column(BinaryUUID, nullable=False)
+    # The approval made by this transition; NULL for a creation
+    approval_id = Column(BinaryUUID)
+    # Copied from the order so each role's feed is read from one index
+    requested_by = Column(BinaryUUID, nullable=False)
+    assigned_role = Column(Enum(UserRole))
+    # Inbox the order left, so a reviewer also hears about orders leaving it
+    previous_assigned_role = Column(Enum(UserRole))
+    changed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    __table_args__ = (
+        Index("ix_purchase_order_changes_requested_by_id", "requested_by", "id"),
+        Index("ix_purchase_order_changes_assigned_role_id", "assigned_role", "id"),
+        Index("ix_purchase_order_changes_previous_assigned_role_id", "previous_assigned_role", "id"),
+        Index("ix_purchase_order_changes_changed_at", "changed_at"),
+        # Never hand out an id again once pruning has removed it
+        {"sqlite_autoincrement": True},
+    )
@@ -0,0 +1,39 @@
+import base64
+from datetime import datetime
+from fastapi import HTTPException, status
+from sqlalchemy import and_, or_
+
+# Page sizes for keyset-paginated listings
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Rows fetched per round trip when streaming from a server-side cursor
+STREAM_BATCH_SIZE = 500
+
+
+def encode_cursor(created_at: datetime, id: str) -> str:
+    """Encode the (created_at, id) keyset position of a row as an opaque cursor"""
+    raw = f"{created_at.isoformat()}|{id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """Decode a cursor produced by encode_cursor into (created_at, id)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, id = base64.urlsafe_b64decode(padded).decode().split("|", 1)
+        return datetime.fromisoformat(created_at), id
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+
+
+def keyset_after(created_at_column, id_column, cursor: str):
+    """Filter clause selecting rows that sort after the cursor on (created_at, id)"""
+    created_at, id = decode_cursor(cursor)
+    return or_(
+        created_at_column > created_at,
+        and_(created_at_column == created_at, id_column > id)
+    )
@@ -0,0 +1,372 @@
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+from dotenv import load_dotenv
+from jose import JWTError, jwt
+from sqlalchemy import event
+from time import perf_counter
+from app.metrics import route_label
+import asyncio
+import greenlet
+import itertools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+# Request profiles are sampled call stacks written as collapsed stacks
+# ("frame;frame;frame count" lines), which flamegraph.pl, speedscope and
+# inferno read, next to a JSON file of the request's SQL statements.
+# Requests from an admin token sending PROFILE_HEADER are always profiled;
+# with PROFILE_SLOW_MS set every request is sampled and the ones slower
+# than that are kept
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+# Oldest profiles are deleted past either limit
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+PROFILE_MAX_MB = float(os.getenv("PROFILE_MAX_MB", "100"))
+PROFILE_HEADER = b"x-profile"
+
+# Leaf frames for samples taken while the request's task was suspended
+SQL_FRAME = "[sql] "
+WAITING_FRAME = "[waiting]"
+SQL_LABEL_LENGTH = 120
+
+_ids = itertools.count(1)
+_labels = {}
+
+
+class RequestProfile:
+    """Samples and SQL statements of one request in flight"""
+
+    def __init__(self, task, thread_id: int, forced: bool):
+        self.id = f"{datetime.utcnow():%Y%m%dT%H%M%S}-{os.getpid()}-{next(_ids)}"
+        self.task = task
+        self.thread_id = thread_id
+        self.forced = forced
+        # The greenlet running the task; SQLAlchemy's async layer runs ORM
+        # code in child greenlets whose stacks do not link back to it
+        self.greenlet = greenlet.getcurrent()
+        self.root_code = _root_frame(sys._getframe()).f_code
+        self.started = perf_counter()
+        self.stacks = Counter()
+        self.statements = []
+        # (statement, start) while the request waits on the database
+        self.sql_in_flight = None
+
+
+# The profile of the current request, if it is being sampled
+current_profile = ContextVar("current_request_profile", default=None)
+
+
+def _root_frame(frame):
+    while frame.f_back is not None:
+        frame = frame.f_back
+    return frame
+
+
+def _frame_chain(frame) -> list:
+    """Code objects from the outermost frame down to `frame`"""
+    codes = []
+    while frame is not None:
+        codes.append(frame.f_code)
+        frame = frame.f_back
+    codes.reverse()
+    return codes
+
+
+def _await_chain(task) -> list:
+    """Code objects of the coroutines a suspended task is awaiting through"""
+    codes = []
+    awaitable = task.get_coro()
+    while awaitable is not None:
+        frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "gi_frame", None)
+        if frame is None:
+            break
+        codes.append(frame.f_code)
+        awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "gi_yieldfrom", None)
+    return codes
+
+
+class Sampler(threading.Thread):
+    """Daemon thread recording the stack of every profiled request each interval
+
+    Only the event loop thread is sampled. A running request is sampled
+    from its thread's frames, a suspended one from the chain of coroutines
+    it awaits, ending in the SQL statement it waits on, if any.
+    """
+
+    def __init__(self, interval: float):
+        super().__init__(name="request-profiler", daemon=True)
+        self.interval = interval
+        self.profiles = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+
+    def add(self, profile: RequestProfile):
+        with self._lock:
+            self.profiles[profile.id] = profile
+        self._wake.set()
+
+    def remove(self, profile: RequestProfile):
+        with self._lock:
+            self.profiles.pop(profile.id, None)
+
+    def run(self):
+        while True:
+            with self._lock:
+                profiles = list(self.profiles.values())
+            if not profiles:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            frames = sys._current_frames()
+            for profile in profiles:
+                try:
+                    self.sample(profile, frames)
+                except Exception:  # A frame or task torn down mid-walk; skip the sample
+                    pass
+            del frames
+            time.sleep(self.interval)
+
+    def sample(self, profile: RequestProfile, frames: dict):
+        loop = profile.task.get_loop()
+        if asyncio.current_task(loop) is profile.task:
+            codes = _frame_chain(frames.get(profile.thread_id))
+            if codes and codes[0] is not profile.root_code:
+                # Inside a child greenlet; its parent is suspended where it switched
+                codes = _frame_chain(profile.greenlet.gr_frame) + codes
+            # Drop the event loop's own frames above the task
+            outer = profile.task.get_coro().cr_code
+            if outer in codes:
+                codes = codes[codes.index(outer):]
+            stack = tuple(codes)
+        else:
+            in_flight = profile.sql_in_flight
+            leaf = SQL_FRAME + in_flight[0] if in_flight is not None else WAITING_FRAME
+            stack = tuple(_await_chain(profile.task)) + (leaf,)
+        profile.stacks[stack] += 1
+
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def get_sampler() -> Sampler:
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = Sampler(PROFILE_INTERVAL_MS / 1000)
+            _sampler.start()
+    return _sampler
+
+
+def _frame_label(code) -> str:
+    label = _labels.get(code)
+    if label is None:
+        filename = code.co_filename
+        for prefix in sorted({sys.prefix, sys.base_prefix, os.getcwd()}, key=len, reverse=True):
+            if filename.startswith(prefix + os.sep):
+                filename = os.path.relpath(filename, prefix)
+                break
+        name = getattr(code, "co_qualname", code.co_name)
+        # ";" separates frames and a trailing number is the count
+        label = _labels[code] = f"{name} ({filename}:{code.co_firstlineno})".replace(";", ",")
+    return label
+
+
+def _sql_label(statement: str) -> str:
+    return " ".join(statement.split())[:SQL_LABEL_LENGTH].replace(";", ",")
+
+
+def folded_stacks(profile: RequestProfile) -> str:
+    lines = []
+    # A copy, as the sampler may still be finishing a pass over this profile
+    for stack, count in sorted(list(profile.stacks.items()), key=lambda item: item[1], reverse=True):
+        frames = [frame if isinstance(frame, str) else _frame_label(frame) for frame in stack]
+        lines.append(f"{';'.join(frames)} {count}\n")
+    return "".join(lines)
+
+
+def write_profile(profile: RequestProfile, scope, status_code: int, duration: float):
+    """Write <id>.folded and <id>.json to PROFILE_DIR, then enforce retention"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, profile.id)
+    with open(base + ".folded", "w") as folded:
+        folded.write(folded_stacks(profile))
+    sql_ms = sum(statement["duration_ms"] for statement in profile.statements)
+    summary = {
+        "id": profile.id,
+        "trigger": "header" if profile.forced else "slow",
+        "method": scope["method"],
+        "path": scope["path"],
+        "query_string": scope.get("query_string", b"").decode("latin-1"),
+        "route": route_label(scope),
+        "status": status_code,
+        "duration_ms": round(duration * 1000, 3),
+        "sample_interval_ms": PROFILE_INTERVAL_MS,
+        "samples": sum(profile.stacks.values()),
+        "sql_statements": len(profile.statements),
+        "sql_ms": round(sql_ms, 3),
+        # Everything else: Python (routing, ORM, pydantic, encoding) and waits
+        # that are not SQL, such as the connection pool or password hashing
+        "other_ms": round(duration * 1000 - sql_ms, 3),
+        "statements": profile.statements,
+    }
+    with open(base + ".json", "w") as details:
+        json.dump(summary, details, indent=2)
+    prune_profiles()
+    logger.info(f"Wrote request profile {base}.folded ({summary['duration_ms']}ms, {summary['trigger']})")
+
+
+def prune_profiles(directory: str = PROFILE_DIR, max_files: int = PROFILE_MAX_FILES,
+                   max_bytes: int = int(PROFILE_MAX_MB * 2**20)):
+    """Delete the oldest profiles beyond max_files or max_bytes in total"""
+    profiles = {}
+    for entry in os.scandir(directory):
+        name, extension = os.path.splitext(entry.name)
+        if extension in (".folded", ".json"):
+            stat = entry.stat()
+            size, modified = profiles.get(name, (0, 0))
+            profiles[name] = (size + stat.st_size, max(modified, stat.st_mtime))
+    newest_first = sorted(profiles.items(), key=lambda item: item[1][1], reverse=True)
+    total = 0
+    for index, (name, (size, _)) in enumerate(newest_first):
+        total += size
+        if index >= max_files or total > max_bytes:
+            for extension in (".folded", ".json"):
+                try:
+                    os.remove(os.path.join(directory, name + extension))
+                except FileNotFoundError:
+                    pass
+
+
+async def _admin_requested(scope) -> bool:
+    """Whether the request sends PROFILE_HEADER with a valid, unrevoked admin access token"""
+    requested, authorization = False, None
+    for name, value in scope["headers"]:
+        if name == PROFILE_HEADER:
+            requested = value.strip().lower() not in (b"", b"0", b"false")
+        elif name == b"authorization":
+            authorization = value.decode("latin-1")
+    if not requested or authorization is None:
+        return False
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer":
+        return False
+    # Imported here: they load the database module, which imports this one
+    from app.auth.jwt import ALGORITHM, SECRET_KEY
+    from app.auth.revocation import token_revocations
+    from app.models.user import UserRole
+    try:
+        claims = jwt.decode(token.strip(), SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return False
+    if claims.get("role") != UserRole.ADMIN.value or not claims.get("active", True):
+        return False
+    # Checked as in JWT_STATELESS mode: changing a user's role or status bumps
+    # their token_version, so a demoted or revoked admin's token is refused
+    # without a user lookup on the request being profiled
+    try:
+        await token_revocations.ensure_fresh()
+    except Exception as e:
+        logger.error(f"Could not check token revocations for profiling: {str(e)}")
+        return False
+    return not token_revocations.is_revoked(claims.get("sub"), claims.get("ver", 0))
+
+
+class ProfilingMiddleware:
+    """Samples requests' call stacks, keeping admin-requested and slow ones
+
+    Plain ASGI, like MetricsMiddleware. Without PROFILE_SLOW_MS a request
+    that does not ask to be profiled only costs a scan of its headers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        forced = await _admin_requested(scope)
+        if not forced and PROFILE_SLOW_MS <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(asyncio.current_task(), threading.get_ident(), forced)
+        token = current_profile.set(profile)
+        sampler = get_sampler()
+        status_code = 500
+        streaming_events = False
+
+        async def send_with_profile_id(message):
+            nonlocal status_code, streaming_events
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = message.get("headers", [])
+                streaming_events = any(
+                    name == b"content-type" and value.startswith(b"text/event-stream") for name, value in headers
+                )
+                if forced:
+                    message = {**message, "headers": list(headers) + [(b"x-profile-id", profile.id.encode())]}
+            await send(message)
+
+        sampler.add(profile)
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            duration = perf_counter() - profile.started
+            sampler.remove(profile)
+            current_profile.reset(token)
+            # Event streams stay open by design; only profile them on request
+            slow = PROFILE_SLOW_MS > 0 and duration * 1000 >= PROFILE_SLOW_MS and not streaming_events
+            if forced or slow:
+                try:
+                    # Writing and pruning touch the disk; keep them off the event loop
+                    await asyncio.get_running_loop().run_in_executor(
+                        None, write_profile, profile, scope, status_code, duration
+                    )
+                except OSError as e:
+                    logger.error(f"Could not write request profile {profile.id}: {str(e)}")
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = current_profile.get()
+    if profile is not None:
+        profile.sql_in_flight = (_sql_label(statement), perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = current_profile.get()
+    if profile is not None and profile.sql_in_flight is not None:
+        started = profile.sql_in_flight[1]
+        finished = perf_counter()
+        profile.sql_in_flight = None
+        profile.statements.append({
+            "offset_ms": round((started - profile.started) * 1000, 3),
+            "duration_ms": round((finished - started) * 1000, 3),
+            "statement": statement,
+            "executemany": executemany,
+        })
+
+
+def _handle_error(exception_context):
+    profile = current_profile.get()
+    if profile is not None:
+        profile.sql_in_flight = None
+
+
+def instrument_engine(engine):
+    """Record the statements of profiled requests run on a sync engine (or an async engine's sync_engine)"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
@@ -0,0 +1,223 @@
+from collections import OrderedDict
+from dotenv import load_dotenv
+from app.auth.cache import create_invalidation_channel
+from app.models.user import UserRole
+from app.workflow import stage_for_reviewer
+import asyncio
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+# "local://" for the in-process stand-in, "redis://host:port/db" across workers.
+# Without it, other workers only see a write once their entries expire
+QUEUE_CACHE_INVALIDATION_URL = os.getenv("QUEUE_CACHE_INVALIDATION_URL")
+# Rendered queue responses kept per worker; a TTL or size of 0 disables caching.
+# Off unless writes can reach every worker: set QUEUE_CACHE_TTL explicitly to
+# cache anyway, e.g. with a single worker
+QUEUE_CACHE_SIZE = int(os.getenv("QUEUE_CACHE_SIZE", "256"))
+QUEUE_CACHE_MAX_BYTES = int(os.getenv("QUEUE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+QUEUE_CACHE_TTL = float(os.getenv("QUEUE_CACHE_TTL", "30" if QUEUE_CACHE_INVALIDATION_URL else "0"))
+QUEUE_CACHE_CHANNEL = "queue-cache-invalidate"
+
+# The MD queue holds every order
+ALL_ORDERS_QUEUE = "all"
+
+
+def queue_name(current_user):
+    """Name of the queue the caller's list shows, or None if the role has none
+
+    Matches queue_criteria in app/routers/purchase_orders.py.
+    """
+    if current_user.role == UserRole.EMPLOYEE:
+        return f"requester:{current_user.id}"
+    if current_user.role == UserRole.MD:
+        return ALL_ORDERS_QUEUE
+    if stage_for_reviewer(current_user.role) is not None:
+        return f"role:{current_user.role.value}"
+    return None
+
+
+def affected_queues(requested_by, *assigned_roles) -> list:
+    """Queues showing an order raised by requested_by that sat in, or moved to, assigned_roles"""
+    queues = [ALL_ORDERS_QUEUE, f"requester:{requested_by}"]
+    queues += [f"role:{role.value}" for role in dict.fromkeys(assigned_roles) if role is not None]
+    return queues
+
+
+class QueuePage:
+    """A rendered queue response: its ETag and JSON body"""
+    __slots__ = ("etag", "body")
+
+    def __init__(self, etag: str, body: bytes):
+        self.etag = etag
+        self.body = body
+
+
+class QueueCache:
+    """Bounded TTL + LRU cache of rendered queue responses with single-flight loading
+
+    Entries are keyed by (queue, variant), where the variant holds the
+    request's pagination and projection parameters. Concurrent misses for
+    the same key share one load. Invalidating a queue drops its entries
+    and bumps its generation, so a load that was already running when the
+    write landed is returned to its callers but not stored.
+    """
+
+    def __init__(self, maxsize: int = QUEUE_CACHE_SIZE, max_bytes: int = QUEUE_CACHE_MAX_BYTES,
+                 ttl: float = QUEUE_CACHE_TTL, channel=None):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.channel = channel
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._generations = {}
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.uncacheable = 0
+        if channel is not None:
+            channel.subscribe(self.discard)
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and self.max_bytes > 0 and self.ttl > 0
+
+    def get(self, key):
+        """The cached page for key, or None; counts a hit only when found"""
+        if not self.enabled or key is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            page, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return page
+
+    async def load(self, key, loader):
+        """Return the page for key, running loader() at most once across concurrent misses"""
+        if not self.enabled or key is None:
+            return await loader()
+        while True:
+            page = self.get(key)
+            if page is not None:
+                return page
+            flight_key = (key, self._generations.get(key[0], 0))
+            flight = self._flights.get(flight_key)
+            if flight is None:
+                break
+            self.coalesced += 1
+            try:
+                # Shielded so a caller that goes away does not cancel the
+                # load for everyone else
+                return await asyncio.shield(flight)
+            except asyncio.CancelledError:
+                if not flight.cancelled():
+                    raise
+                # The caller running the load went away; try again
+
+        self.misses += 1
+        flight = asyncio.get_running_loop().create_future()
+        self._flights[flight_key] = flight
+        try:
+            page = await loader()
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except Exception as e:
+            flight.set_exception(e)
+            # Retrieved here so a load nobody else waited on is not reported
+            # as an unhandled future exception
+            flight.exception()
+            raise
+        finally:
+            self._flights.pop(flight_key, None)
+        flight.set_result(page)
+        if flight_key[1] == self._generations.get(key[0], 0):
+            self._put(key, page)
+        return page
+
+    def _put(self, key, page: QueuePage):
+        size = len(page.body)
+        if size > self.max_bytes:
+            self.uncacheable += 1
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (page, time.monotonic() + self.ttl)
+            self._bytes += size
+            while len(self._entries) > self.maxsize or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        page, _ = self._entries.pop(key)
+        self._bytes -= len(page.body)
+
+    def discard(self, queue: str):
+        """Drop a queue's entries from this worker's cache only"""
+        with self._lock:
+            self._generations[queue] = self._generations.get(queue, 0) + 1
+            stale = [key for key in self._entries if key[0] == queue]
+            for key in stale:
+                self._remove(key)
+            self.invalidations += len(stale)
+
+    def invalidate(self, queues: list):
+        """Drop queues from this cache and tell the other workers to do the same"""
+        for queue in queues:
+            self.discard(queue)
+            if self.channel is not None:
+                try:
+                    self.channel.publish(queue)
+                except Exception as e:
+                    # The write has committed; other workers catch up on expiry
+                    logger.error(f"Failed to publish queue cache invalidation: {str(e)}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._entries)
+            size_bytes = self._bytes
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "size": size,
+            "maxsize": self.maxsize,
+            "bytes": size_bytes,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "uncacheable": self.uncacheable,
+        }
+
+
+queue_cache = QueueCache(channel=create_invalidation_channel(QUEUE_CACHE_INVALIDATION_URL, QUEUE_CACHE_CHANNEL))
+logger.info(f"Queue cache: size={QUEUE_CACHE_SIZE}, max_bytes={QUEUE_CACHE_MAX_BYTES}, ttl={QUEUE_CACHE_TTL}s")
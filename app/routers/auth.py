@@ -1,18 +1,29 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 from app.database import get_db
-from app.auth.jwt import authenticate_user, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.auth.jwt import authenticate_user, create_access_token, user_token_claims, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.auth.passwords import PasswordHasherBusy
+from app.auth.refresh import issue_refresh_token, rotate_refresh_token
+from app.schemas.user import RefreshRequest
+from app.metrics import TimedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 @router.post("/login")
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    user = authenticate_user(db, form_data.username, form_data.password)
+    try:
+        user = await authenticate_user(db, form_data.username, form_data.password)
+    except PasswordHasherBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many concurrent logins, please retry",
+            headers={"Retry-After": "1"},
+        )
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -21,11 +32,14 @@ async def login(
         )
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.id, "role": user.role.value},
+        data=user_token_claims(user),
         expires_delta=access_token_expires
     )
+    refresh_token = issue_refresh_token(db, user)
+    await db.commit()
     return {
         "access_token": access_token, 
+        "refresh_token": refresh_token,
         "token_type": "bearer", 
         "user": {
             "role": user.role,
@@ -33,3 +47,20 @@ async def login(
             "id": user.id
         }
     }
+
+@router.post("/refresh")
+async def refresh(
+    request: RefreshRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Exchange a refresh token for a new access token and refresh token"""
+    user, refresh_token = await rotate_refresh_token(db, request.refresh_token)
+    access_token = create_access_token(
+        data=user_token_claims(user),
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer"
+    }
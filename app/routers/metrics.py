@@ -0,0 +1,10 @@
+from fastapi import APIRouter, Response
+from app.metrics import CONTENT_TYPE, render_metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Request, SQL and connection pool metrics in the Prometheus text format"""
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE)
@@ -1,92 +1,539 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from app.database import get_db
-from app.models.user import User, PurchaseOrder, Approval, PurchaseOrderStatus, ApprovalStatus, UserRole
-from app.schemas.purchase_order import PurchaseOrderCreate, PurchaseOrderResponse, ApprovalCreate, ApprovalResponse
-from app.auth.jwt import get_current_active_user
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from typing import Any, List, Optional, Union
+from datetime import date, datetime
+from app.database import get_db, AsyncSessionLocal
+from app.models.user import User, PurchaseOrder, PurchaseOrderStat, Approval, PurchaseOrderStatus, ApprovalStatus, UserRole
+from app.models.types import new_id
+from app.schemas.purchase_order import PurchaseOrderCreate, PurchaseOrderResponse, PurchaseOrderPage, PurchaseOrderBulkResult, ApprovalCreate, ApprovalResponse, ApprovalBatchCreate, ApprovalBatchResult, InboxCount, PurchaseOrderStats, PurchaseOrderChanges, PurchaseOrderSummary
+from app.bulk import check_batch_size, validate_items
+from app.etag import if_match_version, if_none_match_hit, not_modified, queue_etag, version_etag
+from app.workflow import INITIAL_STATUS, assigned_role_for, stage_for_reviewer
+from app.stats import StatsDelta, apply_stats, parse_group_by
+from app.events import event_broker, purchase_order_event, sse_stream
+from app.changes import build_changes_query, change_criteria, change_row, check_retained, feed_horizon, head_cursor, parse_since, record_changes
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, STREAM_BATCH_SIZE, encode_cursor, keyset_after
+from app.serialization import APPROVAL_COLUMNS, FAST_JSON, PURCHASE_ORDER_COLUMNS, approval_row, dump_json, json_response, purchase_order_bodies
+from app.queue_cache import QueuePage, affected_queues, queue_cache, queue_name
+from app.export import EXPORT_FORMATS, check_export_format, export_filename, export_query, stream_csv, stream_parquet
+from app.projection import Projection, apply_projection, parse_projection, project_purchase_order
+from app.auth.jwt import get_current_active_streaming_user, get_current_active_user, has_role
+from app.metrics import TimedRoute, timed
+import json
+import logging
 import uuid
 
-router = APIRouter( redirect_slashes=False )
+logger = logging.getLogger(__name__)
+
+router = APIRouter(redirect_slashes=False, route_class=TimedRoute)
+
+# The list's response_model, for rendering its bodies ahead of time
+QUEUE_RESPONSE = TypeAdapter(Union[List[PurchaseOrderResponse], PurchaseOrderPage])
+
+# Roles allowed to raise purchase orders
+CREATOR_ROLES = [UserRole.EMPLOYEE, UserRole.SPECIALIST, UserRole.MANAGER, UserRole.DEPUTY_MD, UserRole.MD]
 
 
 @router.post("", response_model=PurchaseOrderResponse, status_code=status.HTTP_201_CREATED)
 async def create_purchase_order(
     purchase_order: PurchaseOrderCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Create a new purchase order (employees only)"""
     # Only employees and above can create purchase orders
-    if current_user.role not in [UserRole.EMPLOYEE, UserRole.SPECIALIST, UserRole.MANAGER, UserRole.DEPUTY_MD, UserRole.MD]:
+    if current_user.role not in CREATOR_ROLES:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only employees can create purchase orders"
         )
     
     # Create new purchase order
+    now = datetime.utcnow()
     new_purchase_order = PurchaseOrder(
+        id=new_id(),
         **purchase_order.dict(),
         requested_by=current_user.id,
-        status=PurchaseOrderStatus.PENDING
+        status=INITIAL_STATUS,
+        assigned_role=assigned_role_for(INITIAL_STATUS),
+        created_at=now,
+        updated_at=now,
+        approvals=[]
     )
     
     db.add(new_purchase_order)
-    db.commit()
-    db.refresh(new_purchase_order)
+    stats = StatsDelta()
+    stats.add(new_purchase_order.status, new_purchase_order.assigned_role, new_purchase_order.vendor_name,
+              new_purchase_order.created_at, new_purchase_order.cost)
+    await apply_stats(db, stats)
+    await record_changes(db, [
+        change_row(new_purchase_order.id, current_user.id, new_purchase_order.assigned_role)
+    ])
+    await db.commit()
     
+    queue_cache.invalidate(affected_queues(current_user.id, new_purchase_order.assigned_role))
+    event_broker.publish(purchase_order_event("created", new_purchase_order))
     return new_purchase_order
 
 
-@router.get("", response_model=List[PurchaseOrderResponse])
-async def get_purchase_orders(
-    db: Session = Depends(get_db),
+@router.post("/bulk", response_model=PurchaseOrderBulkResult, status_code=status.HTTP_201_CREATED)
+async def create_purchase_orders_bulk(
+    items: List[Any] = Body(...),
+    partial: bool = False,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Get purchase orders based on user role"""
-    print(f"User role: {current_user.role}, User ID: {current_user.id}")  # Debug user info
+    """Create many purchase orders in one transaction (employees only)
+    
+    By default the batch is all-or-nothing: if any item fails validation,
+    nothing is inserted and every error is returned with its index. With
+    partial=true the valid items are inserted and the invalid ones reported.
+    """
+    if current_user.role not in CREATOR_ROLES:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only employees can create purchase orders"
+        )
+    
+    check_batch_size(len(items))
+    valid, errors = validate_items(items, PurchaseOrderCreate)
+    if errors and not partial:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=errors)
     
+    # Ids are generated here so they can be returned without reading rows back
+    now = datetime.utcnow()
+    rows = [
+        {
+            **purchase_order.model_dump(),
+            "id": new_id(),
+            "requested_by": current_user.id,
+            "status": INITIAL_STATUS,
+            "assigned_role": assigned_role_for(INITIAL_STATUS),
+            "created_at": now,
+            "updated_at": now
+        }
+        for _, purchase_order in valid
+    ]
+    if rows:
+        await db.execute(insert(PurchaseOrder), rows)
+        stats = StatsDelta()
+        for row in rows:
+            stats.add(row["status"], row["assigned_role"], row["vendor_name"], now, row["cost"])
+        await apply_stats(db, stats)
+        await record_changes(db, [
+            change_row(row["id"], row["requested_by"], row["assigned_role"]) for row in rows
+        ])
+        await db.commit()
+        queue_cache.invalidate(affected_queues(current_user.id, assigned_role_for(INITIAL_STATUS)))
+        for row in rows:
+            event_broker.publish(purchase_order_event("created", row))
+    
+    return PurchaseOrderBulkResult(
+        created=[{"index": index, "id": row["id"]} for (index, _), row in zip(valid, rows)],
+        errors=errors
+    )
+
+
+def queue_criteria(current_user: User):
+    """WHERE criteria for the caller's queue, or None if the role has no queue"""
     # For employees, return their own purchase orders
     if current_user.role == UserRole.EMPLOYEE:
-        orders = db.query(PurchaseOrder).filter(PurchaseOrder.requested_by == current_user.id).all()
-        print(f"Employee orders found: {len(orders)}")  # Debug count
-        return orders
-    
-    # For reviewers (specialist, deputy MD, MD), show ones pending their approval
-    if current_user.role == UserRole.SPECIALIST:
-        orders = db.query(PurchaseOrder).filter(PurchaseOrder.status == PurchaseOrderStatus.PENDING).all()
-        print(f"Specialist pending orders: {len(orders)}")  # Debug count
-        return orders
-    
-    if current_user.role == UserRole.DEPUTY_MD:
-        orders = db.query(PurchaseOrder).filter(
-            PurchaseOrder.status == PurchaseOrderStatus.AWAITING_DEPUTY_MD,
-            PurchaseOrder.cost <= 1000
-        ).all()
-        print(f"Deputy MD pending orders: {len(orders)}")  # Debug count
-        return orders
+        return [PurchaseOrder.requested_by == current_user.id]
     
     if current_user.role == UserRole.MD:
-        orders = db.query(PurchaseOrder).all()
-        # .filter(
-        #     PurchaseOrder.status == PurchaseOrderStatus.AWAITING_MD,
-        #     PurchaseOrder.cost > 1000
-        # ).all()
-        print(f"MD pending orders: {len(orders)}")  # Debug count
-        return orders
+        return []
+    
+    # For other reviewers (specialist, deputy MD), show their inbox
+    if stage_for_reviewer(current_user.role) is not None:
+        return [PurchaseOrder.assigned_role == current_user.role]
+    
+    return None
+
+
+def build_queue_query(current_user: User):
+    """Select the purchase orders in the caller's queue, or None if the role has no queue"""
+    criteria = queue_criteria(current_user)
+    if criteria is None:
+        return None
+    return select(PurchaseOrder).where(*criteria)
+
+
+def build_queue_etag_query(current_user: User):
+    """Select (row count, latest updated_at) of the caller's queue, or None if it has none"""
+    criteria = queue_criteria(current_user)
+    if criteria is None:
+        return None
+    # Counted from the orders themselves even for the MD's whole-table queue:
+    # the ETag must change whenever the rows do, and the stats rollup can lag
+    # or drift from them
+    return select(func.count(), func.max(PurchaseOrder.updated_at)).select_from(PurchaseOrder).where(*criteria)
+
+
+def projected_response(content, etag: Optional[str] = None) -> JSONResponse:
+    """Serialize a response body built by project_purchase_order"""
+    headers = {"ETag": etag} if etag else None
+    with timed("serialization"):
+        return JSONResponse(content=jsonable_encoder(content), headers=headers)
+
+
+def json_body(content) -> bytes:
+    """The body projected_response would send"""
+    with timed("serialization"):
+        return JSONResponse(content=jsonable_encoder(content)).body
+
+
+def model_body(adapter: TypeAdapter, value) -> bytes:
+    """The body FastAPI would send for value under a response_model"""
+    with timed("serialization"):
+        content = adapter.dump_python(adapter.validate_python(value, from_attributes=True), mode="json")
+        return JSONResponse(content=content).body
+
+
+async def stream_purchase_orders(query, projection: Projection):
+    """Yield purchase orders as NDJSON lines from a server-side cursor"""
+    # The stream outlives the request-scoped session, so it opens its own
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=STREAM_BATCH_SIZE))
+        async for purchase_order in result.scalars():
+            if projection.is_default:
+                yield PurchaseOrderResponse.model_validate(purchase_order).model_dump_json() + "\n"
+            else:
+                content = jsonable_encoder(project_purchase_order(purchase_order, projection))
+                yield json.dumps(content, separators=(",", ":")) + "\n"
+
+
+async def render_queue(db: AsyncSession, current_user: User, query, projection: Projection,
+                       limit: Optional[int], cursor: Optional[str]) -> QueuePage:
+    """Load and serialize the caller's queue, or one page of it"""
+    count, high_water = (await db.execute(build_queue_etag_query(current_user))).one()
+    etag = queue_etag(count, high_water)
+    
+    # The fast path reads plain rows instead of ORM objects; see app/serialization.py
+    fast = FAST_JSON and projection.is_default
+    if fast:
+        query = query.with_only_columns(*PURCHASE_ORDER_COLUMNS)
+    else:
+        query = apply_projection(query, projection)
+    query = query.order_by(PurchaseOrder.created_at, PurchaseOrder.id)
+    
+    # Without pagination parameters, return the full queue as a plain list
+    if limit is None and cursor is None:
+        result = await db.execute(query)
+        orders = result.all() if fast else result.scalars().all()
+        logger.debug(f"{current_user.role.value} orders found: {len(orders)}")
+        if fast:
+            items = await purchase_order_bodies(db, orders)
+            return QueuePage(etag, dump_json(items, [item["cost"] for item in items]))
+        if projection.is_default:
+            return QueuePage(etag, model_body(QUEUE_RESPONSE, orders))
+        return QueuePage(etag, json_body([project_purchase_order(order, projection) for order in orders]))
+    
+    page_size = limit or DEFAULT_PAGE_SIZE
+    if cursor is not None:
+        query = query.where(keyset_after(PurchaseOrder.created_at, PurchaseOrder.id, cursor))
+    
+    # Fetch one extra row to learn whether another page follows
+    result = await db.execute(query.limit(page_size + 1))
+    orders = result.all() if fast else result.scalars().all()
+    
+    next_cursor = None
+    if len(orders) > page_size:
+        orders = orders[:page_size]
+        next_cursor = encode_cursor(orders[-1].created_at, orders[-1].id)
+    
+    if fast:
+        items = await purchase_order_bodies(db, orders)
+        return QueuePage(etag, dump_json({"items": items, "next_cursor": next_cursor}, [item["cost"] for item in items]))
+    if projection.is_default:
+        return QueuePage(etag, model_body(QUEUE_RESPONSE, PurchaseOrderPage(items=orders, next_cursor=next_cursor)))
+    return QueuePage(etag, json_body({
+        "items": [project_purchase_order(order, projection) for order in orders],
+        "next_cursor": next_cursor
+    }))
+
+
+@router.get("", response_model=Union[List[PurchaseOrderResponse], PurchaseOrderPage])
+async def get_purchase_orders(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    fields: Optional[str] = None,
+    expand: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get purchase orders based on user role
+    
+    Pass limit and/or cursor for a keyset-paginated page with a next_cursor,
+    or stream=true for the whole queue as NDJSON. fields= limits the returned
+    columns and expand= picks the relations (approvals, requester) to include.
+    Responses carry an ETag for the queue; sending it back as If-None-Match
+    gets a 304 while the queue is unchanged.
+    """
+    logger.debug(f"User role: {current_user.role}, User ID: {current_user.id}")
+    
+    projection = parse_projection(fields, expand)
+    query = build_queue_query(current_user)
+    if query is None:
+        logger.debug(f"No matching role condition for: {current_user.role}")
+        if limit is not None or cursor is not None:
+            return PurchaseOrderPage(items=[])
+        return []
+    
+    # Reviewers sharing a role share one cached response per parameter set,
+    # and simultaneous misses for it share a single load
+    cache_key = None
+    if not stream:
+        cache_key = (queue_name(current_user), (limit, cursor, projection.fields and tuple(projection.fields),
+                                                tuple(projection.expand)))
+    page = queue_cache.get(cache_key)
+    
+    if page is None and (stream or if_none_match is not None):
+        # The ETag comes from an index-only count and high-water mark, so an
+        # unchanged queue is answered before any rows are loaded or serialized
+        count, high_water = (await db.execute(build_queue_etag_query(current_user))).one()
+        etag = queue_etag(count, high_water)
+        if if_none_match_hit(if_none_match, etag):
+            return not_modified(etag)
+        if stream:
+            # The stream opens its own session. This one stays open until the
+            # response ends, so hand its connection back to the pool now
+            await db.close()
+            query = apply_projection(query, projection).order_by(PurchaseOrder.created_at, PurchaseOrder.id)
+            return StreamingResponse(
+                stream_purchase_orders(query, projection), media_type="application/x-ndjson",
+                headers={"ETag": etag}
+            )
+    
+    if page is None:
+        page = await queue_cache.load(
+            cache_key, lambda: render_queue(db, current_user, query, projection, limit, cursor)
+        )
+    if if_none_match_hit(if_none_match, page.etag):
+        return not_modified(page.etag)
+    return Response(content=page.body, media_type="application/json", headers={"ETag": page.etag})
+
+
+@router.get("/events")
+async def purchase_order_events(
+    request: Request,
+    current_user: User = Depends(get_current_active_streaming_user)
+):
+    """Server-sent events for orders created in or moving through the caller's queue
+    
+    Each event carries an id; a client that reconnects with Last-Event-ID
+    first receives what it missed. A "resync" event means the missed events
+    are no longer kept and the queue should be refetched.
+    """
+    return StreamingResponse(
+        sse_stream(event_broker, current_user, request.headers.get("last-event-id")),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/changes", response_model=PurchaseOrderChanges)
+async def get_purchase_order_changes(
+    since: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Orders and approvals in the caller's queue changed after the since cursor
+    
+    Orders are returned in their current state, approvals once each. Keep
+    the returned cursor for the next sync and call again while has_more is
+    true. Without since, only the current cursor is returned: take it
+    before fetching the full list. A 410 means the cursor is older than
+    the retained log and the full list must be fetched again.
+    """
+    if since is None:
+        cursor = await head_cursor(db)
+        return PurchaseOrderChanges(orders=[], approvals=[], cursor=str(cursor))
+    
+    after = parse_since(since)
+    criteria = change_criteria(current_user)
+    if criteria is None:
+        return PurchaseOrderChanges(orders=[], approvals=[], cursor=since)
+    await check_retained(db, after)
+    horizon = await feed_horizon(db)
+    
+    # Fetch one extra row to learn whether more changes follow
+    result = await db.execute(build_changes_query(criteria, after, limit + 1, horizon))
+    changes = result.all()
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    if not changes:
+        return PurchaseOrderChanges(orders=[], approvals=[], cursor=since)
+    
+    order_ids = list(dict.fromkeys(change.purchase_order_id for change in changes))
+    approval_ids = [change.approval_id for change in changes if change.approval_id is not None]
+    orders = (await db.execute(
+        select(PurchaseOrder).where(PurchaseOrder.id.in_(order_ids))
+    )).scalars().all()
+    approvals = []
+    if approval_ids:
+        approvals = (await db.execute(
+            select(Approval).where(Approval.id.in_(approval_ids)).order_by(Approval.approved_at, Approval.id)
+        )).scalars().all()
+    
+    # Orders in the order of their first change in this page
+    position = {id: index for index, id in enumerate(order_ids)}
+    return PurchaseOrderChanges(
+        orders=[PurchaseOrderSummary.model_validate(order) for order in sorted(orders, key=lambda order: position[order.id])],
+        approvals=approvals,
+        cursor=str(changes[-1].id),
+        has_more=has_more
+    )
+
+
+@router.get("/cache/stats")
+async def get_queue_cache_stats(current_user: User = Depends(has_role(UserRole.ADMIN))):
+    """Size, hit ratio and eviction counters of this worker's queue cache (admins only)"""
+    return queue_cache.stats()
+
+
+@router.get("/export")
+async def export_purchase_orders(
+    format: str = "csv",
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    current_user: User = Depends(has_role(UserRole.MD, streaming=True))
+):
+    """Download orders with their approval history as CSV or Parquet (MD and admins only)
+
+    from= and to= limit the export to orders created on or between those
+    dates. Rows are read from a server-side cursor and sent as they are
+    encoded, so memory use does not grow with the size of the export.
+    """
+    check_export_format(format)
+    if date_from is not None and date_to is not None and date_from > date_to:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="from must not be after to"
+        )
+    
+    query = export_query(date_from, date_to)
+    body = stream_csv(query) if format == "csv" else stream_parquet(query)
+    return StreamingResponse(body, media_type=EXPORT_FORMATS[format], headers={
+        "Content-Disposition": f'attachment; filename="{export_filename(format, date_from, date_to)}"'
+    })
+
+
+@router.get("/inbox/count", response_model=InboxCount)
+async def count_inbox(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Count the purchase orders waiting for the caller's decision (reviewers only)"""
+    if stage_for_reviewer(current_user.role) is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only reviewers have an inbox"
+        )
+    
+    # Answered from the assigned_role index alone
+    result = await db.execute(
+        select(func.count()).select_from(PurchaseOrder).where(PurchaseOrder.assigned_role == current_user.role)
+    )
+    return InboxCount(role=current_user.role, count=result.scalar_one())
+
+
+@router.get("/stats", response_model=PurchaseOrderStats, response_model_exclude_none=True)
+async def get_purchase_order_stats(
+    group_by: str = "status",
+    vendor_name: Optional[str] = None,
+    month_from: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$"),
+    month_to: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Order counts and spend grouped by status, assigned_role, vendor_name and/or month
+    
+    Read from the purchase_order_stats rollup, so the cost does not grow
+    with the number of orders. Months are YYYY-MM and both bounds inclusive.
+    """
+    if current_user.role == UserRole.EMPLOYEE:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Employees cannot view purchase order statistics"
+        )
     
-    print(f"No matching role condition for: {current_user.role}")  # Debug role match
-    return []
+    dimensions = [getattr(PurchaseOrderStat, name) for name in parse_group_by(group_by)]
+    query = select(
+        *dimensions,
+        func.sum(PurchaseOrderStat.order_count).label("order_count"),
+        func.sum(PurchaseOrderStat.total_cost).label("total_cost")
+    ).group_by(*dimensions).order_by(*dimensions)
+    if vendor_name is not None:
+        query = query.where(PurchaseOrderStat.vendor_name == vendor_name)
+    if month_from is not None:
+        query = query.where(PurchaseOrderStat.month >= month_from)
+    if month_to is not None:
+        query = query.where(PurchaseOrderStat.month <= month_to)
+    result = await db.execute(query)
+    
+    groups = []
+    for row in result.mappings():
+        if not row["order_count"]:
+            continue
+        group = dict(row)
+        if "assigned_role" in group:
+            group["assigned_role"] = group["assigned_role"] or None
+        groups.append(group)
+    return PurchaseOrderStats(
+        groups=groups,
+        order_count=sum(group["order_count"] for group in groups),
+        total_cost=sum(group["total_cost"] for group in groups)
+    )
 
 
 @router.get("/{id}", response_model=PurchaseOrderResponse)
 async def get_purchase_order(
     id: uuid.UUID,
-    db: Session = Depends(get_db),
+    response: Response,
+    fields: Optional[str] = None,
+    expand: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Get detailed view of a purchase order including approval history"""
-    purchase_order = db.query(PurchaseOrder).filter(PurchaseOrder.id == id).first()
+    """Get detailed view of a purchase order including approval history
+    
+    The ETag is the order's version. Sending it back as If-None-Match gets
+    a 304 while the order is unchanged, and as If-Match when approving
+    guards against acting on a stale copy.
+    """
+    projection = parse_projection(fields, expand)
+    if if_none_match is not None:
+        # Primary key lookup of just the version and owner; the full order
+        # and its approvals are only loaded if the client's copy is stale
+        result = await db.execute(
+            select(PurchaseOrder.version, PurchaseOrder.requested_by).where(PurchaseOrder.id == str(id))
+        )
+        current = result.first()
+        if current is not None and not (
+            current_user.role == UserRole.EMPLOYEE and current.requested_by != current_user.id
+        ):
+            etag = version_etag(current.version)
+            if if_none_match_hit(if_none_match, etag):
+                return not_modified(etag)
+    
+    query = select(PurchaseOrder).where(PurchaseOrder.id == str(id))
+    fast = FAST_JSON and projection.is_default
+    if fast:
+        result = await db.execute(query.with_only_columns(*PURCHASE_ORDER_COLUMNS))
+        purchase_order = result.first()
+    else:
+        result = await db.execute(apply_projection(query, projection))
+        purchase_order = result.scalars().first()
     
     if not purchase_order:
         raise HTTPException(
@@ -101,18 +548,26 @@ async def get_purchase_order(
             detail="You can only view your own purchase orders"
         )
     
-    return purchase_order
+    etag = version_etag(purchase_order.version)
+    if fast:
+        [body] = await purchase_order_bodies(db, [purchase_order])
+        return json_response(body, [body["cost"]], etag)
+    if projection.is_default:
+        response.headers["ETag"] = etag
+        return purchase_order
+    return projected_response(project_purchase_order(purchase_order, projection), etag)
 
 
 @router.get("/{id}/approvals", response_model=List[ApprovalResponse])
 async def get_purchase_order_approvals(
     id: uuid.UUID,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get chronological list of approval entries for a purchase order"""
     # First check if purchase order exists
-    purchase_order = db.query(PurchaseOrder).filter(PurchaseOrder.id == id).first()
+    result = await db.execute(select(PurchaseOrder.requested_by).where(PurchaseOrder.id == str(id)))
+    purchase_order = result.first()
     
     if not purchase_order:
         raise HTTPException(
@@ -128,9 +583,12 @@ async def get_purchase_order_approvals(
         )
     
     # Get all approvals for this purchase order, ordered by approval date
-    approvals = db.query(Approval).filter(
-        Approval.purchase_order_id == id
-    ).order_by(Approval.approved_at).all()
+    query = select(Approval).where(Approval.purchase_order_id == str(id)).order_by(Approval.approved_at)
+    if FAST_JSON:
+        result = await db.execute(query.with_only_columns(*APPROVAL_COLUMNS))
+        return json_response([approval_row(row) for row in result])
+    result = await db.execute(query)
+    approvals = result.scalars().all()
     
     return approvals
 
@@ -139,18 +597,30 @@ async def get_purchase_order_approvals(
 async def approve_purchase_order(
     id: uuid.UUID,
     approval: ApprovalCreate,
-    db: Session = Depends(get_db),
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Approve or deny a purchase order (reviewers only)"""
+    """Approve or deny a purchase order (reviewers only)
+    
+    Send the order's ETag as If-Match to get 412 instead of acting on an
+    order that changed since it was read.
+    """
     # Check if user is a reviewer
-    if current_user.role not in [UserRole.SPECIALIST, UserRole.DEPUTY_MD, UserRole.MD]:
+    stage = stage_for_reviewer(current_user.role)
+    if stage is None:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only reviewers can approve purchase orders"
         )
     
-    purchase_order = db.query(PurchaseOrder).filter(PurchaseOrder.id == id).first()
+    result = await db.execute(
+        select(PurchaseOrder)
+        .options(selectinload(PurchaseOrder.approvals))
+        .where(PurchaseOrder.id == str(id))
+    )
+    purchase_order = result.scalars().first()
     
     if not purchase_order:
         raise HTTPException(
@@ -158,31 +628,67 @@ async def approve_purchase_order(
             detail=f"Purchase order with id {id} not found"
         )
     
-    # Check if the purchase order is in the correct state for this reviewer
-    if current_user.role == UserRole.SPECIALIST and purchase_order.status != PurchaseOrderStatus.PENDING:
+    expected_version = if_match_version(if_match)
+    if expected_version is not None and expected_version != purchase_order.version:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="This purchase order is not pending specialist approval"
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="If-Match does not match the current version"
         )
     
-    if current_user.role == UserRole.DEPUTY_MD and (
-        purchase_order.status != PurchaseOrderStatus.AWAITING_DEPUTY_MD or purchase_order.cost > 1000
-    ):
+    # Check if the purchase order is in this reviewer's inbox
+    if purchase_order.assigned_role != current_user.role:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="This purchase order is not awaiting deputy MD approval or exceeds your approval limit"
+            detail=stage.wrong_state_detail
         )
     
-    if current_user.role == UserRole.MD and (
-        purchase_order.status != PurchaseOrderStatus.AWAITING_MD or purchase_order.cost <= 1000
-    ):
+    # Update purchase order status based on the workflow. The update only
+    # lands if the order still has the status and version read above, so a
+    # concurrent reviewer's decision is never silently overwritten
+    new_status = stage.next_status(approval.status, purchase_order.cost)
+    new_assigned_role = assigned_role_for(new_status)
+    now = datetime.utcnow()
+    transition = await db.execute(
+        update(PurchaseOrder)
+        .where(
+            PurchaseOrder.id == purchase_order.id,
+            PurchaseOrder.status == purchase_order.status,
+            PurchaseOrder.version == purchase_order.version
+        )
+        .values(
+            status=new_status,
+            assigned_role=new_assigned_role,
+            version=PurchaseOrder.version + 1,
+            updated_at=now
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if transition.rowcount == 0:
+        await db.rollback()
+        if expected_version is not None:
+            raise HTTPException(
+                status_code=status.HTTP_412_PRECONDITION_FAILED,
+                detail="If-Match does not match the current version"
+            )
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="This purchase order is not awaiting MD approval or is below your approval threshold"
+            status_code=status.HTTP_409_CONFLICT,
+            detail="This purchase order was changed by another request; reload it and retry"
         )
+    stats = StatsDelta()
+    stats.move(purchase_order.status, purchase_order.assigned_role, new_status, new_assigned_role,
+               purchase_order.vendor_name, purchase_order.created_at, purchase_order.cost)
+    await apply_stats(db, stats)
+    previous_assigned_role = purchase_order.assigned_role
+    
+    # Mirror the update on the loaded order without scheduling another one
+    set_committed_value(purchase_order, "status", new_status)
+    set_committed_value(purchase_order, "assigned_role", new_assigned_role)
+    set_committed_value(purchase_order, "version", purchase_order.version + 1)
+    set_committed_value(purchase_order, "updated_at", now)
     
     # Create approval record
     new_approval = Approval(
+        id=new_id(),
         purchase_order_id=purchase_order.id,
         approved_by=current_user.id,
         role=current_user.role.value,
@@ -191,22 +697,145 @@ async def approve_purchase_order(
     )
     
     db.add(new_approval)
+    purchase_order.approvals.append(new_approval)
     
-    # Update purchase order status based on approval logic
-    if approval.status == ApprovalStatus.DENIED:
-        purchase_order.status = PurchaseOrderStatus.DENIED
-    else:
-        # Approval logic based on role
-        if current_user.role == UserRole.SPECIALIST:
-            # Route based on cost
-            if purchase_order.cost > 1000:
-                purchase_order.status = PurchaseOrderStatus.AWAITING_MD
-            else:
-                purchase_order.status = PurchaseOrderStatus.AWAITING_DEPUTY_MD
-        elif current_user.role in [UserRole.DEPUTY_MD, UserRole.MD]:
-            purchase_order.status = PurchaseOrderStatus.APPROVED
+    await record_changes(db, [
+        change_row(purchase_order.id, purchase_order.requested_by, new_assigned_role,
+                   previous_assigned_role, new_approval.id)
+    ])
+    await db.commit()
+    
+    queue_cache.invalidate(affected_queues(purchase_order.requested_by, previous_assigned_role, new_assigned_role))
+    event_broker.publish(purchase_order_event("status_changed", purchase_order, previous_assigned_role))
+    response.headers["ETag"] = version_etag(purchase_order.version)
+    return purchase_order
+
+
+@router.post("/approve-batch", response_model=ApprovalBatchResult)
+async def approve_purchase_orders_batch(
+    batch: ApprovalBatchCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Approve or deny many purchase orders with one decision (reviewers only)
+    
+    Orders not in the reviewer's queue are skipped rather than failing the
+    batch; each id gets an outcome of approved, denied, skipped-wrong-state,
+    conflict (changed by another request while the batch ran) or not-found.
+    """
+    stage = stage_for_reviewer(current_user.role)
+    if stage is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only reviewers can approve purchase orders"
+        )
+    
+    check_batch_size(len(batch.ids))
+    ids = list(dict.fromkeys(str(id) for id in batch.ids))
+    in_inbox = PurchaseOrder.assigned_role == current_user.role
+    
+    # One read finds which ids exist and which are in the reviewer's inbox
+    result = await db.execute(
+        select(
+            PurchaseOrder.id, PurchaseOrder.cost, PurchaseOrder.vendor_name, PurchaseOrder.created_at,
+            PurchaseOrder.requested_by, PurchaseOrder.version, in_inbox.label("reviewable")
+        )
+        .where(PurchaseOrder.id.in_(ids))
+    )
+    found = {row.id: row for row in result}
+    
+    # Group the reviewable orders by the status they move to and the version
+    # read above, so each distinct transition is one compare-and-set UPDATE
+    transitions = {}
+    for id, row in found.items():
+        if row.reviewable:
+            transitions.setdefault((stage.next_status(batch.status, row.cost), row.version), []).append(id)
+    
+    # Only the orders an UPDATE actually moved are decided; the others were
+    # changed by a concurrent request since the read and are conflicts
+    now = datetime.utcnow()
+    returning = db.get_bind().dialect.update_returning
+    moved = {}
+    for (new_status, version), group_ids in transitions.items():
+        transition = (
+            update(PurchaseOrder)
+            .where(PurchaseOrder.status == stage.status, PurchaseOrder.version == version, in_inbox)
+            .values(
+                status=new_status,
+                assigned_role=assigned_role_for(new_status),
+                version=PurchaseOrder.version + 1,
+                updated_at=now
+            )
+            .execution_options(synchronize_session=False)
+        )
+        transition = transition.where(PurchaseOrder.id.in_(group_ids))
+        if returning:
+            result = await db.execute(transition.returning(PurchaseOrder.id))
+            moved.update((id, new_status) for id in result.scalars())
+            continue
+        result = await db.execute(transition)
+        if result.rowcount == len(group_ids):
+            moved.update((id, new_status) for id in group_ids)
+        elif result.rowcount:
+            # Without RETURNING (MySQL), read back which rows this UPDATE
+            # moved: only they carry its version, status and timestamp
+            result = await db.execute(
+                select(PurchaseOrder.id).where(
+                    PurchaseOrder.id.in_(group_ids),
+                    PurchaseOrder.version == version + 1,
+                    PurchaseOrder.status == new_status,
+                    PurchaseOrder.updated_at == now
+                )
+            )
+            moved.update((id, new_status) for id in result.scalars())
+    
+    decided = {id: moved[id] for id in found if id in moved}
+    stats = StatsDelta()
+    for id, new_status in decided.items():
+        row = found[id]
+        stats.move(stage.status, stage.reviewer, new_status, assigned_role_for(new_status),
+                   row.vendor_name, row.created_at, row.cost)
+    await apply_stats(db, stats)
+    approvals = [
+        {
+            "id": new_id(),
+            "purchase_order_id": id,
+            "approved_by": current_user.id,
+            "role": current_user.role.value,
+            "status": batch.status,
+            "comments": batch.comments
+        }
+        for id in decided
+    ]
+    if approvals:
+        await db.execute(insert(Approval), approvals)
+    await record_changes(db, [
+        change_row(id, found[id].requested_by, assigned_role_for(new_status), stage.reviewer, approval["id"])
+        for (id, new_status), approval in zip(decided.items(), approvals)
+    ])
+    await db.commit()
     
-    db.commit()
-    db.refresh(purchase_order)
+    queues = []
+    for id, new_status in decided.items():
+        queues += affected_queues(found[id].requested_by, stage.reviewer, assigned_role_for(new_status))
+    queue_cache.invalidate(list(dict.fromkeys(queues)))
+    for id, new_status in decided.items():
+        row = found[id]
+        event_broker.publish(purchase_order_event("status_changed", {
+            "id": id, "status": new_status, "assigned_role": assigned_role_for(new_status),
+            "requested_by": row.requested_by, "cost": row.cost, "vendor_name": row.vendor_name,
+            "version": row.version + 1
+        }, stage.reviewer))
     
-    return purchase_order
\ No newline at end of file
+    outcome = "approved" if batch.status == ApprovalStatus.APPROVED else "denied"
+    results = []
+    for id in ids:
+        if id in decided:
+            results.append({"id": id, "outcome": outcome, "status": decided[id]})
+        elif id in found and found[id].reviewable:
+            results.append({"id": id, "outcome": "conflict"})
+        elif id in found:
+            results.append({"id": id, "outcome": "skipped-wrong-state"})
+        else:
+            results.append({"id": id, "outcome": "not-found"})
+    return ApprovalBatchResult(results=results)
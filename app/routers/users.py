@@ -1,17 +1,27 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
+from datetime import datetime, timedelta
 from app.database import get_db
-from app.models.user import User, UserRole
+from app.models.user import DeletedUser, User, UserRole
 from app.schemas.user import UserCreate, UserResponse, UserUpdate
-from app.auth.jwt import get_current_active_user, get_password_hash, has_role
+from app.auth.jwt import ACCESS_TOKEN_EXPIRE_MINUTES, get_current_active_user, has_role
+from app.auth.passwords import hash_password
+from app.auth.cache import user_cache
+from app.auth.revocation import token_revocations
+from app.metrics import TimedRoute
 
-router = APIRouter(prefix="/users", tags=["Users"])
+router = APIRouter(prefix="/users", tags=["Users"], route_class=TimedRoute)
+
+# Updating any of these bumps the user's token_version
+REVOKING_FIELDS = {"password_hash", "role", "is_active"}
 
 @router.post("/", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def create_user(user: UserCreate, db: Session = Depends(get_db)):
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
     # Check if email already exists
-    db_user_email = db.query(User).filter(User.email == user.email).first()
+    result = await db.execute(select(User).where(User.email == user.email))
+    db_user_email = result.scalars().first()
     if db_user_email:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -19,7 +29,8 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Check if username already exists
-    db_user_username = db.query(User).filter(User.username == user.username).first()
+    result = await db.execute(select(User).where(User.username == user.username))
+    db_user_username = result.scalars().first()
     if db_user_username:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -27,7 +38,7 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Create new user
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await hash_password(user.password)
     db_user = User(
         email=user.email,
         username=user.username,
@@ -35,22 +46,30 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
         role=user.role
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 @router.get("/", response_model=List[UserResponse])
-def get_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db),
+async def get_users(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db),
              current_user: User = Depends(has_role(UserRole.ADMIN))):
-    users = db.query(User).offset(skip).limit(limit).all()
+    result = await db.execute(select(User).offset(skip).limit(limit))
+    users = result.scalars().all()
     return users
 
 @router.get("/me", response_model=UserResponse)
-def get_current_user_info(current_user: User = Depends(get_current_active_user)):
-    return current_user
+async def get_current_user_info(db: AsyncSession = Depends(get_db),
+                                current_user: User = Depends(get_current_active_user)):
+    # The auth dependency only carries the cached identity, so load the profile
+    result = await db.execute(select(User).where(User.id == current_user.id))
+    return result.scalars().first()
+
+@router.get("/cache/stats")
+async def get_user_cache_stats(current_user: User = Depends(has_role(UserRole.ADMIN))):
+    return user_cache.stats()
 
 @router.get("/{user_id}", response_model=UserResponse)
-def get_user(user_id: int, db: Session = Depends(get_db),
+async def get_user(user_id: int, db: AsyncSession = Depends(get_db),
             current_user: User = Depends(get_current_active_user)):
     # Regular users can only view their own profile
     if current_user.role == UserRole.USER and current_user.id != user_id:
@@ -59,7 +78,8 @@ def get_user(user_id: int, db: Session = Depends(get_db),
             detail="Not authorized to access this user's information"
         )
     
-    user = db.query(User).filter(User.id == user_id).first()
+    result = await db.execute(select(User).where(User.id == user_id))
+    user = result.scalars().first()
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -68,7 +88,7 @@ def get_user(user_id: int, db: Session = Depends(get_db),
     return user
 
 @router.put("/{user_id}", response_model=UserResponse)
-def update_user(user_id: int, user_update: UserUpdate, db: Session = Depends(get_db),
+async def update_user(user_id: str, user_update: UserUpdate, db: AsyncSession = Depends(get_db),
                current_user: User = Depends(get_current_active_user)):
     # Regular users can only update their own profile
     if current_user.role != UserRole.ADMIN and current_user.id != user_id:
@@ -77,7 +97,8 @@ def update_user(user_id: int, user_update: UserUpdate, db: Session = Depends(get
             detail="Not authorized to update this user"
         )
     
-    db_user = db.query(User).filter(User.id == user_id).first()
+    result = await db.execute(select(User).where(User.id == user_id))
+    db_user = result.scalars().first()
     if db_user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -89,7 +110,7 @@ def update_user(user_id: int, user_update: UserUpdate, db: Session = Depends(get
     
     # Hash password if provided
     if "password" in user_data:
-        user_data["hashed_password"] = get_password_hash(user_data.pop("password"))
+        user_data["password_hash"] = await hash_password(user_data.pop("password"))
     
     # Only admins can change roles
     if "role" in user_data and current_user.role != UserRole.ADMIN:
@@ -101,20 +122,34 @@ def update_user(user_id: int, user_update: UserUpdate, db: Session = Depends(get
     for key, value in user_data.items():
         setattr(db_user, key, value)
     
-    db.commit()
-    db.refresh(db_user)
+    # Credential, role or status changes revoke previously issued tokens
+    if REVOKING_FIELDS.intersection(user_data):
+        db_user.token_version = db_user.token_version + 1
+    
+    await db.commit()
+    await db.refresh(db_user)
+    user_cache.invalidate(user_id)
+    token_revocations.revoke(user_id, db_user.token_version)
     return db_user
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_user(user_id: int, db: Session = Depends(get_db),
+async def delete_user(user_id: str, db: AsyncSession = Depends(get_db),
                current_user: User = Depends(has_role(UserRole.ADMIN))):
-    db_user = db.query(User).filter(User.id == user_id).first()
+    result = await db.execute(select(User).where(User.id == user_id))
+    db_user = result.scalars().first()
     if db_user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
-    db.delete(db_user)
-    db.commit()
+    await db.delete(db_user)
+    # No row is left to carry a version; this one tells every worker to
+    # revoke the user's tokens until they have expired
+    db.add(DeletedUser(user_id=db_user.id))
+    expired = datetime.utcnow() - timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    await db.execute(delete(DeletedUser).where(DeletedUser.deleted_at < expired))
+    await db.commit()
+    user_cache.invalidate(user_id)
+    token_revocations.revoke(user_id, float("inf"))
     return None
\ No newline at end of file
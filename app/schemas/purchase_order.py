@@ -31,12 +31,80 @@ class ApprovalResponse(ApprovalBase):
     class Config:
         from_attributes = True  # Remove orm_mode
 
-class PurchaseOrderResponse(PurchaseOrderBase):
+class RequesterResponse(BaseModel):
+    id: UUID
+    name: str
+    username: str
+    email: str
+    role: UserRole
+    
+    class Config:
+        from_attributes = True
+
+class PurchaseOrderSummary(PurchaseOrderBase):
     id: UUID
     requested_by: UUID
     status: PurchaseOrderStatus
+    assigned_role: Optional[UserRole] = None
     created_at: datetime
+    updated_at: Optional[datetime] = None
+    version: int = 0
+    
+    class Config:
+        from_attributes = True
+
+class PurchaseOrderResponse(PurchaseOrderSummary):
     approvals: Optional[List[ApprovalResponse]] = []
     
     class Config:
-        from_attributes = True  # Remove orm_mode
\ No newline at end of file
+        from_attributes = True  # Remove orm_mode
+
+class PurchaseOrderPage(BaseModel):
+    items: List[PurchaseOrderResponse]
+    next_cursor: Optional[str] = None
+
+class BulkItemError(BaseModel):
+    index: int
+    errors: List[dict]
+
+class BulkCreatedItem(BaseModel):
+    index: int
+    id: UUID
+
+class PurchaseOrderBulkResult(BaseModel):
+    created: List[BulkCreatedItem]
+    errors: List[BulkItemError] = []
+
+class ApprovalBatchCreate(ApprovalBase):
+    ids: List[UUID]
+
+class ApprovalBatchOutcome(BaseModel):
+    id: UUID
+    outcome: str
+    status: Optional[PurchaseOrderStatus] = None
+
+class ApprovalBatchResult(BaseModel):
+    results: List[ApprovalBatchOutcome]
+
+class InboxCount(BaseModel):
+    role: UserRole
+    count: int
+
+class PurchaseOrderStatsGroup(BaseModel):
+    status: Optional[PurchaseOrderStatus] = None
+    assigned_role: Optional[UserRole] = None
+    vendor_name: Optional[str] = None
+    month: Optional[str] = None
+    order_count: int
+    total_cost: float
+
+class PurchaseOrderStats(BaseModel):
+    groups: List[PurchaseOrderStatsGroup]
+    order_count: int
+    total_cost: float
+
+class PurchaseOrderChanges(BaseModel):
+    orders: List[PurchaseOrderSummary]
+    approvals: List[ApprovalResponse]
+    cursor: str
+    has_more: bool = False
@@ -0,0 +1,109 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import Optional
+from fastapi import HTTPException, status
+from sqlalchemy import func, select
+from sqlalchemy.dialects import mysql, sqlite
+from app.database import IS_SQLITE
+from app.models.user import PurchaseOrder, PurchaseOrderStat, PurchaseOrderStatus, UserRole
+
+# Columns a client can group /purchase-orders/stats by
+STATS_DIMENSIONS = ["status", "assigned_role", "vendor_name", "month"]
+
+
+def month_key(created_at: datetime) -> str:
+    return created_at.strftime("%Y-%m")
+
+
+def role_key(role: Optional[UserRole]) -> str:
+    return role.value if role else ""
+
+
+class StatsDelta:
+    """Collects rollup changes made by one transaction"""
+
+    def __init__(self):
+        self.changes = defaultdict(lambda: [0, 0.0])
+
+    def add(self, status: PurchaseOrderStatus, assigned_role: Optional[UserRole],
+            vendor_name: str, created_at: datetime, cost: float, count: int = 1):
+        change = self.changes[(status, role_key(assigned_role), vendor_name, month_key(created_at))]
+        change[0] += count
+        change[1] += cost * count
+
+    def move(self, old_status: PurchaseOrderStatus, old_assigned_role: Optional[UserRole],
+             new_status: PurchaseOrderStatus, new_assigned_role: Optional[UserRole],
+             vendor_name: str, created_at: datetime, cost: float):
+        """Record an order's transition from one rollup key to another"""
+        self.add(old_status, old_assigned_role, vendor_name, created_at, cost, count=-1)
+        self.add(new_status, new_assigned_role, vendor_name, created_at, cost)
+
+    def rows(self) -> list:
+        return [
+            {"status": status, "assigned_role": assigned_role, "vendor_name": vendor_name, "month": month,
+             "order_count": count, "total_cost": cost}
+            for (status, assigned_role, vendor_name, month), (count, cost) in self.changes.items()
+            if count or cost
+        ]
+
+
+def upsert_stats_statement():
+    """INSERT that adds to the counters of rows that already exist"""
+    table = PurchaseOrderStat.__table__
+    if IS_SQLITE:
+        statement = sqlite.insert(table)
+        return statement.on_conflict_do_update(
+            index_elements=[table.c.status, table.c.assigned_role, table.c.vendor_name, table.c.month],
+            set_={
+                "order_count": table.c.order_count + statement.excluded.order_count,
+                "total_cost": table.c.total_cost + statement.excluded.total_cost,
+            }
+        )
+    statement = mysql.insert(table)
+    return statement.on_duplicate_key_update(
+        order_count=table.c.order_count + statement.inserted.order_count,
+        total_cost=table.c.total_cost + statement.inserted.total_cost,
+    )
+
+
+async def apply_stats(db, delta: StatsDelta):
+    """Add a transaction's changes to the rollup; the caller commits"""
+    rows = delta.rows()
+    if rows:
+        await db.execute(upsert_stats_statement(), rows)
+
+
+def month_expression(column):
+    if IS_SQLITE:
+        return func.strftime("%Y-%m", column)
+    return func.date_format(column, "%Y-%m")
+
+
+def aggregate_purchase_orders():
+    """Select the rollup computed from scratch over purchase_orders"""
+    month = month_expression(PurchaseOrder.created_at)
+    return select(
+        PurchaseOrder.status, PurchaseOrder.assigned_role, PurchaseOrder.vendor_name, month,
+        func.count(), func.sum(PurchaseOrder.cost)
+    ).group_by(PurchaseOrder.status, PurchaseOrder.assigned_role, PurchaseOrder.vendor_name, month)
+
+
+def aggregate_rows(result) -> list:
+    """Rollup rows from the result of aggregate_purchase_orders()"""
+    return [
+        {"status": status, "assigned_role": role_key(assigned_role), "vendor_name": vendor_name, "month": month,
+         "order_count": count, "total_cost": cost}
+        for status, assigned_role, vendor_name, month, count, cost in result
+    ]
+
+
+def parse_group_by(group_by: str) -> list:
+    """Validate the group_by= query parameter of /purchase-orders/stats"""
+    names = [name.strip() for name in group_by.split(",") if name.strip()]
+    unknown = [name for name in names if name not in STATS_DIMENSIONS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown group_by value(s): {', '.join(unknown)}. Allowed: {', '.join(STATS_DIMENSIONS)}"
+        )
+    return list(dict.fromkeys(names))
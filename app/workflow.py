@@ -0,0 +1,71 @@
+from typing import Optional
+from dotenv import load_dotenv
+from app.models.user import ApprovalStatus, PurchaseOrderStatus, UserRole
+import os
+
+# Load environment variables
+load_dotenv()
+
+# Orders costing more than this need MD approval instead of deputy MD
+APPROVAL_THRESHOLD = float(os.getenv("APPROVAL_THRESHOLD", "1000"))
+
+
+class Stage:
+    """One review step: the status an order waits in and the role that decides it"""
+
+    def __init__(self, status: PurchaseOrderStatus, reviewer: UserRole,
+                 approved: PurchaseOrderStatus, approved_over_threshold: PurchaseOrderStatus,
+                 wrong_state_detail: str):
+        self.status = status
+        self.reviewer = reviewer
+        self.approved = approved
+        self.approved_over_threshold = approved_over_threshold
+        self.wrong_state_detail = wrong_state_detail
+
+    def next_status(self, decision: ApprovalStatus, cost: float) -> PurchaseOrderStatus:
+        """Status an order in this stage moves to after the reviewer's decision"""
+        if decision == ApprovalStatus.DENIED:
+            return PurchaseOrderStatus.DENIED
+        if cost > APPROVAL_THRESHOLD:
+            return self.approved_over_threshold
+        return self.approved
+
+
+# The approval workflow. Every order starts PENDING; an order in a status
+# not listed here is finished and sits in nobody's inbox
+WORKFLOW = [
+    Stage(
+        PurchaseOrderStatus.PENDING, UserRole.SPECIALIST,
+        approved=PurchaseOrderStatus.AWAITING_DEPUTY_MD,
+        approved_over_threshold=PurchaseOrderStatus.AWAITING_MD,
+        wrong_state_detail="This purchase order is not pending specialist approval"
+    ),
+    Stage(
+        PurchaseOrderStatus.AWAITING_DEPUTY_MD, UserRole.DEPUTY_MD,
+        approved=PurchaseOrderStatus.APPROVED,
+        approved_over_threshold=PurchaseOrderStatus.APPROVED,
+        wrong_state_detail="This purchase order is not awaiting deputy MD approval or exceeds your approval limit"
+    ),
+    Stage(
+        PurchaseOrderStatus.AWAITING_MD, UserRole.MD,
+        approved=PurchaseOrderStatus.APPROVED,
+        approved_over_threshold=PurchaseOrderStatus.APPROVED,
+        wrong_state_detail="This purchase order is not awaiting MD approval or is below your approval threshold"
+    ),
+]
+
+INITIAL_STATUS = PurchaseOrderStatus.PENDING
+
+_stages_by_status = {stage.status: stage for stage in WORKFLOW}
+_stages_by_reviewer = {stage.reviewer: stage for stage in WORKFLOW}
+
+
+def stage_for_reviewer(role: UserRole) -> Optional[Stage]:
+    """The stage a role decides, or None if the role reviews nothing"""
+    return _stages_by_reviewer.get(role)
+
+
+def assigned_role_for(status: PurchaseOrderStatus) -> Optional[UserRole]:
+    """The role whose inbox an order in this status belongs in"""
+    stage = _stages_by_status.get(status)
+    return stage.reviewer if stage else None
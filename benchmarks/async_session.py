@@ -0,0 +1,97 @@
+"""
+Concurrent-request throughput of the blocking sync Session versus AsyncSession.
+
+Each request runs one query that takes DB_LATENCY seconds on the server,
+standing in for a slow MySQL round trip. With the sync Session the query
+blocks the event loop, so requests on the worker run one after another; with
+AsyncSession the worker keeps up to pool-size queries in flight at once.
+
+Usage:
+    python -m benchmarks.async_session --requests 200 --concurrency 20
+
+Without DATABASE_URL set, a throwaway SQLite file is used.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import IS_SQLITE, SessionLocal, async_engine, engine, get_db
+
+
+# SQLite has no SLEEP(); register one so both drivers see the same latency
+def _register_sleep(dbapi_connection, connection_record):
+    def sleep(seconds):
+        time.sleep(seconds)
+        return 0
+    dbapi_connection.create_function("sleep", 1, sleep)
+
+
+if IS_SQLITE:
+    event.listen(engine, "connect", _register_sleep)
+    event.listen(async_engine.sync_engine, "connect", _register_sleep)
+    # Drop the connection opened by the startup check, which predates the hook
+    engine.dispose()
+
+bench_app = FastAPI()
+
+
+@bench_app.get("/sync-session")
+async def sync_session(latency: float):
+    """The pre-asyncio pattern: blocking Session inside an async handler"""
+    db = SessionLocal()
+    try:
+        db.execute(text("SELECT sleep(:s)"), {"s": latency})
+    finally:
+        db.close()
+    return {}
+
+
+@bench_app.get("/async-session")
+async def async_session(latency: float, db: AsyncSession = Depends(get_db)):
+    """The current pattern: AsyncSession from the get_db dependency"""
+    await db.execute(text("SELECT sleep(:s)"), {"s": latency})
+    return {}
+
+
+async def run(path: str, total: int, concurrency: int, latency: float) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=bench_app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one():
+            async with semaphore:
+                response = await client.get(path, params={"latency": latency})
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        return time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated DB round trip in seconds")
+    args = parser.parse_args()
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, {args.latency * 1000:.0f} ms per query")
+    for label, path in (("sync Session", "/sync-session"), ("AsyncSession", "/async-session")):
+        elapsed = await run(path, args.requests, args.concurrency, args.latency)
+        print(f"{label:>14}: {elapsed:6.2f} s  {args.requests / elapsed:8.1f} req/s")
+
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,142 @@
+"""
+Steady-state cost of polling purchase-order lists with and without If-None-Match.
+
+Seeds the database, then polls GET /purchase-orders and a detail view the
+way a dashboard does: once unconditionally every time, and once sending
+back the ETag from the previous response. Reports polls/s, latency, SQL
+statements and response bytes per poll.
+
+Usage:
+    python -m benchmarks.conditional_get --orders 2000 --polls 200
+
+Without DATABASE_URL set, a throwaway SQLite file is used.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+
+import httpx
+from sqlalchemy import event, insert
+
+from app.auth.jwt import create_access_token, user_token_claims
+from app.database import Base, SessionLocal, async_engine, engine
+from app.main import app
+from app.models.types import new_id
+from app.models.user import Approval, ApprovalStatus, PurchaseOrder, PurchaseOrderStatus, User, UserRole
+from app.workflow import assigned_role_for
+from rebuild_stats import rebuild
+
+statement_count = 0
+
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    global statement_count
+    statement_count += 1
+
+
+def seed(orders: int) -> tuple:
+    """Reset the tables to `orders` purchase orders; return (auth headers per role, an order id)"""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    users = {
+        role: User(name=role.value, username=role.value, email=f"{role.value}@example.com",
+                   password_hash="x", role=role)
+        for role in (UserRole.EMPLOYEE, UserRole.SPECIALIST, UserRole.MD)
+    }
+    db.add_all(users.values())
+    db.commit()
+
+    now = datetime.utcnow()
+    statuses = [PurchaseOrderStatus.PENDING, PurchaseOrderStatus.APPROVED, PurchaseOrderStatus.AWAITING_MD]
+    purchase_orders, approvals = [], []
+    for i in range(orders):
+        status = statuses[i % len(statuses)]
+        created_at = now - timedelta(minutes=orders - i)
+        purchase_orders.append({
+            "id": new_id(), "item_name": f"Item {i}", "quantity": 1, "cost": 500 + i, "description": "x" * 200,
+            "vendor_name": f"Vendor {i % 20}", "requested_by": users[UserRole.EMPLOYEE].id, "status": status,
+            "assigned_role": assigned_role_for(status), "created_at": created_at, "updated_at": created_at,
+        })
+        approvals.append({
+            "id": new_id(), "purchase_order_id": purchase_orders[-1]["id"], "approved_by": users[UserRole.MD].id,
+            "role": UserRole.SPECIALIST.value, "status": ApprovalStatus.APPROVED, "approved_at": created_at,
+        })
+    with engine.begin() as conn:
+        conn.execute(insert(PurchaseOrder), purchase_orders)
+        conn.execute(insert(Approval), approvals)
+        rebuild(conn)
+
+    headers = {
+        role: {"Authorization": f"Bearer {create_access_token(user_token_claims(user))}"}
+        for role, user in users.items()
+    }
+    db.close()
+    return headers, purchase_orders[0]["id"]
+
+
+async def poll(client: httpx.AsyncClient, url: str, headers: dict, polls: int, conditional: bool) -> dict:
+    global statement_count
+    latencies, statements, sizes = [], [], []
+    # One unmeasured request warms caches and fetches the first ETag
+    response = await client.get(url, headers=headers)
+    response.raise_for_status()
+    etag = response.headers.get("etag")
+    for _ in range(polls):
+        request_headers = dict(headers, **({"If-None-Match": etag} if conditional else {}))
+        statement_count = 0
+        start = time.perf_counter()
+        response = await client.get(url, headers=request_headers)
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == (304 if conditional else 200), response.status_code
+        statements.append(statement_count)
+        sizes.append(len(response.content))
+    return {
+        "polls/s": len(latencies) / sum(latencies),
+        "p50": statistics.median(latencies),
+        "statements": statistics.mean(statements),
+        "bytes": statistics.mean(sizes),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--polls", type=int, default=200)
+    args = parser.parse_args()
+
+    headers, detail_id = seed(args.orders)
+    await async_engine.dispose()
+    event.listen(async_engine.sync_engine, "before_cursor_execute", _count_statement)
+
+    targets = [
+        ("MD list", "/purchase-orders", headers[UserRole.MD]),
+        ("specialist list", "/purchase-orders", headers[UserRole.SPECIALIST]),
+        ("MD list, limit=100", "/purchase-orders?limit=100", headers[UserRole.MD]),
+        ("detail", f"/purchase-orders/{detail_id}", headers[UserRole.EMPLOYEE]),
+    ]
+    print(f"{args.orders} orders, {args.polls} polls per row")
+    print(f"{'target':<20} {'mode':<12} {'polls/s':>9} {'p50':>9} {'SQL/poll':>9} {'bytes':>9}")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for label, url, auth in targets:
+            for mode, conditional in (("full", False), ("conditional", True)):
+                result = await poll(client, url, auth, args.polls, conditional)
+                print(
+                    f"{label:<20} {mode:<12} {result['polls/s']:9.1f} {result['p50'] * 1000:7.2f}ms"
+                    f" {result['statements']:9.1f} {result['bytes']:9.0f}"
+                )
+
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
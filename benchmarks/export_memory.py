@@ -0,0 +1,211 @@
+"""
+Peak memory of GET /purchase-orders/export against the size of the export.
+
+Seeds --orders purchase orders with zero, one or two approvals each, then
+downloads the full export in every --formats format while sampling the
+process's resident set size. The body is counted and discarded as it
+arrives, without a client buffering it, so what is measured is the
+server side. Exits non-zero if RSS ever rises more than --max-mb above
+its level before the request, or if a download is missing rows.
+
+Usage:
+    python -m benchmarks.export_memory --orders 1000000 --max-mb 64
+
+Without DATABASE_URL set, a throwaway SQLite file is used. Parquet needs pyarrow.
+"""
+import argparse
+import asyncio
+import gc
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+
+from sqlalchemy import insert
+
+from app.auth.jwt import create_access_token, user_token_claims
+from app.database import Base, SessionLocal, async_engine, engine
+from app.main import app
+from app.models.types import new_id
+from app.models.user import Approval, ApprovalStatus, PurchaseOrder, PurchaseOrderStatus, User, UserRole
+from app.workflow import assigned_role_for
+
+SEED_CHUNK = 10000
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def seed(orders: int) -> tuple:
+    """Reset the tables to `orders` purchase orders; return (MD auth headers, expected export rows)"""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    employee = User(name="Employee", username="employee", email="employee@example.com", password_hash="x",
+                    role=UserRole.EMPLOYEE)
+    md = User(name="MD", username="md", email="md@example.com", password_hash="x", role=UserRole.MD)
+    db.add_all([employee, md])
+    db.commit()
+    headers = {"Authorization": f"Bearer {create_access_token(user_token_claims(md))}"}
+    employee_id, md_id = employee.id, md.id
+    db.close()
+
+    start = datetime.utcnow() - timedelta(seconds=orders)
+    statuses = [PurchaseOrderStatus.PENDING, PurchaseOrderStatus.AWAITING_DEPUTY_MD, PurchaseOrderStatus.APPROVED]
+    rows = 0
+    # Generated a chunk at a time so seeding does not hold the dataset either
+    with engine.begin() as conn:
+        for chunk in range(0, orders, SEED_CHUNK):
+            purchase_orders, approvals = [], []
+            for i in range(chunk, min(chunk + SEED_CHUNK, orders)):
+                status = statuses[i % len(statuses)]
+                created_at = start + timedelta(seconds=i)
+                purchase_orders.append({
+                    "id": new_id(), "item_name": f"Item {i}", "quantity": 1 + i % 20, "cost": 100 + i * 0.25,
+                    "description": "x" * 100, "vendor_name": f"Vendor {i % 50}", "requested_by": employee_id,
+                    "status": status, "assigned_role": assigned_role_for(status), "created_at": created_at,
+                    "updated_at": created_at,
+                })
+                # Pending orders have no approvals yet, the others one per stage passed
+                for stage in range(i % len(statuses)):
+                    approvals.append({
+                        "id": new_id(), "purchase_order_id": purchase_orders[-1]["id"], "approved_by": md_id,
+                        "role": UserRole.SPECIALIST.value, "status": ApprovalStatus.APPROVED,
+                        "comments": "ok", "approved_at": created_at + timedelta(milliseconds=stage + 1),
+                    })
+                rows += max(1, i % len(statuses))
+            conn.execute(insert(PurchaseOrder), purchase_orders)
+            if approvals:
+                conn.execute(insert(Approval), approvals)
+    return headers, rows
+
+
+def rss_bytes() -> int:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * PAGE_SIZE
+
+
+class PeakSampler(threading.Thread):
+    """Highest RSS seen while running, polled every few milliseconds"""
+
+    def __init__(self, interval: float = 0.005):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = rss_bytes()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.is_set():
+            self.peak = max(self.peak, rss_bytes())
+            time.sleep(self.interval)
+
+    def finish(self) -> int:
+        self._done.set()
+        self.join()
+        self.peak = max(self.peak, rss_bytes())
+        return self.peak
+
+
+async def download(path: str, headers: dict, on_chunk) -> int:
+    """Run one GET through the ASGI app, handing body chunks to on_chunk; return the status"""
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "server": ("bench", 80), "client": ("127.0.0.1", 0), "root_path": "",
+        "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+        "headers": [(b"host", b"bench")] + [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+    }
+    response_status = None
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Park until the app is done, as a connected client would
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal response_status
+        if message["type"] == "http.response.start":
+            response_status = message["status"]
+        elif message["type"] == "http.response.body":
+            on_chunk(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return response_status
+
+
+async def export(export_format: str, headers: dict) -> tuple:
+    """(seconds, bytes sent, rows received, peak RSS growth) for one full export"""
+    received = {"bytes": 0, "newlines": 0}
+    parquet = tempfile.NamedTemporaryFile(suffix=".parquet") if export_format == "parquet" else None
+
+    def on_chunk(chunk: bytes):
+        received["bytes"] += len(chunk)
+        if parquet is not None:
+            parquet.write(chunk)
+        else:
+            received["newlines"] += chunk.count(b"\n")
+
+    gc.collect()
+    baseline = rss_bytes()
+    sampler = PeakSampler()
+    sampler.start()
+    start = time.perf_counter()
+    response_status = await download(f"/purchase-orders/export?format={export_format}", headers, on_chunk)
+    elapsed = time.perf_counter() - start
+    growth = sampler.finish() - baseline
+    assert response_status == 200, f"{export_format} export returned {response_status}"
+
+    if parquet is None:
+        rows = received["newlines"] - 1  # Header
+    else:
+        import pyarrow.parquet as pq
+        parquet.flush()
+        rows = pq.ParquetFile(parquet.name).metadata.num_rows
+        parquet.close()
+    return elapsed, received["bytes"], rows, growth
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--orders", type=int, default=1000000)
+    parser.add_argument("--formats", nargs="+", default=["csv", "parquet"])
+    parser.add_argument("--max-mb", type=float, default=64)
+    args = parser.parse_args()
+
+    if "parquet" in args.formats:
+        # Loading the library is a one-off cost of the process, not of an export
+        import pyarrow.parquet  # noqa: F401
+
+    start = time.perf_counter()
+    headers, expected = seed(args.orders)
+    print(f"Seeded {args.orders} orders ({expected} export rows) in {time.perf_counter() - start:.1f}s")
+    await async_engine.dispose()
+
+    failures = []
+    print(f"{'format':<8} {'rows':>9} {'size':>10} {'time':>8} {'rows/s':>9} {'peak RSS growth':>16}")
+    for export_format in args.formats:
+        elapsed, size, rows, growth = await export(export_format, headers)
+        print(f"{export_format:<8} {rows:>9} {size / 2**20:8.1f}MB {elapsed:7.1f}s {rows / elapsed:9.0f}"
+              f" {growth / 2**20:14.1f}MB")
+        if rows != expected:
+            failures.append(f"{export_format}: {rows} rows, expected {expected}")
+        if growth > args.max_mb * 2**20:
+            failures.append(f"{export_format}: RSS grew {growth / 2**20:.1f}MB, ceiling {args.max_mb}MB")
+
+    await async_engine.dispose()
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print(f"OK: every export stayed within {args.max_mb}MB")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,117 @@
+"""
+Login throughput and bystander latency during a login storm.
+
+Fires a burst of concurrent /auth/login requests while a probe keeps calling
+a cheap endpoint, once with bcrypt running inline on the event loop and once
+with the process pool. Reports logins/s and the probe's latency percentiles,
+which show whether non-login requests keep their latency during the storm.
+
+Usage:
+    python -m benchmarks.login_storm --logins 40 --workers 4
+
+Without DATABASE_URL set, a throwaway SQLite file is used.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+
+import httpx
+
+from app.auth import passwords
+from app.auth.passwords import PasswordHasher, get_password_hash
+from app.database import Base, SessionLocal, async_engine, engine
+from app.main import app
+from app.models.user import User, UserRole
+
+PROBE_INTERVAL = 0.005
+
+
+def seed(users: int):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    password_hash = get_password_hash("password123")
+    db = SessionLocal()
+    db.add_all([
+        User(name=f"User {i}", username=f"user{i}", email=f"user{i}@example.com",
+             password_hash=password_hash, role=UserRole.EMPLOYEE)
+        for i in range(users)
+    ])
+    db.commit()
+    db.close()
+
+
+def percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def storm(client: httpx.AsyncClient, logins: int, users: int):
+    probe_latencies = []
+    done = asyncio.Event()
+
+    async def probe():
+        # Latency counts from when the probe was due, so time the event loop
+        # spent blocked before it could even send the request is included
+        while not done.is_set():
+            due = time.perf_counter() + PROBE_INTERVAL
+            await asyncio.sleep(PROBE_INTERVAL)
+            await client.get("/")
+            probe_latencies.append(time.perf_counter() - due)
+
+    async def login(i: int):
+        response = await client.post(
+            "/auth/login",
+            data={"username": f"user{i % users}@example.com", "password": "password123"}
+        )
+        response.raise_for_status()
+
+    probe_task = asyncio.create_task(probe())
+    start = time.perf_counter()
+    await asyncio.gather(*(login(i) for i in range(logins)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await probe_task
+    return elapsed, probe_latencies
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--logins", type=int, default=40)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=passwords.PASSWORD_HASH_WORKERS)
+    args = parser.parse_args()
+
+    seed(args.users)
+    transport = httpx.ASGITransport(app=app)
+    print(f"{args.logins} concurrent logins, bcrypt rounds {passwords.BCRYPT_ROUNDS}")
+    print(f"{'mode':>12} {'logins/s':>9} {'probe p50':>10} {'probe p99':>10} {'probe max':>10}")
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for label, workers in (("inline", 0), (f"pool x{args.workers}", args.workers)):
+            # Queue without a timeout: the benchmark measures throughput, not shedding
+            passwords.password_hasher = PasswordHasher(
+                workers=workers, max_pending=workers * 4, queue_timeout=3600
+            )
+            # Warm the pool so worker start-up is not counted
+            await passwords.hash_password("warm-up")
+            elapsed, latencies = await storm(client, args.logins, args.users)
+            print(
+                f"{label:>12} {args.logins / elapsed:9.1f}"
+                f" {statistics.median(latencies) * 1000:8.1f}ms"
+                f" {percentile(latencies, 99) * 1000:8.1f}ms"
+                f" {max(latencies) * 1000:8.1f}ms"
+            )
+            passwords.password_hasher.shutdown()
+
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
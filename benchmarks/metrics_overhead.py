@@ -0,0 +1,128 @@
+"""
+Cost of collecting request metrics, with METRICS_ENABLED on against off.
+
+Seeds the database, then runs --rounds rounds in fresh processes, turn
+about with metrics off and on. Each round sends --requests requests
+through the ASGI app: a page of the MD's list and an order's detail,
+alternately. The best round of each setting is compared. Exits non-zero
+if metrics cost more than --max-overhead percent of throughput, or if
+GET /metrics is missing a series the requests should have produced.
+
+Usage:
+    python -m benchmarks.metrics_overhead --requests 2000 --rounds 3
+
+Without DATABASE_URL set, a throwaway SQLite file is used.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+
+# Series that a list and a detail request must leave in the exposition
+EXPECTED_SERIES = [
+    'http_request_duration_seconds_count{method="GET",route="/purchase-orders",status="200"}',
+    'http_request_duration_seconds_count{method="GET",route="/purchase-orders/{id}",status="200"}',
+    'http_request_db_statements_count{route="/purchase-orders/{id}"}',
+    'http_request_phase_seconds_count{route="/purchase-orders/{id}",phase="jwt_decode"}',
+    'http_request_phase_seconds_count{route="/purchase-orders/{id}",phase="user_lookup"}',
+    'http_request_phase_seconds_count{route="/purchase-orders/{id}",phase="serialization"}',
+    'db_statements_total{engine="async"}',
+    'db_pool_checked_out{engine="async"}',
+]
+
+
+async def child(requests: int, list_headers: dict, detail_headers: dict, order_id: str):
+    """Run in the measured process: report throughput (and missing series) as JSON on stdout"""
+    import httpx
+    from app.main import app
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            paths = [("/purchase-orders?limit=20", list_headers), (f"/purchase-orders/{order_id}", detail_headers)]
+            for path, headers in paths:  # Warm up
+                assert (await client.get(path, headers=headers)).status_code == 200
+            start = time.perf_counter()
+            for i in range(requests):
+                path, headers = paths[i % 2]
+                response = await client.get(path, headers=headers)
+                assert response.status_code == 200, response.text
+            elapsed = time.perf_counter() - start
+            scrape = await client.get("/metrics")
+    missing = None
+    if scrape.status_code == 200:
+        series = {line.rsplit(" ", 1)[0] for line in scrape.text.splitlines() if not line.startswith("#")}
+        missing = [name for name in EXPECTED_SERIES if name not in series]
+    print(json.dumps({"elapsed": elapsed, "missing": missing}))
+
+
+def run(enabled: bool, requests: int, setup: dict) -> dict:
+    env = dict(os.environ, METRICS_ENABLED=str(enabled).lower(), METRICS_BENCH_SETUP=json.dumps(setup))
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.metrics_overhead", "--child", "--requests", str(requests)],
+        env=env, check=True, stdout=subprocess.PIPE, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--max-overhead", type=float, default=5.0, help="percent of throughput")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        setup = json.loads(os.environ["METRICS_BENCH_SETUP"])
+        asyncio.run(child(args.requests, setup["list"], setup["detail"], setup["order_id"]))
+        return
+
+    from app.database import engine
+    from app.models.user import UserRole
+    from benchmarks.conditional_get import seed
+    headers, order_id = seed(args.orders)
+    engine.dispose()
+    setup = {"list": headers[UserRole.MD], "detail": headers[UserRole.EMPLOYEE], "order_id": order_id}
+
+    rounds = {False: [], True: []}
+    for _ in range(args.rounds):
+        for enabled in (False, True):
+            rounds[enabled].append(run(enabled, args.requests, setup))
+
+    failures = []
+    best = {enabled: min(r["elapsed"] for r in results) for enabled, results in rounds.items()}
+    print(f"Best of {args.rounds} rounds of {args.requests} requests")
+    print(f"{'metrics':>8} {'req/s':>9} {'per request':>12}")
+    for enabled in (False, True):
+        print(f"{'on' if enabled else 'off':>8} {args.requests / best[enabled]:9.0f}"
+              f" {best[enabled] / args.requests * 1e6:10.0f}us")
+    overhead = (best[True] / best[False] - 1) * 100
+    print(f"Overhead: {overhead:.1f}% ({(best[True] - best[False]) / args.requests * 1e6:.0f}us per request)")
+
+    if overhead > args.max_overhead:
+        failures.append(f"metrics cost {overhead:.1f}% of throughput, ceiling {args.max_overhead}%")
+    missing = rounds[True][-1]["missing"]
+    if missing is None:
+        failures.append("GET /metrics did not answer 200")
+    elif missing:
+        failures.append("GET /metrics is missing " + ", ".join(missing))
+    if any(r["missing"] is not None for r in rounds[False]):
+        failures.append("GET /metrics answered with METRICS_ENABLED=false")
+
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print(f"OK: metrics cost under {args.max_overhead}% and every expected series is exported")
+
+
+if __name__ == "__main__":
+    main()
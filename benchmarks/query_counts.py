@@ -0,0 +1,119 @@
+"""
+Assert that purchase-order list requests run a constant number of SQL statements.
+
+Seeds the database at several sizes and counts the statements each list
+variant (default, expand=, fields=, paginated) executes. Exits non-zero if
+any variant's count grows with the number of purchase orders, which is what
+an N+1 lazy load of approvals or requesters looks like.
+
+Usage:
+    python -m benchmarks.query_counts --sizes 5 50 500
+
+Without DATABASE_URL set, a throwaway SQLite file is used.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+# A cached queue would answer with no SQL at all, and one size's cached page
+# would answer for the next
+os.environ["QUEUE_CACHE_TTL"] = "0"
+
+import httpx
+from sqlalchemy import event
+
+from app.auth.jwt import create_access_token
+from app.database import Base, SessionLocal, async_engine, engine
+from app.main import app
+from app.models.user import Approval, ApprovalStatus, PurchaseOrder, PurchaseOrderStatus, User, UserRole
+
+VARIANTS = {
+    "default": {},
+    "expand=approvals,requester": {"expand": "approvals,requester"},
+    "fields=item_name,cost": {"fields": "item_name,cost", "expand": ""},
+    "limit=500": {"limit": 500},
+}
+
+statement_count = 0
+
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    global statement_count
+    statement_count += 1
+
+
+def seed(size: int):
+    """Reset the tables to `size` purchase orders, each with two approvals"""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    employee = User(name="Employee", username="employee", email="employee@example.com",
+                    password_hash="x", role=UserRole.EMPLOYEE)
+    md = User(name="MD", username="md", email="md@example.com", password_hash="x", role=UserRole.MD)
+    db.add_all([employee, md])
+    db.flush()
+    for i in range(size):
+        purchase_order = PurchaseOrder(
+            item_name=f"Item {i}", quantity=1, cost=500 + i, description="x" * 200,
+            vendor_name="Vendor", requested_by=employee.id, status=PurchaseOrderStatus.APPROVED
+        )
+        purchase_order.approvals = [
+            Approval(approved_by=md.id, role=UserRole.MD.value, status=ApprovalStatus.APPROVED)
+            for _ in range(2)
+        ]
+        db.add(purchase_order)
+    db.commit()
+    token = create_access_token({"sub": md.id, "role": md.role.value})
+    db.close()
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def count_statements(headers: dict) -> dict:
+    global statement_count
+    counts = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for label, params in VARIANTS.items():
+            statement_count = 0
+            response = await client.get("/purchase-orders", params=params, headers=headers)
+            response.raise_for_status()
+            counts[label] = statement_count
+    return counts
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 50, 500])
+    args = parser.parse_args()
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", _count_statement)
+
+    results = {}
+    for size in args.sizes:
+        headers = seed(size)
+        # Each size gets fresh connections against the recreated tables
+        await async_engine.dispose()
+        results[size] = await count_statements(headers)
+
+    failed = False
+    print(f"{'variant':<30}" + "".join(f"{size:>8}" for size in args.sizes))
+    for label in VARIANTS:
+        counts = [results[size][label] for size in args.sizes]
+        constant = len(set(counts)) == 1
+        failed = failed or not constant
+        print(f"{label:<30}" + "".join(f"{count:>8}" for count in counts) + ("" if constant else "  GROWS"))
+
+    await async_engine.dispose()
+    if failed:
+        print("FAIL: statement count depends on result size")
+        sys.exit(1)
+    print("OK: statement count is constant")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,204 @@
+"""
+Query-plan regression check for the role queue, change feed and approval-history queries.
+
+Builds the schema with `alembic upgrade head`, seeds it, then captures the
+EXPLAIN output of every hot query exactly as the routers build it. Exits
+non-zero if any of them reads a table with a full scan instead of an index.
+
+Usage:
+    python -m benchmarks.query_plans --orders 20000
+
+Without DATABASE_URL set, a throwaway SQLite file is used. Pointing it at
+another database drops and recreates the tables there, so it also needs
+--reset.
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+EXTERNAL_DATABASE = bool(os.getenv("DATABASE_URL"))
+if not EXTERNAL_DATABASE:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import func, insert, select, text
+
+from app.auth.cache import CachedUser
+from app.changes import build_changes_query, change_criteria, change_row, horizon_query
+from app.database import Base, engine
+from app.export import export_query
+from app.models.types import new_id
+from app.models.user import Approval, ApprovalStatus, PurchaseOrder, PurchaseOrderChange, PurchaseOrderStatus, User, UserRole
+from app.pagination import DEFAULT_PAGE_SIZE, keyset_after, encode_cursor
+from app.routers.purchase_orders import build_queue_etag_query, build_queue_query
+from app.workflow import assigned_role_for
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+
+# Rollups whose size does not grow with the number of orders; reading them
+# whole is expected
+SMALL_TABLES = {"purchase_order_stats"}
+
+STATUS_WEIGHTS = {
+    PurchaseOrderStatus.APPROVED: 55,
+    PurchaseOrderStatus.DENIED: 15,
+    PurchaseOrderStatus.PENDING: 10,
+    PurchaseOrderStatus.AWAITING_DEPUTY_MD: 10,
+    PurchaseOrderStatus.AWAITING_MD: 10,
+}
+
+
+def reset_schema():
+    with engine.begin() as conn:
+        Base.metadata.drop_all(bind=conn)
+        conn.execute(text("DROP TABLE IF EXISTS alembic_version"))
+    command.upgrade(Config(ALEMBIC_INI), "head")
+
+
+def seed(orders: int, employees: int = 200):
+    rng = random.Random(0)
+    now = datetime.utcnow()
+    employee_ids = [new_id() for _ in range(employees)]
+    reviewer_id = new_id()
+    users = [
+        {"id": user_id, "name": f"Employee {i}", "username": f"employee{i}", "email": f"employee{i}@example.com",
+         "password_hash": "x", "role": UserRole.EMPLOYEE, "is_active": True, "created_at": now}
+        for i, user_id in enumerate(employee_ids)
+    ]
+    users.append({"id": reviewer_id, "name": "Reviewer", "username": "reviewer", "email": "reviewer@example.com",
+                  "password_hash": "x", "role": UserRole.MD, "is_active": True, "created_at": now})
+
+    statuses = list(STATUS_WEIGHTS)
+    weights = list(STATUS_WEIGHTS.values())
+    purchase_orders, approvals, changes = [], [], []
+    for i in range(orders):
+        purchase_order_id = new_id()
+        status = rng.choices(statuses, weights)[0]
+        purchase_orders.append({
+            "id": purchase_order_id, "item_name": f"Item {i}", "quantity": rng.randint(1, 20),
+            "cost": round(rng.lognormvariate(6.5, 1.0), 2), "description": "x" * 100,
+            "vendor_name": f"Vendor {rng.randint(1, 50)}", "requested_by": rng.choice(employee_ids),
+            "status": status, "assigned_role": assigned_role_for(status),
+            "created_at": now - timedelta(minutes=orders - i),
+        })
+        approvals.append({
+            "id": new_id(), "purchase_order_id": purchase_order_id, "approved_by": reviewer_id,
+            "role": UserRole.SPECIALIST.value, "status": ApprovalStatus.APPROVED,
+            "approved_at": now - timedelta(minutes=orders - i - 1),
+        })
+        changes.append(change_row(
+            purchase_order_id, purchase_orders[-1]["requested_by"], assigned_role_for(status),
+            UserRole.SPECIALIST, approvals[-1]["id"], changed_at=approvals[-1]["approved_at"]
+        ))
+
+    with engine.begin() as conn:
+        conn.execute(insert(User), users)
+        for start in range(0, orders, 5000):
+            conn.execute(insert(PurchaseOrder), purchase_orders[start:start + 5000])
+            conn.execute(insert(Approval), approvals[start:start + 5000])
+            conn.execute(insert(PurchaseOrderChange), changes[start:start + 5000])
+        # Give the planner real statistics, as production tables have
+        if engine.dialect.name == "sqlite":
+            conn.execute(text("ANALYZE"))
+        else:
+            conn.execute(text("ANALYZE TABLE users, purchase_orders, approvals, purchase_order_changes"))
+    return employee_ids[0], purchase_orders[orders // 2]
+
+
+def hot_queries(employee_id: str, sample_order: dict, orders_seeded: int) -> dict:
+    """The queries the routers issue on every queue fetch and detail view"""
+    order_by = (PurchaseOrder.created_at, PurchaseOrder.id)
+    cursor = encode_cursor(sample_order["created_at"], sample_order["id"])
+    queries = {}
+    for role, user_id in (
+        (UserRole.EMPLOYEE, employee_id),
+        (UserRole.SPECIALIST, "reviewer"),
+        (UserRole.DEPUTY_MD, "reviewer"),
+        (UserRole.MD, "reviewer"),
+    ):
+        query = build_queue_query(CachedUser(user_id, role, True)).order_by(*order_by)
+        # The MD queue is the whole table when fetched unpaginated, which is
+        # a scan by definition; only its paginated form is checked
+        if role != UserRole.MD:
+            queries[f"{role.value} queue"] = query
+        queries[f"{role.value} queue, first page"] = query.limit(DEFAULT_PAGE_SIZE + 1)
+        queries[f"{role.value} queue, next page"] = query.where(
+            keyset_after(PurchaseOrder.created_at, PurchaseOrder.id, cursor)
+        ).limit(DEFAULT_PAGE_SIZE + 1)
+        queries[f"{role.value} queue ETag"] = build_queue_etag_query(CachedUser(user_id, role, True))
+        # A client a little behind the head of the change log
+        criteria = change_criteria(CachedUser(user_id, role, True))
+        queries[f"{role.value} changes"] = build_changes_query(
+            criteria, orders_seeded - 200, DEFAULT_PAGE_SIZE + 1, orders_seeded - 10
+        )
+    queries["changes horizon"] = horizon_query()
+    for role in (UserRole.SPECIALIST, UserRole.DEPUTY_MD, UserRole.MD):
+        queries[f"{role.value} inbox count"] = select(func.count()).select_from(PurchaseOrder).where(
+            PurchaseOrder.assigned_role == role
+        )
+    queries["detail"] = select(PurchaseOrder).where(PurchaseOrder.id == sample_order["id"])
+    queries["approval history"] = select(Approval).where(
+        Approval.purchase_order_id == sample_order["id"]
+    ).order_by(Approval.approved_at)
+    queries["approvals selectin"] = select(Approval).where(
+        Approval.purchase_order_id.in_([sample_order["id"]])
+    )
+    # The full export reads every order by definition; a dated one must not
+    day = sample_order["created_at"].date()
+    queries["export, one day"] = export_query(day, day)
+    return queries
+
+
+def explain(query) -> tuple:
+    """Return (plan lines, full-scan tables) for a query on the current dialect"""
+    sql = str(query.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+    with engine.connect() as conn:
+        if engine.dialect.name == "sqlite":
+            rows = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+            lines = [row[3] for row in rows]
+            scans = [m.group(1) for line in lines for m in [re.fullmatch(r"SCAN (\w+)", line)] if m]
+        else:
+            rows = conn.execute(text(f"EXPLAIN {sql}")).mappings().all()
+            lines = [
+                f"{row['table']}: type={row['type']} key={row['key']} rows={row['rows']} {row['Extra'] or ''}"
+                for row in rows
+            ]
+            scans = [row["table"] for row in rows if row["type"] == "ALL"]
+    return lines, scans
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--reset", action="store_true", help="allow dropping tables in DATABASE_URL")
+    args = parser.parse_args()
+
+    if EXTERNAL_DATABASE and not args.reset:
+        sys.exit("DATABASE_URL is set: pass --reset to drop and recreate its tables")
+
+    reset_schema()
+    employee_id, sample_order = seed(args.orders)
+
+    failures = []
+    for label, query in hot_queries(employee_id, sample_order, args.orders).items():
+        lines, scans = explain(query)
+        scans = [table for table in scans if table not in SMALL_TABLES]
+        print(f"{'FULL SCAN' if scans else 'ok':>9}  {label}")
+        for line in lines:
+            print(f"           {line}")
+        if scans:
+            failures.append(f"{label} ({', '.join(scans)})")
+
+    if failures:
+        print("FAIL: full table scans in " + "; ".join(failures))
+        sys.exit(1)
+    print(f"OK: every hot query uses an index ({args.orders} orders)")
+
+
+if __name__ == "__main__":
+    main()
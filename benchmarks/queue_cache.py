@@ -0,0 +1,90 @@
+"""
+Cost of a burst of reviewers fetching the same queue, with and without the queue cache.
+
+Seeds the database, then fires --reviewers concurrent GET /purchase-orders
+requests from one role, as happens when a batch of orders lands. With the
+cache off every request runs its own queries; with it on they share one
+load. Repeats after a write to include the invalidation.
+
+Usage:
+    python -m benchmarks.queue_cache --orders 2000 --reviewers 50
+
+Without DATABASE_URL set, a throwaway SQLite file is used.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+
+import httpx
+from sqlalchemy import event
+
+from app.database import async_engine
+from app.main import app
+from app.models.user import UserRole
+from app.queue_cache import queue_cache
+from benchmarks.conditional_get import seed
+
+statement_count = 0
+
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    global statement_count
+    statement_count += 1
+
+
+async def burst(client: httpx.AsyncClient, headers: dict, reviewers: int) -> tuple:
+    """(seconds, SQL statements) for `reviewers` simultaneous queue fetches"""
+    global statement_count
+    statement_count = 0
+    start = time.perf_counter()
+    responses = await asyncio.gather(*[client.get("/purchase-orders", headers=headers) for _ in range(reviewers)])
+    elapsed = time.perf_counter() - start
+    assert all(response.status_code == 200 for response in responses)
+    assert len({response.content for response in responses}) == 1
+    return elapsed, statement_count
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--reviewers", type=int, default=50)
+    args = parser.parse_args()
+
+    headers, _ = seed(args.orders)
+    await async_engine.dispose()
+    event.listen(async_engine.sync_engine, "before_cursor_execute", _count_statement)
+    # The cache is off by default without cross-worker invalidation
+    ttl = queue_cache.ttl or 30
+
+    print(f"{args.orders} orders, bursts of {args.reviewers} MD requests")
+    print(f"{'cache':<6} {'burst':<16} {'wall':>9} {'SQL':>6}")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        # Open the pool's first connection alone: SQLAlchemy's first-connect
+        # hook can deadlock when several tasks race to make it
+        async with async_engine.connect():
+            pass
+        for label, cache_ttl in (("off", 0), ("on", ttl)):
+            queue_cache.ttl = cache_ttl
+            queue_cache.clear()
+            for name in ("cold", "warm"):
+                elapsed, statements = await burst(client, headers[UserRole.MD], args.reviewers)
+                print(f"{label:<6} {name:<16} {elapsed * 1000:7.1f}ms {statements:6d}")
+            # An order lands, then everyone refreshes
+            response = await client.post("/purchase-orders", json={
+                "item_name": "Item", "quantity": 1, "cost": 500, "vendor_name": "Vendor"
+            }, headers=headers[UserRole.EMPLOYEE])
+            elapsed, statements = await burst(client, headers[UserRole.MD], args.reviewers)
+            print(f"{label:<6} {'after a write':<16} {elapsed * 1000:7.1f}ms {statements:6d}  ({response.status_code})")
+    print(queue_cache.stats())
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
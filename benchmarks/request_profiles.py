@@ -0,0 +1,162 @@
+"""
+Request profiles: what they capture and what always-on sampling costs.
+
+Seeds the database, then:
+
+1. Profiles every request (PROFILE_SLOW_MS=0.001), sampling every
+   millisecond so short requests still collect stacks, with retention
+   set to --keep profiles. Exactly --keep profiles must be left. Each
+   one's folded stacks must add up to its sample count, and its SQL time
+   must fit in its duration. Between them the profiles must record SQL
+   statements and a sample taken waiting on one ([sql] frames). It also
+   sends X-Profile with an admin token, which must get an X-Profile-Id,
+   and with an employee token, which must not.
+2. Times --requests requests in fresh processes with sampling off and
+   with every request sampled but none slow enough to keep, turn about
+   for --rounds rounds. The best round of each setting is compared.
+
+Exits non-zero if a check fails or sampling costs more than
+--max-overhead percent of throughput.
+
+Usage:
+    python -m benchmarks.request_profiles --requests 1000 --rounds 3
+
+Without DATABASE_URL set, a throwaway SQLite file is used.
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+
+
+async def child(mode: str, requests: int, setup: dict):
+    """Run in the measured process: report results as JSON on stdout"""
+    import httpx
+    from app.main import app
+    paths = [("/purchase-orders?limit=50&expand=approvals,requester", setup["list"]),
+             (f"/purchase-orders/{setup['order_id']}", setup["detail"])]
+    result = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            if mode == "capture":
+                response = await client.get(paths[1][0], headers={**setup["admin"], "X-Profile": "1"})
+                result["admin_profile_id"] = response.headers.get("x-profile-id")
+                response = await client.get(paths[1][0], headers={**setup["detail"], "X-Profile": "1"})
+                result["employee_profile_id"] = response.headers.get("x-profile-id")
+            for path, headers in paths:  # Warm up
+                assert (await client.get(path, headers=headers)).status_code == 200
+            start = time.perf_counter()
+            for i in range(requests):
+                path, headers = paths[i % 2]
+                response = await client.get(path, headers=headers)
+                assert response.status_code == 200, response.text
+            result["elapsed"] = time.perf_counter() - start
+    print(json.dumps(result))
+
+
+def run(mode: str, requests: int, setup: dict, env: dict) -> dict:
+    env = dict(os.environ, REQUEST_PROFILES_SETUP=json.dumps(setup), **env)
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.request_profiles", "--child", mode, "--requests", str(requests)],
+        env=env, check=True, stdout=subprocess.PIPE, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def check_profiles(directory: str, keep: int, result: dict) -> list:
+    failures = []
+    names = sorted({os.path.splitext(os.path.basename(path))[0] for path in glob.glob(f"{directory}/*")})
+    if len(names) != keep:
+        failures.append(f"{len(names)} profiles kept, expected {keep}")
+    waited_on_sql = ran_sql = False
+    for name in names:
+        with open(os.path.join(directory, name + ".json")) as details:
+            summary = json.load(details)
+        with open(os.path.join(directory, name + ".folded")) as folded:
+            lines = folded.read().splitlines()
+        if summary["samples"] != sum(int(line.rsplit(" ", 1)[1]) for line in lines):
+            failures.append(f"{name}: folded stacks do not add up to {summary['samples']} samples")
+        ran_sql = ran_sql or bool(summary["statements"])
+        if summary["sql_ms"] > summary["duration_ms"]:
+            failures.append(f"{name}: {summary['sql_statements']} statements taking {summary['sql_ms']}ms"
+                            f" of {summary['duration_ms']}ms")
+        waited_on_sql = waited_on_sql or any(";[sql] " in line for line in lines)
+    if not ran_sql:
+        failures.append("no profile recorded a SQL statement")
+    if not waited_on_sql:
+        failures.append("no sample was taken while waiting on SQL")
+    if result["employee_profile_id"] is not None:
+        failures.append("X-Profile from an employee token was honoured")
+    if result["admin_profile_id"] is None:
+        failures.append("X-Profile from an admin token got no X-Profile-Id")
+    print(f"{len(names)} profiles kept; newest: {names[-1] if names else None}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--keep", type=int, default=5, help="PROFILE_MAX_FILES for the capture run")
+    parser.add_argument("--max-overhead", type=float, default=10.0, help="percent of throughput")
+    parser.add_argument("--child", choices=["capture", "timing"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        asyncio.run(child(args.child, args.requests, json.loads(os.environ["REQUEST_PROFILES_SETUP"])))
+        return
+
+    from app.auth.jwt import create_access_token, user_token_claims
+    from app.database import SessionLocal, engine
+    from app.models.user import User, UserRole
+    from benchmarks.conditional_get import seed
+    headers, order_id = seed(args.orders)
+    with SessionLocal() as db:
+        admin = User(name="admin", username="admin", email="admin@example.com", password_hash="x",
+                     role=UserRole.ADMIN)
+        db.add(admin)
+        db.commit()
+        admin_token = create_access_token(user_token_claims(admin))
+    engine.dispose()
+    setup = {"list": headers[UserRole.MD], "detail": headers[UserRole.EMPLOYEE], "order_id": order_id,
+             "admin": {"Authorization": f"Bearer {admin_token}"}}
+
+    directory = tempfile.mkdtemp()
+    result = run("capture", 20, setup, {
+        "PROFILE_DIR": directory, "PROFILE_SLOW_MS": "0.001", "PROFILE_INTERVAL_MS": "1", "PROFILE_MAX_FILES": str(args.keep)
+    })
+    failures = check_profiles(directory, args.keep, result)
+
+    settings = {"off": {"PROFILE_SLOW_MS": "0"}, "sampled": {"PROFILE_SLOW_MS": "60000"}}
+    best = {}
+    for _ in range(args.rounds):
+        for name, env in settings.items():
+            elapsed = run("timing", args.requests, setup, {"PROFILE_DIR": directory, **env})["elapsed"]
+            best[name] = min(best.get(name, elapsed), elapsed)
+    print(f"Best of {args.rounds} rounds of {args.requests} requests")
+    for name in settings:
+        print(f"{name:>8} {args.requests / best[name]:9.0f} req/s {best[name] / args.requests * 1e6:8.0f}us")
+    overhead = (best["sampled"] / best["off"] - 1) * 100
+    print(f"Sampling every request: {overhead:.1f}% overhead")
+    if overhead > args.max_overhead:
+        failures.append(f"sampling cost {overhead:.1f}% of throughput, ceiling {args.max_overhead}%")
+
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK: profiles hold stacks and SQL, retention holds, and sampling stays within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Per-row cost of the standard and FAST_JSON serialization paths.
+
+For each size, seeds that many purchase orders (one approval each) and
+times the MD's unpaginated list both ways: ORM objects validated through
+the response model and encoded with json, against Core rows encoded with
+orjson. Load and encode are timed separately, then the whole request.
+Exits non-zero if the two paths ever send different bytes, including for
+a set of awkward values (control characters, non-ASCII, tiny and huge
+costs, whole-second timestamps).
+
+Usage:
+    python -m benchmarks.serialization --sizes 100 10000 100000
+
+Without DATABASE_URL set, a throwaway SQLite file is used. Needs orjson.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+os.environ["FAST_JSON"] = "true"
+
+import httpx
+from fastapi.routing import serialize_response
+from fastapi.responses import JSONResponse
+from sqlalchemy import insert, select
+
+import app.routers.purchase_orders as purchase_orders_router
+from app.auth.jwt import create_access_token, user_token_claims
+from app.database import AsyncSessionLocal, Base, SessionLocal, async_engine, engine
+from app.main import app
+from app.models.types import new_id
+from app.models.user import Approval, ApprovalStatus, PurchaseOrder, PurchaseOrderStatus, User, UserRole
+from app.projection import Projection, apply_projection
+from app.serialization import PURCHASE_ORDER_COLUMNS, dump_json, purchase_order_bodies
+from app.workflow import assigned_role_for
+
+# Values the two encoders must agree on
+AWKWARD_ORDERS = [
+    {"item_name": "Ctrl \x00\x1f\x7f   tab\t", "description": None, "cost": 0.00001},
+    {"item_name": "Ünïcødé 😀 \"quoted\" \\ /", "description": "line\nbreak", "cost": 1e16},
+    {"item_name": "Cheap", "description": "", "cost": 0.0},
+    {"item_name": "Round", "description": "x", "cost": 1234567.0},
+    {"item_name": "Fraction", "description": "x", "cost": 0.1 + 0.2},
+]
+
+
+def seed(orders: int, extra: list = ()) -> tuple:
+    """Reset the tables to `orders` purchase orders; return (MD auth headers, order ids)"""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    employee = User(name="Employee", username="employee", email="employee@example.com", password_hash="x",
+                    role=UserRole.EMPLOYEE)
+    md = User(name="MD", username="md", email="md@example.com", password_hash="x", role=UserRole.MD)
+    db.add_all([employee, md])
+    db.commit()
+
+    now = datetime.utcnow()
+    statuses = [PurchaseOrderStatus.PENDING, PurchaseOrderStatus.APPROVED, PurchaseOrderStatus.AWAITING_MD]
+    overrides = [{}] * orders + list(extra)
+    purchase_orders, approvals = [], []
+    for i, override in enumerate(overrides):
+        status = statuses[i % len(statuses)]
+        # Every other row lands on a whole second, which isoformat() and
+        # orjson both print without microseconds
+        created_at = now - timedelta(minutes=len(overrides) - i)
+        if i % 2:
+            created_at = created_at.replace(microsecond=0)
+        purchase_orders.append({
+            "id": new_id(), "item_name": f"Item {i}", "quantity": 1 + i % 20, "cost": 100 + i * 0.25,
+            "description": "x" * 200, "vendor_name": f"Vendor {i % 50}", "requested_by": employee.id,
+            "status": status, "assigned_role": assigned_role_for(status), "created_at": created_at,
+            "updated_at": created_at, **override,
+        })
+        approvals.append({
+            "id": new_id(), "purchase_order_id": purchase_orders[-1]["id"], "approved_by": md.id,
+            "role": UserRole.SPECIALIST.value, "status": ApprovalStatus.APPROVED,
+            "comments": override.get("description", "ok"), "approved_at": created_at,
+        })
+    with engine.begin() as conn:
+        for start in range(0, len(purchase_orders), 5000):
+            conn.execute(insert(PurchaseOrder), purchase_orders[start:start + 5000])
+            conn.execute(insert(Approval), approvals[start:start + 5000])
+
+    headers = {"Authorization": f"Bearer {create_access_token(user_token_claims(md))}"}
+    db.close()
+    return headers, [row["id"] for row in purchase_orders]
+
+
+def list_route():
+    return next(route for route in app.routes if getattr(route, "path", None) == "/purchase-orders"
+                and "GET" in route.methods)
+
+
+async def time_standard(rows: int) -> tuple:
+    """(load, encode) seconds for the ORM and response-model path"""
+    query = apply_projection(select(PurchaseOrder), Projection()).order_by(PurchaseOrder.created_at, PurchaseOrder.id)
+    async with AsyncSessionLocal() as db:
+        start = time.perf_counter()
+        orders = (await db.execute(query)).scalars().all()
+        loaded = time.perf_counter()
+        content = await serialize_response(field=list_route().response_field, response_content=orders)
+        body = JSONResponse(content).body
+        encoded = time.perf_counter()
+    assert len(orders) == rows
+    return loaded - start, encoded - loaded, body
+
+
+async def time_fast(rows: int) -> tuple:
+    """(load, encode) seconds for the Core row and orjson path"""
+    query = select(*PURCHASE_ORDER_COLUMNS).order_by(PurchaseOrder.created_at, PurchaseOrder.id)
+    async with AsyncSessionLocal() as db:
+        start = time.perf_counter()
+        orders = await purchase_order_bodies(db, (await db.execute(query)).all())
+        loaded = time.perf_counter()
+        body = dump_json(orders, [order["cost"] for order in orders])
+        encoded = time.perf_counter()
+    assert len(orders) == rows
+    return loaded - start, encoded - loaded, body
+
+
+async def fetch(client: httpx.AsyncClient, url: str, headers: dict, fast: bool) -> tuple:
+    purchase_orders_router.FAST_JSON = fast
+    start = time.perf_counter()
+    response = await client.get(url, headers=headers)
+    elapsed = time.perf_counter() - start
+    response.raise_for_status()
+    return elapsed, response.content
+
+
+async def compare(client: httpx.AsyncClient, headers: dict, ids: list) -> list:
+    """Urls whose standard and fast responses differ"""
+    urls = ["/purchase-orders", "/purchase-orders?limit=3", f"/purchase-orders/{ids[-1]}",
+            f"/purchase-orders/{ids[-1]}/approvals"]
+    mismatches = []
+    for url in urls:
+        _, standard = await fetch(client, url, headers, fast=False)
+        _, fast = await fetch(client, url, headers, fast=True)
+        if standard != fast:
+            mismatches.append(url)
+    return mismatches
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10000, 100000])
+    args = parser.parse_args()
+
+    transport = httpx.ASGITransport(app=app)
+    failures = []
+    print(f"{'rows':>7} {'path':<9} {'load/row':>10} {'encode/row':>11} {'request/row':>12} {'total':>9}")
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for rows in args.sizes:
+            headers, ids = seed(rows)
+            await async_engine.dispose()
+            # Fewer repetitions as the lists grow; the best run is reported
+            repeat = max(1, min(20, 100000 // rows))
+            results = {}
+            for path, timer, fast in (("standard", time_standard, False), ("fast", time_fast, True)):
+                runs = [await timer(rows) for _ in range(repeat)]
+                load, encode = min(run[0] for run in runs), min(run[1] for run in runs)
+                request = min([(await fetch(client, "/purchase-orders", headers, fast))[0] for _ in range(repeat)])
+                results[path] = runs[0][2]
+                print(
+                    f"{rows:>7} {path:<9} {load / rows * 1e6:8.1f}us {encode / rows * 1e6:9.1f}us"
+                    f" {request / rows * 1e6:10.1f}us {request * 1000:7.1f}ms"
+                )
+            if results["standard"] != results["fast"]:
+                failures.append(f"{rows} rows: encoded bodies differ")
+            failures += [f"{rows} rows: {url}" for url in await compare(client, headers, ids)]
+
+        headers, ids = seed(10, AWKWARD_ORDERS)
+        await async_engine.dispose()
+        failures += [f"awkward values: {url}" for url in await compare(client, headers, ids)]
+
+    await async_engine.dispose()
+    if failures:
+        print("FAIL: standard and fast responses differ: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK: both paths send identical bytes")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,112 @@
+"""
+Time from a cold interpreter to the first answered request.
+
+Seeds the database, then starts --runs fresh Python processes. Each one
+imports app.main, runs the application's lifespan startup and serves one
+authenticated GET /purchase-orders, timing each step. Every run is
+repeated without and with DB_POOL_PREWARM. Exits non-zero if importing
+the application created an engine, which would mean import does I/O again.
+
+Usage:
+    python -m benchmarks.startup --runs 5 --prewarm 4
+
+Without DATABASE_URL set, a throwaway SQLite file is used.
+"""
+import time
+
+START = time.perf_counter()
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+
+STEPS = ("import", "startup", "first request", "total")
+
+
+async def child():
+    """Run in the measured process: report step timings as JSON on stdout"""
+    imports_done = time.perf_counter()
+    from app import database
+    from app.main import app
+    imported = time.perf_counter()
+    engine_at_import = "async_engine" in vars(database)
+
+    import httpx  # The client is not part of the app's startup cost
+    client_ready = time.perf_counter()
+    headers = {"Authorization": f"Bearer {os.environ['STARTUP_BENCH_TOKEN']}"}
+    async with app.router.lifespan_context(app):
+        started = time.perf_counter()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            response = await client.get("/purchase-orders?limit=20", headers=headers)
+        answered = time.perf_counter()
+    assert response.status_code == 200, response.text
+    print(json.dumps({
+        "import": imported - imports_done,
+        "startup": started - client_ready,
+        "first request": answered - started,
+        "total": (imported - START) + (answered - client_ready),
+        "engine_at_import": engine_at_import,
+    }))
+
+
+def seed(orders: int) -> str:
+    """Reset the tables to `orders` purchase orders; return an MD access token"""
+    from app.database import engine
+    from app.models.user import UserRole
+    from benchmarks.conditional_get import seed as seed_orders
+    headers, _ = seed_orders(orders)
+    engine.dispose()
+    return headers[UserRole.MD]["Authorization"].split()[-1]
+
+
+def run(token: str, prewarm: int) -> dict:
+    env = dict(os.environ, STARTUP_BENCH_TOKEN=token, DB_POOL_PREWARM=str(prewarm))
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup", "--child"], env=env, check=True,
+        stdout=subprocess.PIPE, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--prewarm", type=int, default=4)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        import asyncio
+        asyncio.run(child())
+        return
+
+    token = seed(args.orders)
+    failures = []
+    print(f"Median of {args.runs} cold starts, {args.orders} orders")
+    print(f"{'prewarm':>7} " + " ".join(f"{step:>14}" for step in STEPS))
+    for prewarm in (0, args.prewarm):
+        runs = [run(token, prewarm) for _ in range(args.runs)]
+        print(f"{prewarm:>7} " + " ".join(
+            f"{statistics.median(r[step] for r in runs) * 1000:12.1f}ms" for step in STEPS
+        ))
+        if any(r["engine_at_import"] for r in runs):
+            failures.append(f"prewarm={prewarm}: importing app.main created an engine")
+
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK: importing the application opens no database connection")
+
+
+if __name__ == "__main__":
+    main()
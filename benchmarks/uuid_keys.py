@@ -0,0 +1,104 @@
+"""
+Insert rate and index size of String(36) uuid4 keys versus BINARY(16) uuid7 keys.
+
+Creates two copies of a purchase_orders-shaped table, one keyed the old way
+(random UUID text) and one the new way (time-ordered 16-byte binary), inserts
+the same rows into each in batches and reports rows/s plus the on-disk size
+of the table and its indexes.
+
+Usage:
+    python -m benchmarks.uuid_keys --rows 100000
+
+Without DATABASE_URL set, a throwaway SQLite file is used. Against MySQL the
+sizes come from information_schema after ANALYZE TABLE.
+"""
+import argparse
+import os
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+
+from sqlalchemy import Column, DateTime, Float, Index, MetaData, String, Table, insert, text
+
+from app.database import engine
+from app.models.types import BinaryUUID, new_id
+
+BATCH_SIZE = 1000
+
+
+def build_table(metadata: MetaData, name: str, id_type) -> Table:
+    return Table(
+        name, metadata,
+        Column("id", id_type, primary_key=True),
+        Column("requested_by", id_type, nullable=False),
+        Column("item_name", String(100), nullable=False),
+        Column("cost", Float, nullable=False),
+        Column("created_at", DateTime, nullable=False),
+        Index(f"ix_{name}_requested_by", "requested_by"),
+    )
+
+
+def table_size(table: str) -> tuple:
+    """Return (table bytes, index bytes) for a table on the current dialect"""
+    with engine.connect() as conn:
+        if engine.dialect.name == "sqlite":
+            rows = conn.execute(text(
+                "SELECT name, SUM(pgsize) FROM dbstat "
+                "WHERE name = :table OR name IN (SELECT name FROM sqlite_master WHERE tbl_name = :table AND type = 'index') "
+                "GROUP BY name"
+            ), {"table": table}).all()
+            data = sum(size for name, size in rows if name == table)
+            return data, sum(size for name, size in rows if name != table)
+        conn.execute(text(f"ANALYZE TABLE {table}"))
+        row = conn.execute(text(
+            "SELECT data_length, index_length FROM information_schema.tables "
+            "WHERE table_schema = DATABASE() AND table_name = :table"
+        ), {"table": table}).one()
+        return row[0], row[1]
+
+
+def run(table: Table, make_id, rows: int, requesters: list) -> float:
+    now = datetime.utcnow()
+    start = time.perf_counter()
+    for batch_start in range(0, rows, BATCH_SIZE):
+        batch = [
+            {"id": make_id(), "requested_by": requesters[i % len(requesters)],
+             "item_name": f"Item {i}", "cost": 100.0, "created_at": now}
+            for i in range(batch_start, min(rows, batch_start + BATCH_SIZE))
+        ]
+        with engine.begin() as conn:
+            conn.execute(insert(table), batch)
+    return rows / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    metadata = MetaData()
+    variants = [
+        ("String(36) uuid4", build_table(metadata, "bench_keys_string", String(36)), lambda: str(uuid.uuid4())),
+        ("BINARY(16) uuid7", build_table(metadata, "bench_keys_binary", BinaryUUID), new_id),
+    ]
+    metadata.drop_all(bind=engine)
+    metadata.create_all(bind=engine)
+
+    print(f"{args.rows} rows in batches of {BATCH_SIZE}")
+    print(f"{'keys':>18} {'rows/s':>9} {'table':>10} {'indexes':>10}")
+    try:
+        for label, table, make_id in variants:
+            requesters = [make_id() for _ in range(200)]
+            rate = run(table, make_id, args.rows, requesters)
+            data, indexes = table_size(table.name)
+            print(f"{label:>18} {rate:9.0f} {data / 1024 ** 2:8.1f}MB {indexes / 1024 ** 2:8.1f}MB")
+    finally:
+        metadata.drop_all(bind=engine)
+
+
+if __name__ == "__main__":
+    main()
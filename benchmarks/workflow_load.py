@@ -0,0 +1,431 @@
+"""
+Load test of the approval workflow: throughput and latency percentiles per route.
+
+Starts the app (lifespan included) against a freshly seeded database and
+runs scripted actors for --duration seconds:
+
+  employee-N    create orders (costs either side of APPROVAL_THRESHOLD),
+                page through their own list and open their orders
+  specialist-N, deputy_md-N, md-N
+                read their queue and approve or deny what is in it, so
+                orders move through the real workflow routing
+  dashboard-N   poll the MD list with If-None-Match, inbox counts and stats
+
+Every request can be recorded to a JSONL trace (one request per line,
+with its offset, actor, method, path and body) and replayed later against
+a fresh database. Ids of orders created during the run are mapped to the
+ids the replay creates. Logins happen once per actor before the clock
+starts and are not part of the report.
+
+Results can be saved as a named baseline and compared on a later run;
+the run fails if a route's p95 or throughput regresses by more than
+--tolerance. It also fails on any error response other than a reviewer
+losing a race for an order (400/409), or if an order's approvals did not
+follow app.workflow.
+
+Usage:
+    python -m benchmarks.workflow_load run --duration 30 --record /tmp/workflow.jsonl --save-baseline main
+    python -m benchmarks.workflow_load replay /tmp/workflow.jsonl --speed 0
+    python -m benchmarks.workflow_load run --duration 30 --compare main
+
+Without DATABASE_URL set, a throwaway SQLite file is used.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+
+import httpx
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from app.auth.passwords import get_password_hash
+from app.database import Base, SessionLocal, engine
+from app.main import app
+from app.models.user import ApprovalStatus, PurchaseOrder, User, UserRole
+from app.workflow import APPROVAL_THRESHOLD, INITIAL_STATUS, WORKFLOW
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+PASSWORD = "password123"
+ACTOR_ROLES = {
+    "employee": UserRole.EMPLOYEE,
+    "specialist": UserRole.SPECIALIST,
+    "deputy_md": UserRole.DEPUTY_MD,
+    "md": UserRole.MD,
+    "dashboard": UserRole.MD,
+}
+UUID_PATTERN = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+# Responses that are part of normal contention rather than failures: a
+# reviewer acting on an order another reviewer of the same role just moved
+EXPECTED_CONFLICTS = {400, 409}
+# Latency differences below this are noise, whatever the ratio
+NOISE_FLOOR_MS = 1.0
+
+
+def actor_role(actor: str) -> UserRole:
+    return ACTOR_ROLES[actor.rsplit("-", 1)[0]]
+
+
+def seed(actors: list):
+    """Reset the tables and create one user per actor, all with the same password"""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    password_hash = get_password_hash(PASSWORD)
+    db = SessionLocal()
+    db.add_all([
+        User(name=actor, username=actor, email=f"{actor}@example.com", password_hash=password_hash,
+             role=actor_role(actor))
+        for actor in actors
+    ])
+    db.commit()
+    db.close()
+    engine.dispose()
+
+
+def route_label(method: str, path: str) -> str:
+    """The route template a request hits, e.g. "POST /purchase-orders/{id}/approve" """
+    path = path.split("?", 1)[0]
+    for route in app.routes:
+        methods = getattr(route, "methods", None)
+        if methods and method in methods and route.path_regex.match(path):
+            return f"{method} {route.path}"
+    return f"{method} {path}"
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Recorder:
+    """Collects per-route latencies and optionally writes the trace"""
+
+    def __init__(self, trace_path: str = None):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.trace = open(trace_path, "w") if trace_path else None
+        self.start = None
+
+    def begin(self):
+        self.start = time.perf_counter()
+
+    def record(self, actor: str, method: str, path: str, body, conditional: bool,
+               response: httpx.Response, started: float, elapsed: float):
+        label = route_label(method, path)
+        self.latencies[label].append(elapsed)
+        self.statuses[label][response.status_code] += 1
+        if self.trace is not None:
+            entry = {
+                "offset": round(started - self.start, 6), "actor": actor, "method": method, "path": path,
+                "body": body, "conditional": conditional, "status": response.status_code,
+                "latency_ms": round(elapsed * 1000, 3),
+            }
+            if method == "POST" and path == "/purchase-orders" and response.status_code == 201:
+                entry["created_id"] = response.json()["id"]
+            self.trace.write(json.dumps(entry) + "\n")
+
+    def close(self):
+        if self.trace is not None:
+            self.trace.close()
+
+    def report(self, duration: float) -> dict:
+        routes = {}
+        for label in sorted(self.latencies):
+            values = sorted(self.latencies[label])
+            statuses = self.statuses[label]
+            routes[label] = {
+                "count": len(values),
+                "rps": len(values) / duration,
+                "p50_ms": percentile(values, 0.50) * 1000,
+                "p95_ms": percentile(values, 0.95) * 1000,
+                "p99_ms": percentile(values, 0.99) * 1000,
+                "statuses": {str(code): count for code, count in sorted(statuses.items())},
+            }
+        total = sum(route["count"] for route in routes.values())
+        return {"duration_s": duration, "requests": total, "rps": total / duration, "routes": routes}
+
+
+class Actor:
+    """A logged-in user issuing requests through the shared client"""
+
+    def __init__(self, name: str, client: httpx.AsyncClient, recorder: Recorder, rng: random.Random):
+        self.name = name
+        self.client = client
+        self.recorder = recorder
+        self.rng = rng
+        self.headers = {}
+        self.etags = {}
+
+    async def login(self):
+        response = await self.client.post("/auth/login", data={"username": f"{self.name}@example.com",
+                                                               "password": PASSWORD})
+        response.raise_for_status()
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def request(self, method: str, path: str, body=None, conditional: bool = False) -> httpx.Response:
+        headers = dict(self.headers)
+        if conditional and path in self.etags:
+            headers["If-None-Match"] = self.etags[path]
+        started = time.perf_counter()
+        response = await self.client.request(method, path, json=body, headers=headers)
+        elapsed = time.perf_counter() - started
+        if "ETag" in response.headers:
+            self.etags[path] = response.headers["ETag"]
+        self.recorder.record(self.name, method, path, body, conditional, response, started, elapsed)
+        return response
+
+    async def think(self, mean: float):
+        await asyncio.sleep(self.rng.expovariate(1 / mean) if mean > 0 else 0)
+
+
+async def employee(actor: Actor, deadline: float, think: float):
+    own = []
+    while time.perf_counter() < deadline:
+        # Mostly under the threshold, with a tail that needs the MD
+        cost = round(min(actor.rng.lognormvariate(6.2, 0.9), APPROVAL_THRESHOLD * 20), 2)
+        response = await actor.request("POST", "/purchase-orders", {
+            "item_name": f"Item {actor.rng.randrange(1000)}", "quantity": actor.rng.randint(1, 20),
+            "cost": cost, "vendor_name": f"Vendor {actor.rng.randrange(50)}",
+            "description": "Load test order",
+        })
+        if response.status_code == 201:
+            own.append(response.json()["id"])
+        await actor.think(think)
+        if own and actor.rng.random() < 0.5:
+            await actor.request("GET", f"/purchase-orders/{actor.rng.choice(own)}")
+        else:
+            await actor.request("GET", "/purchase-orders?limit=20")
+        await actor.think(think)
+
+
+async def reviewer(actor: Actor, deadline: float, think: float):
+    role = actor_role(actor.name)
+    while time.perf_counter() < deadline:
+        if role == UserRole.MD:
+            # The MD's list is every order; their inbox is the ones assigned to them
+            response = await actor.request("GET", "/purchase-orders?fields=assigned_role&expand=")
+            items = [item for item in response.json() if item["assigned_role"] == role.value] \
+                if response.status_code == 200 else []
+        else:
+            response = await actor.request("GET", "/purchase-orders?limit=20")
+            items = response.json()["items"] if response.status_code == 200 else []
+        if not items:
+            await actor.request("GET", "/purchase-orders/inbox/count")
+            await actor.think(think * 4)
+            continue
+        # Several reviewers share a role; spread them over the head of the queue
+        order = actor.rng.choice(items[:5])
+        decision = ApprovalStatus.APPROVED if actor.rng.random() < 0.9 else ApprovalStatus.DENIED
+        await actor.request("POST", f"/purchase-orders/{order['id']}/approve", {
+            "status": decision.value, "comments": "Load test decision",
+        })
+        await actor.think(think)
+
+
+async def dashboard(actor: Actor, deadline: float, think: float):
+    paths = ["/purchase-orders?limit=50", "/purchase-orders/inbox/count", "/purchase-orders/stats",
+             "/purchase-orders/stats?group_by=assigned_role"]
+    while time.perf_counter() < deadline:
+        for path in paths:
+            await actor.request("GET", path, conditional=path.startswith("/purchase-orders?"))
+        await actor.think(think * 4)
+
+
+SCENARIOS = {"employee": employee, "specialist": reviewer, "deputy_md": reviewer, "md": reviewer,
+             "dashboard": dashboard}
+
+
+class IdMap:
+    """Recorded order ids mapped to the ids created during a replay"""
+
+    def __init__(self):
+        self.ids = {}
+        self.events = defaultdict(asyncio.Event)
+
+    def add(self, recorded: str, created: str):
+        self.ids[recorded] = created
+        self.events[recorded].set()
+
+    async def resolve(self, path: str, timeout: float = 10) -> str:
+        for recorded in UUID_PATTERN.findall(path):
+            # The create may still be in flight on another actor
+            await asyncio.wait_for(self.events[recorded].wait(), timeout)
+            path = path.replace(recorded, self.ids[recorded])
+        return path
+
+
+async def replay_actor(actor: Actor, entries: list, ids: IdMap, start: float, speed: float):
+    for entry in entries:
+        if speed > 0:
+            await asyncio.sleep(max(0.0, start + entry["offset"] / speed - time.perf_counter()))
+        path = await ids.resolve(entry["path"])
+        response = await actor.request(entry["method"], path, entry["body"], entry["conditional"])
+        if "created_id" in entry and response.status_code == 201:
+            ids.add(entry["created_id"], response.json()["id"])
+
+
+def check_routing() -> list:
+    """Orders whose approvals did not follow the workflow in app.workflow"""
+    stages = {stage.status: stage for stage in WORKFLOW}
+    violations = []
+    db = SessionLocal()
+    for order in db.execute(select(PurchaseOrder).options(selectinload(PurchaseOrder.approvals))).scalars():
+        status = INITIAL_STATUS
+        for approval in sorted(order.approvals, key=lambda approval: approval.approved_at):
+            stage = stages.get(status)
+            if stage is None or approval.role != stage.reviewer.value:
+                violations.append(f"{order.id}: {approval.role} decided it while {status.value}")
+                break
+            status = stage.next_status(approval.status, order.cost)
+        else:
+            if status != order.status:
+                violations.append(f"{order.id}: is {order.status.value}, approvals lead to {status.value}")
+    db.close()
+    return violations
+
+
+def print_report(report: dict, baseline: dict = None):
+    print(f"{report['requests']} requests in {report['duration_s']:.1f}s, {report['rps']:.1f} req/s")
+    header = f"{'route':<44} {'count':>6} {'req/s':>7} {'p50':>8} {'p95':>8} {'p99':>8}  statuses"
+    if baseline:
+        header += "  (p95, req/s vs baseline)"
+    print(header)
+    for label, route in report["routes"].items():
+        line = (f"{label:<44} {route['count']:>6} {route['rps']:>7.1f} {route['p50_ms']:>6.1f}ms"
+                f" {route['p95_ms']:>6.1f}ms {route['p99_ms']:>6.1f}ms  "
+                + " ".join(f"{code}:{count}" for code, count in route["statuses"].items()))
+        base = (baseline or {}).get("routes", {}).get(label)
+        if base:
+            line += f"  ({(route['p95_ms'] / base['p95_ms'] - 1) * 100:+.0f}%, {(route['rps'] / base['rps'] - 1) * 100:+.0f}%)"
+        print(line)
+
+
+def regressions(report: dict, baseline: dict, tolerance: float) -> list:
+    found = []
+    for label, base in baseline["routes"].items():
+        route = report["routes"].get(label)
+        if route is None:
+            continue
+        if route["p95_ms"] > base["p95_ms"] * (1 + tolerance) and route["p95_ms"] - base["p95_ms"] > NOISE_FLOOR_MS:
+            found.append(f"{label} p95 {base['p95_ms']:.1f}ms -> {route['p95_ms']:.1f}ms")
+        if route["rps"] < base["rps"] * (1 - tolerance):
+            found.append(f"{label} {base['rps']:.1f} -> {route['rps']:.1f} req/s")
+    return found
+
+
+def baseline_path(name: str) -> str:
+    return os.path.join(BASELINE_DIR, f"{name}.json")
+
+
+async def run_load(args, actors: list, recorder: Recorder, body) -> dict:
+    """Log every actor in, run body(actors by name) under the app's lifespan, return the report"""
+    seed(actors)
+    async with app.router.lifespan_context(app):
+        # Unhandled errors come back as 500s to be counted, as a server would send them
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            by_name = {
+                name: Actor(name, client, recorder, random.Random(f"{args.seed}:{name}")) for name in actors
+            }
+            for actor in by_name.values():
+                await actor.login()
+            recorder.begin()
+            await body(by_name)
+            duration = time.perf_counter() - recorder.start
+    recorder.close()
+    return recorder.report(duration)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run = subparsers.add_parser("run", help="run the scripted workflow scenarios")
+    run.add_argument("--duration", type=float, default=20)
+    run.add_argument("--employees", type=int, default=10)
+    run.add_argument("--reviewers", type=int, default=2, help="per reviewing role")
+    run.add_argument("--dashboards", type=int, default=3)
+    run.add_argument("--think", type=float, default=0.1, help="mean seconds between an actor's actions")
+    run.add_argument("--record", help="write the requests made to this JSONL trace")
+    replay = subparsers.add_parser("replay", help="replay a recorded JSONL trace")
+    replay.add_argument("trace")
+    replay.add_argument("--speed", type=float, default=1.0, help="time scale; 0 sends as fast as possible")
+    for subparser in (run, replay):
+        subparser.add_argument("--seed", type=int, default=1)
+        subparser.add_argument("--save-baseline", metavar="NAME")
+        subparser.add_argument("--compare", metavar="NAME")
+        subparser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(baseline_path(args.compare)) as f:
+            baseline = json.load(f)
+
+    if args.command == "run":
+        actors = [f"employee-{i}" for i in range(1, args.employees + 1)]
+        actors += [f"{role}-{i}" for role in ("specialist", "deputy_md", "md") for i in range(1, args.reviewers + 1)]
+        actors += [f"dashboard-{i}" for i in range(1, args.dashboards + 1)]
+
+        async def body(by_name):
+            deadline = time.perf_counter() + args.duration
+            await asyncio.gather(*[
+                SCENARIOS[name.rsplit("-", 1)[0]](actor, deadline, args.think) for name, actor in by_name.items()
+            ])
+
+        report = await run_load(args, actors, Recorder(args.record), body)
+    else:
+        with open(args.trace) as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+        per_actor = defaultdict(list)
+        for entry in entries:
+            per_actor[entry["actor"]].append(entry)
+
+        async def body(by_name):
+            ids, start = IdMap(), time.perf_counter()
+            await asyncio.gather(*[
+                replay_actor(by_name[name], actor_entries, ids, start, args.speed)
+                for name, actor_entries in per_actor.items()
+            ])
+
+        report = await run_load(args, list(per_actor), Recorder(), body)
+
+    report["scenario"] = {key: value for key, value in vars(args).items()
+                          if key not in ("save_baseline", "compare", "tolerance", "record")}
+    report["created_at"] = datetime.utcnow().isoformat()
+    print_report(report, baseline)
+    if baseline is not None and baseline.get("scenario") != report["scenario"]:
+        print(f"Note: baseline {args.compare} ran a different scenario: {baseline.get('scenario')}")
+
+    failures = [f"{label}: {count} x {code}" for label, route in report["routes"].items()
+                for code, count in route["statuses"].items()
+                if int(code) >= 400 and int(code) not in EXPECTED_CONFLICTS]
+    failures += check_routing()
+    if baseline is not None:
+        failures += regressions(report, baseline, args.tolerance)
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(baseline_path(args.save_baseline), "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline {baseline_path(args.save_baseline)}")
+
+    if failures:
+        print("FAIL: " + "; ".join(failures[:20]))
+        sys.exit(1)
+    print("OK: no unexpected errors, every order followed the workflow"
+          + (f", within {args.tolerance:.0%} of baseline {args.compare}" if baseline else ""))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
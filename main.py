@@ -2,12 +2,10 @@ import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.routers import users, auth, purchase_orders
-from app.database import engine, Base
+from app.main import lifespan
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
-
-app = FastAPI(title="FastAPI Backend", description="FastAPI backend with JWT authentication and PostgreSQL")
+app = FastAPI(title="FastAPI Backend", description="FastAPI backend with JWT authentication and PostgreSQL",
+              lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -0,0 +1,64 @@
+"""
+Drop purchase_order_changes rows older than the retention period.
+
+Usage:
+    python prune_changes.py              # keep CHANGE_RETENTION_DAYS (default 30)
+    python prune_changes.py --days 7
+
+Rows are removed oldest first, in short transactions of --batch-size rows,
+so it can run while the API is serving. The newest row is always kept:
+GET /purchase-orders/changes compares a client's cursor with the oldest
+remaining id to tell when changes it has not seen were pruned (410).
+"""
+import argparse
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, select
+from app.changes import CHANGE_RETENTION_DAYS
+from app.database import engine
+from app.models.user import PurchaseOrderChange
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def prune(conn_factory, cutoff: datetime, batch_size: int) -> int:
+    """Delete changes made before cutoff; return how many rows went"""
+    with conn_factory() as conn:
+        newest = conn.execute(select(func.max(PurchaseOrderChange.id))).scalar()
+        boundary = conn.execute(
+            select(func.max(PurchaseOrderChange.id)).where(PurchaseOrderChange.changed_at < cutoff)
+        ).scalar()
+        oldest = conn.execute(select(func.min(PurchaseOrderChange.id))).scalar()
+    if boundary is None:
+        return 0
+    boundary = min(boundary, newest - 1)
+
+    deleted = 0
+    # Ids only grow, so everything up to the boundary goes, one range at a time
+    for start in range(oldest, boundary + 1, batch_size):
+        with conn_factory() as conn:
+            result = conn.execute(
+                delete(PurchaseOrderChange).where(
+                    PurchaseOrderChange.id >= start,
+                    PurchaseOrderChange.id <= min(start + batch_size - 1, boundary)
+                )
+            )
+        deleted += result.rowcount
+    return deleted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--days", type=int, default=CHANGE_RETENTION_DAYS, help="days of changes to keep")
+    parser.add_argument("--batch-size", type=int, default=10000, help="rows deleted per transaction")
+    args = parser.parse_args()
+
+    cutoff = datetime.utcnow() - timedelta(days=args.days)
+    deleted = prune(engine.begin, cutoff, args.batch_size)
+    logger.info(f"Pruned {deleted} purchase order changes made before {cutoff.isoformat()}")
+
+
+if __name__ == "__main__":
+    main()
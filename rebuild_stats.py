@@ -0,0 +1,81 @@
+"""
+Recompute the purchase_order_stats rollup from purchase_orders and verify it.
+
+Usage:
+    python rebuild_stats.py            # rebuild, then verify
+    python rebuild_stats.py --verify   # only report drift; exits 1 if any
+
+The rebuild replaces the table in one transaction. Orders created or
+approved while it runs can be missed, so run it when writes are quiet and
+verify afterwards.
+"""
+import argparse
+import logging
+import sys
+from sqlalchemy import delete, insert, select
+from app.database import engine
+from app.models.user import PurchaseOrderStat
+from app.stats import aggregate_purchase_orders, aggregate_rows
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Totals are floats summed in a different order, so allow rounding noise
+COST_TOLERANCE = 0.005
+
+
+def _key(row: dict) -> tuple:
+    return (row["status"], row["assigned_role"], row["vendor_name"], row["month"])
+
+
+def rebuild(conn):
+    rows = aggregate_rows(conn.execute(aggregate_purchase_orders()))
+    conn.execute(delete(PurchaseOrderStat))
+    if rows:
+        conn.execute(insert(PurchaseOrderStat), rows)
+    logger.info(f"Rebuilt purchase_order_stats: {len(rows)} rows")
+
+
+def find_drift(conn) -> list:
+    """Describe every rollup key whose stored values differ from a fresh aggregate"""
+    expected = {_key(row): row for row in aggregate_rows(conn.execute(aggregate_purchase_orders()))}
+    stored = {
+        _key(row): row
+        for row in conn.execute(select(PurchaseOrderStat.__table__)).mappings()
+        if row["order_count"] or abs(row["total_cost"]) > COST_TOLERANCE
+    }
+    drift = []
+    for key in sorted(set(expected) | set(stored), key=str):
+        want = expected.get(key, {"order_count": 0, "total_cost": 0.0})
+        have = stored.get(key, {"order_count": 0, "total_cost": 0.0})
+        if want["order_count"] != have["order_count"] or abs(want["total_cost"] - have["total_cost"]) > COST_TOLERANCE:
+            status, assigned_role, vendor_name, month = key
+            drift.append(
+                f"{status.value}/{assigned_role or '-'}/{vendor_name}/{month}: "
+                f"stored {have['order_count']} / {have['total_cost']:.2f}, "
+                f"expected {want['order_count']} / {want['total_cost']:.2f}"
+            )
+    return drift
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--verify", action="store_true", help="only check the rollup, do not rebuild it")
+    args = parser.parse_args()
+
+    if not args.verify:
+        with engine.begin() as conn:
+            rebuild(conn)
+
+    with engine.connect() as conn:
+        drift = find_drift(conn)
+    for line in drift:
+        logger.error(f"Rollup drift {line}")
+    if drift:
+        sys.exit(1)
+    logger.info("purchase_order_stats matches purchase_orders")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,50 @@
+"""
+Seed the database.
+
+Usage:
+    python seed_db.py                                    # five demo users and three orders
+    python seed_db.py --users 10000 --orders 5000000     # synthetic data at scale
+
+Scale mode replaces all data with generated users, orders and approval
+chains, every account with the password "password123". The same --seed
+and --until always produce the same rows, whatever --workers is; only the
+salt of the shared password hash differs between runs.
+"""
+import argparse
 import asyncio
+import bisect
+import itertools
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, time as day_time, timedelta
+import multiprocessing
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, insert, text
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
-from app.database import SessionLocal, engine, Base
-from app.models.user import User, UserRole, PurchaseOrder, PurchaseOrderStatus
-from app.auth.jwt import get_password_hash
+from app.database import DATABASE_URL, IS_SQLITE, SessionLocal, engine_options, engine, Base
+from app.models.types import BinaryUUID, uuid7_int
+from app.models.user import User, UserRole, PurchaseOrder, PurchaseOrderStatus, Approval, ApprovalStatus
+from app.auth.passwords import get_password_hash, hash_password, password_hasher
+from app.workflow import APPROVAL_THRESHOLD, INITIAL_STATUS, WORKFLOW, assigned_role_for
+from rebuild_stats import rebuild
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")
+
+
+def migrate():
+    """Create or upgrade the schema with Alembic, so later upgrades know its revision"""
+    command.upgrade(Config(ALEMBIC_INI, attributes={"configure_logger": False}), "head")
+
 # Create a database session
 def get_db() -> Session:
     db = SessionLocal()
@@ -23,32 +58,35 @@ def get_db() -> Session:
 
 async def seed_database():
     try:
-        # Create tables if they don't exist
-        logger.info("Creating database tables if they don't exist...")
-        Base.metadata.create_all(bind=engine)
+        logger.info("Migrating the database to the latest revision...")
+        migrate()
         
         db = get_db()
         
         # Clear existing data
         logger.info("Clearing existing data...")
         try:
-            db.query(PurchaseOrder).delete()
-            db.query(User).delete()
-            db.commit()
+            # Every table, so approvals, tokens, the stats rollup and the
+            # change log do not outlive the orders they describe
+            with engine.begin() as conn:
+                for table in reversed(Base.metadata.sorted_tables):
+                    conn.execute(table.delete())
         except SQLAlchemyError as e:
-            db.rollback()
             logger.error(f"Error clearing existing data: {str(e)}")
             raise
     
         logger.info("Creating users...")
         
+        # Hash in the worker pool, all five in parallel
+        password_hashes = await asyncio.gather(*(hash_password("password123") for _ in range(5)))
+        
         # Create 5 users with different roles
         users = [
         User(
             name="Employee User",
             username="employee",
             email="employee@example.com",
-            password_hash=get_password_hash("password123"),
+            password_hash=password_hashes[0],
             role=UserRole.EMPLOYEE,
             is_active=True
         ),
@@ -56,7 +94,7 @@ async def seed_database():
             name="Specialist User",
             username="specialist",
             email="specialist@example.com",
-            password_hash=get_password_hash("password123"),
+            password_hash=password_hashes[1],
             role=UserRole.SPECIALIST,
             is_active=True
         ),
@@ -64,7 +102,7 @@ async def seed_database():
             name="Manager User",
             username="manager",
             email="manager@example.com",
-            password_hash=get_password_hash("password123"),
+            password_hash=password_hashes[2],
             role=UserRole.MANAGER,
             is_active=True
         ),
@@ -72,7 +110,7 @@ async def seed_database():
             name="Deputy MD",
             username="deputy_md",
             email="deputy_md@example.com",
-            password_hash=get_password_hash("password123"),
+            password_hash=password_hashes[3],
             role=UserRole.DEPUTY_MD,
             is_active=True
         ),
@@ -80,7 +118,7 @@ async def seed_database():
             name="Managing Director",
             username="md",
             email="md@example.com",
-            password_hash=get_password_hash("password123"),
+            password_hash=password_hashes[4],
             role=UserRole.MD,
             is_active=True
         )
@@ -112,29 +150,32 @@ async def seed_database():
             PurchaseOrder(
                 item_name="Office Supplies",
                 quantity=10,
-                cost=500.00,  # Under 1000 threshold
+                cost=500.00,  # Under the 1000 approval threshold
                 description="Various office supplies including pens, notebooks, and staplers",
                 vendor_name="Office Depot",
                 requested_by=employee.id,
-                status=PurchaseOrderStatus.PENDING
+                status=PurchaseOrderStatus.PENDING,
+                assigned_role=assigned_role_for(PurchaseOrderStatus.PENDING)
             ),
             PurchaseOrder(
                 item_name="Laptop Computer",
                 quantity=1,
-                cost=1500.00,  # Over 1000 threshold
+                cost=1500.00,  # Over the 1000 approval threshold
                 description="High-performance laptop for development work",
                 vendor_name="Dell Technologies",
                 requested_by=employee.id,
-                status=PurchaseOrderStatus.PENDING
+                status=PurchaseOrderStatus.PENDING,
+                assigned_role=assigned_role_for(PurchaseOrderStatus.PENDING)
             ),
             PurchaseOrder(
                 item_name="Office Furniture",
                 quantity=5,
-                cost=2500.00,  # Over 1000 threshold
+                cost=2500.00,  # Over the 1000 approval threshold
                 description="Ergonomic chairs and adjustable desks",
                 vendor_name="IKEA Business",
                 requested_by=employee.id,
-                status=PurchaseOrderStatus.PENDING
+                status=PurchaseOrderStatus.PENDING,
+                assigned_role=assigned_role_for(PurchaseOrderStatus.PENDING)
             )
         ]
         
@@ -144,6 +185,8 @@ async def seed_database():
                 db.add(po)
             db.commit()
             logger.info("Purchase orders created successfully!")
+            with engine.begin() as conn:
+                rebuild(conn)
             logger.info("Database seeding completed!")
         except SQLAlchemyError as e:
             db.rollback()
@@ -154,10 +197,286 @@ async def seed_database():
         logger.error(f"An unexpected error occurred: {str(e)}")
         raise
 
+
+# Scale mode. Roles of the generated users, after the six demo accounts;
+# reviewers are a small fraction of staff, as in production
+USER_ROLE_WEIGHTS = {
+    UserRole.EMPLOYEE: 930,
+    UserRole.SPECIALIST: 40,
+    UserRole.MANAGER: 10,
+    UserRole.DEPUTY_MD: 15,
+    UserRole.MD: 5,
+}
+# Mean hours each reviewer takes to decide, and how often they deny
+DECISION_HOURS = {UserRole.SPECIALIST: 20, UserRole.DEPUTY_MD: 36, UserRole.MD: 60}
+DENY_RATE = {UserRole.SPECIALIST: 0.08, UserRole.DEPUTY_MD: 0.06, UserRole.MD: 0.12}
+ITEMS = [
+    "Laptop", "Monitor", "Docking station", "Office chair", "Standing desk", "Printer toner",
+    "Paper (box)", "Software licence", "Cloud credits", "Conference travel", "Training course",
+    "Server rack", "Network switch", "Headsets", "Whiteboard", "Catering", "Cleaning supplies",
+    "Safety equipment", "Mobile phone", "Consulting hours",
+]
+# Share of orders priced just under the approval threshold, to avoid the
+# MD stage; real requesters do this and it skews the cost distribution
+UNDER_THRESHOLD_SHARE = 0.06
+
+EPOCH = datetime(1970, 1, 1)
+
+# Set in each worker process by _init_worker
+_plan = None
+_worker_engine = None
+_vendor_weights = None
+_requester_weights = None
+
+
+def seeded_id(rng: random.Random, moment: datetime) -> bytes:
+    """The stored form of a UUIDv7 for `moment` whose random part comes from rng"""
+    # Timestamps are naive UTC, like the ones the API stores
+    return uuid7_int((moment - EPOCH) // timedelta(milliseconds=1), rng.getrandbits(80)).to_bytes(16, "big")
+
+
+def cumulative_zipf(n: int, exponent: float) -> list:
+    """Cumulative weights for choosing among n items with a Zipf-like skew"""
+    total, weights = 0.0, []
+    for rank in range(1, n + 1):
+        total += 1 / rank ** exponent
+        weights.append(total)
+    return weights
+
+
+def generate_users(count: int, seed: int, created_at: datetime, password_hash: str) -> list:
+    rng = random.Random(f"{seed}:users")
+    roles = list(USER_ROLE_WEIGHTS)
+    cum_weights = list(itertools.accumulate(USER_ROLE_WEIGHTS.values()))
+    demo = [
+        ("Employee User", "employee", UserRole.EMPLOYEE),
+        ("Specialist User", "specialist", UserRole.SPECIALIST),
+        ("Manager User", "manager", UserRole.MANAGER),
+        ("Deputy MD", "deputy_md", UserRole.DEPUTY_MD),
+        ("Managing Director", "md", UserRole.MD),
+        ("Administrator", "admin", UserRole.ADMIN),
+    ]
+    users = []
+    for index in range(count):
+        if index < len(demo):
+            name, username, role = demo[index]
+        else:
+            name, username = f"User {index}", f"user{index}"
+            role = rng.choices(roles, cum_weights=cum_weights)[0]
+        users.append({
+            "id": seeded_id(rng, created_at), "name": name, "username": username,
+            "email": f"{username}@example.com", "password_hash": password_hash, "role": role,
+            "is_active": True, "token_version": 0, "created_at": created_at,
+        })
+    return users
+
+
+def _init_worker(plan: dict):
+    """Give a worker process the plan and its own engine"""
+    global _plan, _worker_engine, _vendor_weights, _requester_weights
+    _plan = plan
+    # Not connected on SQLite, where workers only need its dialect
+    _worker_engine = create_engine(DATABASE_URL, **engine_options)
+    _vendor_weights = cumulative_zipf(plan["vendors"], 1.1)
+    _requester_weights = cumulative_zipf(len(plan["employees"]), 0.8)
+
+
+def _cost(rng: random.Random) -> float:
+    if rng.random() < UNDER_THRESHOLD_SHARE:
+        cost = rng.uniform(0.9, 1.0) * APPROVAL_THRESHOLD
+    else:
+        # Median at 65% of the threshold; about a third of orders go over it
+        cost = rng.lognormvariate(math.log(APPROVAL_THRESHOLD * 0.65), 1.0)
+        if rng.random() < 0.3:
+            cost = max(round(cost / 50) * 50, 50)
+    return round(min(max(cost, 5.0), APPROVAL_THRESHOLD * 250), 2)
+
+
+def generate_chunk(chunk: int) -> tuple:
+    """Orders and approvals for one chunk of order numbers; depends only on the plan and chunk"""
+    plan = _plan
+    rng = random.Random(f"{plan['seed']}:orders:{chunk}")
+    stages = {stage.status: stage for stage in WORKFLOW}
+    start, until = plan["start"], plan["until"]
+    spacing = (until - start).total_seconds() / plan["orders"]
+    first = chunk * plan["chunk_size"]
+    orders, approvals = [], []
+    for number in range(first, min(first + plan["chunk_size"], plan["orders"])):
+        created_at = start + timedelta(seconds=(number + rng.random()) * spacing)
+        cost = _cost(rng)
+        order_id = seeded_id(rng, created_at)
+        requested_by = plan["employees"][bisect.bisect(_requester_weights, rng.random() * _requester_weights[-1])]
+        vendor = bisect.bisect(_vendor_weights, rng.random() * _vendor_weights[-1])
+
+        # Walk the workflow until a decision would fall after `until`
+        status, decided_at, version = INITIAL_STATUS, created_at, 0
+        while status in stages:
+            stage = stages[status]
+            decided_at += timedelta(hours=rng.expovariate(1 / DECISION_HOURS[stage.reviewer]))
+            if decided_at > until:
+                break
+            decision = ApprovalStatus.DENIED if rng.random() < DENY_RATE[stage.reviewer] else ApprovalStatus.APPROVED
+            approvals.append({
+                "id": seeded_id(rng, decided_at), "purchase_order_id": order_id,
+                "approved_by": rng.choice(plan["reviewers"][stage.reviewer.value]), "role": stage.reviewer.value,
+                "status": decision, "comments": None if rng.random() < 0.7 else f"{decision.value.capitalize()}",
+                "approved_at": decided_at,
+            })
+            status = stage.next_status(decision, cost)
+            version += 1
+
+        orders.append({
+            "id": order_id, "item_name": rng.choice(ITEMS), "quantity": min(1 + int(rng.expovariate(1 / 4)), 500),
+            "cost": cost, "description": None if rng.random() < 0.2 else f"Requested for project {rng.randrange(400)}",
+            "vendor_name": f"Vendor {vendor:04d}", "requested_by": requested_by, "status": status,
+            "assigned_role": assigned_role_for(status), "created_at": created_at,
+            "updated_at": decided_at if version else created_at, "version": version,
+        })
+    return orders, approvals
+
+
+def driver_rows(dialect, model, rows: list) -> tuple:
+    """(statement, parameters) to insert rows with the driver's executemany
+
+    This skips SQLAlchemy's per-row parameter handling, most of the cost of
+    a Core insert. Ids are generated as the 16 bytes BinaryUUID stores;
+    every other value goes through its column type's bind processor, as
+    the ORM would.
+    """
+    table = model.__table__
+    keys = list(rows[0]) if rows else [column.key for column in table.columns]
+    compiled = insert(table).compile(dialect=dialect, column_keys=keys)
+    processors = []
+    for key in keys:
+        column_type = table.c[key].type
+        processor = None
+        if not isinstance(column_type, BinaryUUID):
+            processor = column_type.dialect_impl(dialect).bind_processor(dialect)
+        processors.append(processor)
+    parameters = [
+        {key: value if processor is None or value is None else processor(value)
+         for key, processor, value in zip(keys, processors, row.values())}
+        for row in rows
+    ]
+    if compiled.positional:
+        parameters = [tuple(row[key] for key in compiled.positiontup) for row in parameters]
+    return compiled.string, parameters
+
+
+def prepare_chunk(chunk: int) -> list:
+    """One chunk of orders and approvals as (statement, parameters) pairs"""
+    orders, approvals = generate_chunk(chunk)
+    dialect = _worker_engine.dialect
+    return [driver_rows(dialect, PurchaseOrder, orders), driver_rows(dialect, Approval, approvals)]
+
+
+def write_chunk(conn, statements: list) -> tuple:
+    """Run a prepared chunk on conn; return the number of rows of each statement"""
+    if not IS_SQLITE:
+        # Rows are generated consistent; skip per-row checks for the load
+        conn.execute(text("SET SESSION unique_checks = 0, foreign_key_checks = 0"))
+    for statement, parameters in statements:
+        if parameters:
+            conn.exec_driver_sql(statement, parameters)
+    return tuple(len(parameters) for _, parameters in statements)
+
+
+def insert_chunk(chunk: int) -> tuple:
+    """Generate and insert one chunk in its own transaction, from a worker"""
+    statements = prepare_chunk(chunk)
+    with _worker_engine.begin() as conn:
+        return write_chunk(conn, statements)
+
+
+def seed_scale(users: int, orders: int, seed: int, until: date, days: int, vendors: int,
+               workers: int, chunk_size: int):
+    """Replace all data with `users` users and `orders` orders spread over `days` days before `until`"""
+    started = time.perf_counter()
+    migrate()
+    with engine.begin() as conn:
+        logger.info("Clearing existing data...")
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+
+    end = datetime.combine(until, day_time.min)
+    start = end - timedelta(days=days)
+    # One bcrypt hash shared by every generated account
+    password_hash = get_password_hash("password123")
+    user_rows = generate_users(max(users, 6), seed, start, password_hash)
+    with engine.begin() as conn:
+        for first in range(0, len(user_rows), chunk_size):
+            conn.exec_driver_sql(*driver_rows(conn.dialect, User, user_rows[first:first + chunk_size]))
+    logger.info(f"Created {len(user_rows)} users")
+
+    reviewers = {
+        role.value: [user["id"] for user in user_rows if user["role"] == role]
+        for role in DECISION_HOURS
+    }
+    # Shuffled so the busiest requesters are not simply the first accounts
+    employees = [user["id"] for user in user_rows if user["role"] == UserRole.EMPLOYEE]
+    random.Random(f"{seed}:requesters").shuffle(employees)
+    plan = {
+        "seed": seed, "orders": orders, "chunk_size": chunk_size, "start": start,
+        "until": end, "vendors": vendors, "employees": employees, "reviewers": reviewers,
+    }
+
+    chunks = math.ceil(orders / chunk_size)
+    done_orders = done_approvals = 0
+    next_report = 0.1
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker, initargs=(plan,)) as executor:
+        # SQLite has a single writer, so there the workers only generate and
+        # this process inserts; MySQL takes each worker's inserts in parallel
+        task = prepare_chunk if IS_SQLITE else insert_chunk
+        for future in as_completed([executor.submit(task, chunk) for chunk in range(chunks)]):
+            if IS_SQLITE:
+                with engine.begin() as conn:
+                    inserted_orders, inserted_approvals = write_chunk(conn, future.result())
+            else:
+                inserted_orders, inserted_approvals = future.result()
+            done_orders += inserted_orders
+            done_approvals += inserted_approvals
+            if done_orders >= next_report * orders:
+                elapsed = time.perf_counter() - started
+                logger.info(f"{done_orders}/{orders} orders, {done_approvals} approvals "
+                            f"({(done_orders + done_approvals) / elapsed:,.0f} rows/s)")
+                next_report += 0.1
+
+    with engine.begin() as conn:
+        rebuild(conn)
+        if not IS_SQLITE:
+            conn.execute(text("ANALYZE TABLE users, purchase_orders, approvals"))
+    logger.info(f"Seeded {len(user_rows)} users, {orders} orders and {done_approvals} approvals "
+                f"in {time.perf_counter() - started:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, help="generate this many users (scale mode)")
+    parser.add_argument("--orders", type=int, help="generate this many purchase orders (scale mode)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--until", type=date.fromisoformat, default=date.today(),
+                        help="orders are created up to this date (default today)")
+    parser.add_argument("--days", type=int, default=365, help="days of history before --until")
+    parser.add_argument("--vendors", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=min(8, os.cpu_count() or 1))
+    parser.add_argument("--chunk-size", type=int, default=10000, help="rows per insert transaction")
+    args = parser.parse_args()
+
+    if args.users is None and args.orders is None:
+        try:
+            asyncio.run(seed_database())
+        except Exception as e:
+            logger.error(f"Failed to seed database: {str(e)}")
+            raise
+        finally:
+            password_hasher.shutdown()
+        return
+
+    seed_scale(args.users or 1000, args.orders or 0, args.seed, args.until, args.days, args.vendors,
+               args.workers, args.chunk_size)
+
+
 # Run the seed function
 if __name__ == "__main__":
-    try:
-        asyncio.run(seed_database())
-    except Exception as e:
-        logger.error(f"Failed to seed database: {str(e)}")
-        raise
\ No newline at end of file
+    main()
\ No newline at end of file